@@ -0,0 +1,172 @@
+import re
+import time
+from datetime import datetime, timezone
+
+# Nodes that end a line of output.
+LINE_NODES = {"paragraph", "heading", "codeBlock", "blockquote", "tableRow", "panel", "decisionItem", "taskItem"}
+MAX_INDENT = 8   # list levels beyond this are not indented further
+_END_LIST = object()
+_END_CELL = object()
+
+
+def _text_node(node, markdown):
+    text = node.get("text", "")
+    if not markdown:
+        return text
+    for mark in node.get("marks") or []:
+        kind = mark.get("type")
+        if kind == "code":
+            text = f"`{text}`"
+        elif kind == "link" and (mark.get("attrs") or {}).get("href"):
+            text = f"[{text}]({mark['attrs']['href']})"
+    return text
+
+
+def _inline_node(kind, attrs):
+    """Text for leaf nodes that carry their content in ``attrs``."""
+    if kind in ("mention", "status"):
+        return attrs.get("text", "")
+    if kind == "emoji":
+        return attrs.get("text") or attrs.get("shortName", "")
+    if kind in ("inlineCard", "blockCard", "embedCard"):
+        return attrs.get("url", "")
+    if kind == "date":
+        try:
+            return datetime.fromtimestamp(int(attrs.get("timestamp")) / 1000, tz=timezone.utc).date().isoformat()
+        except (TypeError, ValueError):
+            return ""
+    return ""
+
+
+# === ADF -> text ===
+def adf_to_text(doc, markdown=False):
+    """Flatten an Atlassian Document Format tree into compact plain text.
+
+    Walks the tree with an explicit stack, so deeply nested documents cannot
+    hit the recursion limit. Plain strings (Jira API v2 payloads) are returned
+    unchanged. With ``markdown=True`` headings, code blocks, inline code,
+    links and quotes keep their markdown syntax; lists are rendered as
+    ``-``/``1.`` items, indented by nesting level, in both modes.
+    """
+    if doc is None:
+        return ""
+    if isinstance(doc, str):
+        return doc
+    if not isinstance(doc, dict):
+        return str(doc)
+
+    out = []
+    lists = []      # [ordered, next number] per open list
+    cells = 0       # > 0 while inside a table cell
+    stack = [doc]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            out.append(node)
+            continue
+        if node is _END_LIST:
+            lists.pop()
+            continue
+        if node is _END_CELL:
+            cells -= 1
+            continue
+        if not isinstance(node, dict):
+            continue
+
+        kind = node.get("type")
+        attrs = node.get("attrs") or {}
+        if kind == "text":
+            out.append(_text_node(node, markdown))
+            continue
+        if kind == "hardBreak":
+            out.append(" " if cells else "\n")
+            continue
+        if kind == "rule":
+            out.append("\n---\n" if markdown else "\n")
+            continue
+        if kind in ("media", "mediaSingle", "mediaGroup", "mediaInline", "extension"):
+            continue
+        if "content" not in node:
+            out.append(_inline_node(kind, attrs))
+            continue
+
+        after = ("\n" if not cells else " ") if kind in LINE_NODES else ""
+        if kind == "heading" and markdown:
+            out.append("#" * int(attrs.get("level") or 1) + " ")
+        elif kind == "codeBlock" and markdown and not cells:
+            out.append(f"```{attrs.get('language') or ''}\n")
+            after = "\n```\n"
+        elif kind == "blockquote" and markdown:
+            out.append("> ")
+        elif kind in ("bulletList", "orderedList"):
+            lists.append([kind == "orderedList", int(attrs.get("order") or 1)])
+            stack.append(_END_LIST)
+        elif kind == "listItem" and lists:
+            current = lists[-1]
+            indent = "  " * min(len(lists) - 1, MAX_INDENT)
+            out.append(f"{indent}{current[1]}. " if current[0] else f"{indent}- ")
+            current[1] += 1
+        elif kind in ("tableCell", "tableHeader"):
+            cells += 1
+            stack.append(_END_CELL)
+            after = "| "
+
+        stack.append(after)
+        stack.extend(reversed(node.get("content") or []))
+
+    # Line-wise cleanup; regexes over long runs of indentation would backtrack.
+    text = "\n".join(line.rstrip(" |\t") for line in "".join(out).split("\n"))
+    text = re.sub(r"\n{3,}" if markdown else r"\n{2,}", "\n\n" if markdown else "\n", text)
+    return text.strip()
+
+
+# === Microbenchmark ===
+def _sample_doc(paragraphs=2000, depth=3000):
+    """A large description: paragraphs, lists, a table, code and one very deep list."""
+    content = []
+    for i in range(paragraphs):
+        content.append({"type": "paragraph", "content": [
+            {"type": "text", "text": f"Step {i}: the login service times out after "},
+            {"type": "text", "text": "30s", "marks": [{"type": "code"}]},
+            {"type": "hardBreak"},
+            {"type": "mention", "attrs": {"id": "abc", "text": "@Sam"}},
+        ]})
+        if i % 50 == 0:
+            content.append({"type": "bulletList", "content": [
+                {"type": "listItem", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "retry"}]}]},
+                {"type": "listItem", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "backoff"}]}]},
+            ]})
+            content.append({"type": "codeBlock", "attrs": {"language": "python"}, "content": [{"type": "text", "text": "client.get(url)"}]})
+            content.append({"type": "table", "content": [{"type": "tableRow", "content": [
+                {"type": "tableCell", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "env"}]}]},
+                {"type": "tableCell", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "prod"}]}]},
+            ]}]})
+    nested = None
+    for level in range(depth, 0, -1):
+        item = [{"type": "paragraph", "content": [{"type": "text", "text": f"level {level}"}]}]
+        nested = {"type": "bulletList", "content": [{"type": "listItem", "content": item + ([nested] if nested else [])}]}
+    if nested:
+        content.append(nested)
+    return {"type": "doc", "version": 1, "content": content}
+
+
+if __name__ == "__main__":
+    doc = _sample_doc(depth=0)
+    repr_bytes = len(str(doc).encode("utf-8"))
+    for markdown in (False, True):
+        runs = 5
+        start = time.perf_counter()
+        for _ in range(runs):
+            text = adf_to_text(doc, markdown=markdown)
+        elapsed = (time.perf_counter() - start) / runs
+        print(
+            f"⏱️ markdown={markdown}: {elapsed * 1000:.1f} ms/doc, "
+            f"{len(text.encode('utf-8'))} bytes vs {repr_bytes} bytes of str(doc) "
+            f"({len(text.encode('utf-8')) / repr_bytes:.1%})"
+        )
+
+    # str()/json of this document already fails with RecursionError.
+    deep = _sample_doc(paragraphs=0, depth=5000)
+    start = time.perf_counter()
+    text = adf_to_text(deep)
+    print(f"⏱️ 5000-level nested list: {(time.perf_counter() - start) * 1000:.1f} ms, {len(text)} chars")
@@ -0,0 +1,84 @@
+import os
+import time
+import sqlite3
+import threading
+
+
+class AttachmentCache:
+    """On-disk LRU cache of text extracted from Jira attachments.
+
+    Entries are keyed by the attachment id together with its size and created
+    timestamp from the issue's ``attachment`` metadata, so a re-uploaded file
+    gets a new key while an unchanged one is never downloaded or extracted
+    again. The total size of cached text is capped at ``max_bytes``; the least
+    recently used entries are evicted first.
+    """
+
+    def __init__(self, cache_dir="attachment_cache", max_bytes=None):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "attachments.sqlite")
+        self.max_bytes = max_bytes or int(os.getenv("ATTACHMENT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " cache_key TEXT PRIMARY KEY, text TEXT, size INTEGER, last_access REAL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(attachment):
+        """Cache key from Jira attachment metadata, or None if it has no id."""
+        att_id = attachment.get("id")
+        if not att_id:
+            return None
+        return f"{att_id}:{attachment.get('size', '')}:{attachment.get('created', '')}"
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM entries WHERE cache_key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE cache_key = ?", (time.time(), key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, key, text):
+        if key is None or text is None:
+            return
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (cache_key, text, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, text, size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT cache_key, size FROM entries ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE cache_key = ?", (key,))
+            total -= size
+            self.stats["evictions"] += 1
+
+    def hit_ratio(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,105 @@
+import os
+import re
+
+ATTACHMENT_COLLECTION_NAME = os.getenv("WEAVIATE_ATTACHMENT_COLLECTION_NAME") or "JiraAttachmentChunk"
+CHUNK_CHARS = int(os.getenv("ATTACHMENT_CHUNK_CHARS", "1500"))
+CHUNK_OVERLAP = int(os.getenv("ATTACHMENT_CHUNK_OVERLAP", "150"))
+
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n")
+
+# Results starting with these are placeholders for a failed or skipped extraction.
+FAILURE_PREFIXES = ("⚠️", "❌")
+
+
+def is_extracted(text):
+    """True if ``text`` is real extracted content, not a failure placeholder."""
+    return bool(text) and not text.startswith(FAILURE_PREFIXES)
+
+
+# === Reading the ``files`` field ===
+def attachment_texts(files):
+    """(filename, extracted_text) pairs from ``files`` entries (dicts or their str() form).
+
+    Failure placeholders ("⚠️ Skipped: ...", "❌ Error: ...") come back as
+    empty text, so they are neither chunked nor quoted as attachment content.
+    """
+    texts = []
+    for entry in files or []:
+        if isinstance(entry, dict):
+            filename, text = str(entry.get("filename", "")), str(entry.get("extracted_text", "") or "")
+        else:
+            match = re.search(r"'filename':\s*'([^']*)'.*?'extracted_text':\s*'(.*)'\}", str(entry), re.DOTALL)
+            if match:
+                filename, text = match.groups()
+            elif str(entry):
+                filename, text = str(entry), ""
+            else:
+                continue
+        texts.append((filename, text if is_extracted(text) else ""))
+    return texts
+
+
+def attachment_filenames(files):
+    return [filename for filename, _ in attachment_texts(files) if filename]
+
+
+# === Chunking ===
+def _pieces(text, max_chars):
+    """Paragraphs, split further into sentences (and hard cuts) when too long."""
+    for paragraph in PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            yield paragraph
+            continue
+        for sentence in SENTENCE_RE.split(paragraph):
+            sentence = sentence.strip()
+            for i in range(0, len(sentence), max_chars):
+                yield sentence[i:i + max_chars]
+
+
+def chunk_text(text, max_chars=None, overlap=None):
+    """Split ``text`` into chunks of at most ``max_chars`` on paragraph/sentence boundaries.
+
+    Each chunk starts with the last ``overlap`` characters of the previous
+    one so a sentence cut at a boundary is still searchable.
+    """
+    max_chars = max_chars or CHUNK_CHARS
+    overlap = CHUNK_OVERLAP if overlap is None else overlap
+    chunks, current = [], ""
+    for piece in _pieces(str(text or ""), max_chars - overlap if overlap < max_chars else max_chars):
+        if current and len(current) + len(piece) + 1 > max_chars:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            current = tail[tail.find(" ") + 1:] if " " in tail else tail
+        current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_attachment_chunks(issue_key, files, max_chars=None, overlap=None):
+    """Chunk objects for every attachment of one issue, in filename/position order.
+
+    Each chunk carries its attachment's Jira id (its position in ``files``
+    for older cleaned files without one), so two attachments with the same
+    filename get distinct chunk UUIDs.
+    """
+    chunks = []
+    for position, entry in enumerate(files or []):
+        texts = attachment_texts([entry])
+        if not texts:
+            continue
+        filename, text = texts[0]
+        attachment_id = entry.get("id") if isinstance(entry, dict) else None
+        for index, chunk in enumerate(chunk_text(text, max_chars, overlap)):
+            chunks.append({
+                "issue_key": str(issue_key),
+                "attachment_id": str(attachment_id or f"#{position}"),
+                "filename": filename,
+                "chunk_index": index,
+                "text": chunk,
+            })
+    return chunks
@@ -0,0 +1,190 @@
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError, wait
+
+import pdfplumber
+from docx import Document as DocxDocument
+from pptx import Presentation
+
+
+# === Worker functions (run inside the process pool) ===
+class _TextBuffer:
+    """Accumulates text piece by piece until a character or time limit is hit."""
+
+    def __init__(self, max_chars, time_budget):
+        self.parts = []
+        self.size = 0
+        self.max_chars = max_chars
+        self.deadline = time.monotonic() + time_budget if time_budget else None
+        self.truncated = None
+
+    def add(self, text):
+        if not text:
+            return True
+        remaining = self.max_chars - self.size
+        if len(text) > remaining:
+            self.parts.append(text[:remaining])
+            self.size = self.max_chars
+            self.truncated = "character limit reached"
+            return False
+        self.parts.append(text)
+        self.size += len(text)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.truncated = "time limit reached"
+            return False
+        return True
+
+    def result(self):
+        return "\n".join(self.parts).strip(), self.truncated
+
+
+def extract_pdf(file_path, max_pages, max_chars, time_budget=None):
+    buffer = _TextBuffer(max_chars, time_budget)
+    with pdfplumber.open(file_path) as pdf:
+        for number, page in enumerate(pdf.pages):
+            if number >= max_pages:
+                buffer.truncated = "page limit reached"
+                break
+            keep_going = buffer.add(page.extract_text())
+            # Drop the parsed layout of each page as soon as its text is taken.
+            if hasattr(page, "flush_cache"):
+                page.flush_cache()
+            if not keep_going:
+                break
+    return buffer.result()
+
+
+def extract_docx(file_path, max_pages, max_chars, time_budget=None):
+    buffer = _TextBuffer(max_chars, time_budget)
+    for para in DocxDocument(file_path).paragraphs:
+        if para.text.strip() and not buffer.add(para.text):
+            break
+    return buffer.result()
+
+
+def extract_pptx(file_path, max_pages, max_chars, time_budget=None):
+    buffer = _TextBuffer(max_chars, time_budget)
+    for number, slide in enumerate(Presentation(file_path).slides):
+        if number >= max_pages:
+            buffer.truncated = "slide limit reached"
+            break
+        texts = [shape.text for shape in slide.shapes if hasattr(shape, "text")]
+        if not buffer.add("\n".join(texts)):
+            break
+    return buffer.result()
+
+
+EXTRACTORS = {
+    ".pdf": extract_pdf,
+    ".docx": extract_docx,
+    ".pptx": extract_pptx,
+}
+
+
+# === Pool ===
+class ExtractionPool:
+    """Bounded process pool for document text extraction.
+
+    Each file gets ``timeout`` seconds. Workers stop on their own a little
+    before that and return what they have. A worker that still overruns is
+    abandoned: new files go to a fresh pool right away, while the old pool
+    is retired in the background once the other files already running in it
+    have finished, so one pathological file neither hangs the cleaning run
+    nor breaks its neighbours. Results that hit a limit carry a truncation note.
+    """
+
+    def __init__(self, max_workers=None, timeout=None, max_pages=None, max_chars=None):
+        self.max_workers = max_workers or int(os.getenv("ATTACHMENT_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.timeout = timeout or float(os.getenv("ATTACHMENT_EXTRACT_TIMEOUT", "120"))
+        self.max_pages = max_pages or int(os.getenv("ATTACHMENT_MAX_PAGES", "200"))
+        self.max_chars = max_chars or int(os.getenv("ATTACHMENT_MAX_CHARS", "500000"))
+        self._executor = None
+        self._in_flight = {}     # executor -> futures running in it
+        self._lock = threading.Lock()
+        # Only submit when a worker is free, so queueing time never eats into a file's timeout.
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self.stats = {"extracted": 0, "partial": 0, "timeouts": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: the API and pipeline processes run threads, and
+                # forking one can copy locks another thread holds into the worker.
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _recycle(self):
+        """Drop a broken pool; its futures have already failed."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _retire(self, executor, stuck):
+        """Stop using ``executor``; kill its processes once its other files are done."""
+        with self._lock:
+            if self._executor is not executor:
+                return  # already being retired
+            self._executor = None
+
+        def reap():
+            with self._lock:
+                others = [f for f in self._in_flight.get(executor, ()) if f is not stuck]
+            wait(others, timeout=self.timeout)
+            for process in list(getattr(executor, "_processes", {}).values()):
+                process.terminate()
+            executor.shutdown(wait=False, cancel_futures=True)
+            with self._lock:
+                self._in_flight.pop(executor, None)
+
+        threading.Thread(target=reap, name="extraction-pool-reaper", daemon=True).start()
+
+    def extract(self, file_path, ext):
+        """Extract text from ``file_path`` of type ``ext`` in a worker process."""
+        with self._slots:
+            return self._extract(file_path, ext)
+
+    def _extract(self, file_path, ext):
+        executor = self._get_executor()
+        future = executor.submit(
+            EXTRACTORS[ext], file_path, self.max_pages, self.max_chars, self.timeout * 0.8
+        )
+        with self._lock:
+            self._in_flight.setdefault(executor, set()).add(future)
+        try:
+            text, truncated = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self._count("timeouts")
+            print(f"⏱️ Extraction timed out after {self.timeout:.0f}s: {file_path}")
+            self._retire(executor, future)
+            return f"⚠️ Extraction timed out after {self.timeout:.0f}s."
+        except Exception as e:
+            self._count("errors")
+            print(f"❌ Extraction failed for {file_path}: {e}")
+            if "BrokenProcessPool" in type(e).__name__:
+                self._recycle()
+            return None
+        finally:
+            with self._lock:
+                if executor in self._in_flight:
+                    self._in_flight[executor].discard(future)
+
+        self._count("extracted")
+        if truncated:
+            self._count("partial")
+            print(f"✂️ Partial extraction ({truncated}): {file_path}")
+            text = f"{text}\n[... truncated: {truncated}]"
+        return text
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,93 @@
+import os
+import time
+
+
+class BulkUploader:
+    """Batched Weaviate writes with de-duplication, retries and throughput stats.
+
+    Objects (with an optional client-side vector) are buffered per window
+    with ``add`` and de-duplicated by UUID (last one wins) before ``flush``
+    hands them to the client's batcher. By
+    default that is ``client.batch.dynamic()``, which sizes batches and the
+    number of concurrent requests from the server's load; WEAVIATE_BATCH_MODE
+    =fixed uses WEAVIATE_BATCH_SIZE and WEAVIATE_CONCURRENT_REQUESTS instead.
+
+    On exit, objects the server rejected are sent again in smaller fixed-size
+    batches with exponential backoff. Whatever still fails is left in
+    ``failed`` as ``(collection, uuid, properties, message)``.
+    """
+
+    def __init__(self, client, mode=None, batch_size=None, concurrency=None, max_retries=None, backoff=None):
+        self.client = client
+        self.mode = (mode or os.getenv("WEAVIATE_BATCH_MODE") or "dynamic").lower()
+        self.batch_size = batch_size or int(os.getenv("WEAVIATE_BATCH_SIZE", "100"))
+        self.concurrency = concurrency or int(os.getenv("WEAVIATE_CONCURRENT_REQUESTS", "2"))
+        self.max_retries = int(os.getenv("WEAVIATE_MAX_RETRIES", "3")) if max_retries is None else max_retries
+        self.backoff = backoff or float(os.getenv("WEAVIATE_RETRY_BACKOFF", "2"))
+        self.failed = []
+        self.stats = {"sent": 0, "duplicates": 0, "retried": 0, "failed": 0, "seconds": 0.0, "objects_per_sec": 0.0}
+        self._pending = {}
+        self._batch_context = None
+        self._batch = None
+        self._started = None
+
+    # ------------------ Batching ------------------
+    def _open_batch(self, mode, batch_size):
+        if mode == "fixed":
+            return self.client.batch.fixed_size(batch_size=batch_size, concurrent_requests=self.concurrency)
+        return self.client.batch.dynamic()
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._batch_context = self._open_batch(self.mode, self.batch_size)
+        self._batch = self._batch_context.__enter__()
+        return self
+
+    def add(self, collection, properties, uuid, vector=None):
+        if uuid in self._pending:
+            self.stats["duplicates"] += 1
+        self._pending[uuid] = (collection, properties, vector)
+
+    def flush(self):
+        for uuid, (collection, properties, vector) in self._pending.items():
+            self._batch.add_object(collection=collection, properties=properties, uuid=uuid, vector=vector)
+        self.stats["sent"] += len(self._pending)
+        self._pending = {}
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        self._batch_context.__exit__(exc_type, exc, tb)
+        if exc_type is None:
+            self._retry_failed()
+        self.stats["seconds"] = round(time.perf_counter() - self._started, 2)
+        if self.stats["seconds"]:
+            self.stats["objects_per_sec"] = round(self.stats["sent"] / self.stats["seconds"], 1)
+        return False
+
+    # ------------------ Retries ------------------
+    def _take_failed(self):
+        failed = {}
+        for error in self.client.batch.failed_objects:
+            obj = error.object_
+            failed[str(obj.uuid)] = (obj.collection, obj.properties, obj.vector, error.message)
+        return failed
+
+    def _retry_failed(self):
+        failed = self._take_failed()
+        batch_size = max(self.batch_size // 2, 10)
+        for attempt in range(self.max_retries):
+            if not failed:
+                break
+            delay = self.backoff * (2 ** attempt)
+            print(f"🔁 Retrying {len(failed)} failed objects in {delay:.0f}s (attempt {attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+            self.stats["retried"] += len(failed)
+            with self._open_batch("fixed", batch_size) as batch:
+                for uuid, (collection, properties, vector, _) in failed.items():
+                    batch.add_object(collection=collection, properties=properties, uuid=uuid, vector=vector)
+            failed = self._take_failed()
+            batch_size = max(batch_size // 2, 10)
+
+        self.failed = [(collection, uuid, properties, message) for uuid, (collection, properties, _, message) in failed.items()]
+        self.stats["failed"] = len(self.failed)
@@ -0,0 +1,136 @@
+import os
+import re
+
+from attachment_chunks import attachment_texts
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+DOC_TOKEN_LIMIT = int(os.getenv("CONTEXT_DOC_TOKEN_LIMIT", "600"))
+DUPLICATE_THRESHOLD = 0.8
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+_encoding = None
+
+
+# === Token counting ===
+def count_tokens(text):
+    """Tokens in ``text`` for the chat model; ~4 chars/token if tiktoken is unavailable."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+# === Near-duplicate detection ===
+def _shingles(text, size=3):
+    words = WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def similarity(a, b):
+    """Jaccard similarity of word 3-gram sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# === Relevance trimming ===
+def trim_by_relevance(text, query_terms, max_tokens):
+    """Keep the sentences of ``text`` that share most words with the query.
+
+    Sentences are chosen by overlap with ``query_terms`` (earlier sentences
+    win ties) until ``max_tokens`` is reached, then emitted in their original
+    order so the excerpt still reads naturally.
+    """
+    text = str(text or "").strip()
+    if not text or count_tokens(text) <= max_tokens:
+        return text
+    sentences = [s.strip() for s in SENTENCE_RE.split(text) if s.strip()]
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-len(query_terms & set(WORD_RE.findall(sentences[i].lower()))), i),
+    )
+    chosen, used = [], 0
+    for i in ranked:
+        cost = count_tokens(sentences[i])
+        if used + cost > max_tokens:
+            if not chosen:
+                chosen.append(i)
+                sentences[i] = sentences[i][:max_tokens * 4]
+            continue
+        chosen.append(i)
+        used += cost
+    return " ".join(sentences[i] for i in sorted(chosen)) + " …"
+
+
+def render_doc(props, query_terms, max_tokens=DOC_TOKEN_LIMIT):
+    """One issue as a context block, long fields trimmed to ``max_tokens`` overall."""
+    header = (
+        f"🔹 {props.get('key', '')} | Project: {props.get('project_name', '')} | "
+        f"Status: {props.get('status', '')} | Priority: {props.get('priority', '')}\n"
+        f"Summary: {props.get('summary', '')}\n"
+    )
+    if props.get("summary_llm"):
+        header += f"Gist: {props['summary_llm']}\n"
+    remaining = max(max_tokens - count_tokens(header), 0)
+
+    body = ""
+    description = trim_by_relevance(props.get("description", ""), query_terms, remaining)
+    if description:
+        body += f"Description: {description}\n"
+        remaining -= count_tokens(description)
+    # Chunks that scored for this query; older objects still carry full attachment text.
+    chunks = [(c.get("filename", ""), c.get("text", "")) for c in props.get("attachment_chunks") or []]
+    for filename, text in chunks or attachment_texts(props.get("files")):
+        if remaining <= 20:
+            break
+        excerpt = trim_by_relevance(text, query_terms, remaining)
+        if excerpt and query_terms & set(WORD_RE.findall(excerpt.lower())):
+            body += f"Attachment {filename}: {excerpt}\n"
+            remaining -= count_tokens(excerpt)
+    return header + body
+
+
+# === Packing ===
+def pack_context(hits, query, budget=None, doc_limit=None):
+    """Fit the best hits into a token budget, skipping near-duplicates.
+
+    ``hits`` are issue property dicts, best first. Returns the context text
+    plus a report with the tokens used and which keys were included, dropped
+    as duplicates or left out for lack of budget.
+    """
+    budget = budget or CONTEXT_TOKEN_BUDGET
+    doc_limit = doc_limit or DOC_TOKEN_LIMIT
+    query_terms = set(WORD_RE.findall(query.lower()))
+
+    blocks, seen, used = [], [], 0
+    report = {"included": [], "duplicates": [], "over_budget": []}
+    for props in hits:
+        key = props.get("key", "")
+        fingerprint = _shingles(f"{props.get('summary', '')} {props.get('description', '')}")
+        if any(similarity(fingerprint, other) >= DUPLICATE_THRESHOLD for other in seen):
+            report["duplicates"].append(key)
+            continue
+
+        block = render_doc(props, query_terms, min(doc_limit, budget - used))
+        cost = count_tokens(block)
+        if used + cost > budget:
+            report["over_budget"].append(key)
+            continue
+        blocks.append(block)
+        seen.append(fingerprint)
+        used += cost
+        report["included"].append(key)
+
+    report["tokens"] = used
+    report["budget"] = budget
+    return "\n\n".join(blocks), report
@@ -1,17 +1,35 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from openai import OpenAI
 from dotenv import load_dotenv
-import mimetypes
-import pdfplumber
-from docx import Document as DocxDocument
-from pptx import Presentation
-import base64
-from PIL import Image
+from attachment_cache import AttachmentCache
+from attachment_chunks import is_extracted
+from attachment_extractors import ExtractionPool
+from image_describer import ImageDescriber
+
+# Extensions we can extract text from, with the MIME types Jira reports for them
+# and the leading bytes a real file of that type starts with.
+SUPPORTED_TYPES = {
+    ".pdf": (("application/pdf",), (b"%PDF",)),
+    ".docx": (("application/vnd.openxmlformats-officedocument.wordprocessingml.document",), (b"PK\x03\x04",)),
+    ".pptx": (("application/vnd.openxmlformats-officedocument.presentationml.presentation",), (b"PK\x03\x04",)),
+    ".png": (("image/png",), (b"\x89PNG",)),
+    ".jpg": (("image/jpeg",), (b"\xff\xd8\xff",)),
+    ".jpeg": (("image/jpeg",), (b"\xff\xd8\xff",)),
+    ".txt": (("text/plain",), ()),
+}
+
+
+class AttachmentSkipped(Exception):
+    """Raised when an attachment is not worth downloading."""
+
 
 class JiraAttachmentProcessor:
-    def __init__(self):
+    def __init__(self, cache_dir="attachment_cache", cache_max_bytes=None, max_workers=None, max_download_bytes=None):
         load_dotenv(".env")
         self.jira_url = os.getenv("JIRA_URL") or os.getenv("jira_url")
         self.jira_api_token = os.getenv("JIRA_API_TOKEN") or os.getenv("jira_api_token")
@@ -23,22 +41,111 @@ class JiraAttachmentProcessor:
         self.auth =  HTTPBasicAuth(self.user_email,self.jira_api_token )# "ATATT3xFfGF0hfORXaw3PFI1__5nKfH6fMc7F2oaMZm7Y7sFJ1K-Ip-vAe38Mpi52exFIf9qJQXTRenVv2k_gO02EYpji9pJysD4uA6Ucyca6lyZDJbdk2dL4c58Mf--Iq8LJTjeVTCNtvAKGiLc6H-3rNblZOt1LFPTqU7ERxEPGbOCBbbRpOU=4128C04E")
 
         self.headers = {"Accept": "*/*"}
+        self.max_workers = max_workers or int(os.getenv("ATTACHMENT_DOWNLOAD_WORKERS", "8"))
+        self.max_download_bytes = max_download_bytes or int(os.getenv("ATTACHMENT_MAX_BYTES", str(50 * 1024 * 1024)))
+
+        # One pooled session shared by all download threads.
+        self.session = requests.Session()
+        self.session.auth = self.auth
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._stats_lock = threading.Lock()
+        self.download_stats = {"downloaded": 0, "bytes_downloaded": 0, "skipped": 0, "bytes_skipped": 0}
+        self.cache = AttachmentCache(cache_dir, max_bytes=cache_max_bytes)
+        self.extraction_pool = ExtractionPool()
+        self.image_describer = ImageDescriber(self.client, cache_dir=cache_dir)
+
+    # ------------------ Download Planning ------------------
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.download_stats[name] += amount
+
+    def skip_reason(self, filename, attachment=None):
+        """Why an attachment should not be downloaded, or None if it should be.
+
+        Decided from the filename and the ``size``/``mimeType`` Jira already
+        reports in the attachment metadata, before any bytes are transferred.
+        """
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in SUPPORTED_TYPES:
+            return f"unsupported file type {ext or '(none)'}"
+        attachment = attachment or {}
+        size = attachment.get("size")
+        if isinstance(size, int) and size > self.max_download_bytes:
+            return f"file too large ({size} bytes > {self.max_download_bytes})"
+        mime_type = (attachment.get("mimeType") or "").split(";")[0].strip().lower()
+        if mime_type and mime_type != "application/octet-stream" and mime_type not in SUPPORTED_TYPES[ext][0]:
+            return f"MIME type {mime_type} does not match {ext}"
+        return None
+
+    def download_attachments(self, jobs):
+        """Download and extract many attachments concurrently.
+
+        ``jobs`` is a list of dicts with ``url``, ``filename``, ``save_dir`` and
+        optional ``attachment`` metadata. Results come back in the same order.
+        At most ``max_workers`` downloads run at once and at most twice that
+        many are queued, so huge batches do not pile up in memory.
+        """
+        results = [None] * len(jobs)
+        slots = threading.BoundedSemaphore(self.max_workers * 2)
 
-    def download_attachment(self, url, filename, save_dir):
+        def run(index, job):
+            try:
+                results[index] = self.download_attachment(
+                    job["url"], job["filename"], job["save_dir"], attachment=job.get("attachment")
+                )
+            except Exception as e:
+                print(f"❌ Error processing {job['filename']}: {e}")
+                results[index] = f"❌ Error: {e}"
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for index, job in enumerate(jobs):
+                slots.acquire()
+                executor.submit(run, index, job)
+
+        return results
+
+    def download_attachment(self, url, filename, save_dir, attachment=None):
+        reason = self.skip_reason(filename, attachment)
+        if reason:
+            size = (attachment or {}).get("size")
+            self._count("skipped")
+            self._count("bytes_skipped", size if isinstance(size, int) else 0)
+            print(f"⏭️ Skipping {filename}: {reason}")
+            return f"⚠️ Skipped: {reason}."
+
+        # Cache hit skips both the download and the extraction.
+        # Only real extractions are cached: timeouts, crashed workers and
+        # skips may be transient, so those attachments are tried again next run.
+        cache_key = AttachmentCache.make_key(attachment) if attachment else None
+        cached = self.cache.get(cache_key)
+        if is_extracted(cached):
+            return cached
+
+        result = self._download_and_extract(url, filename, save_dir)
+        if is_extracted(result):
+            self.cache.put(cache_key, result)
+        return result
+
+    def _download_and_extract(self, url, filename, save_dir):
         os.makedirs(save_dir, exist_ok=True)
         file_path = os.path.join(save_dir, filename)
         text_path = os.path.join(save_dir, f"{filename}.txt")
 
-        # try:
-        response = requests.get(url, headers=self.headers, auth=self.auth, stream=True)
-        if response.status_code == 200:
-            with open(file_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            print(f"✅ Downloaded: {file_path}")
-        else:
-            raise Exception(f"Download failed with status code: {response.status_code}")
+        try:
+            size = self._stream_to_file(url, filename, file_path)
+        except AttachmentSkipped as e:
+            self._count("skipped")
+            print(f"⏭️ Skipping {filename}: {e}")
+            return f"⚠️ Skipped: {e}."
+        self._count("downloaded")
+        self._count("bytes_downloaded", size)
+        print(f"✅ Downloaded: {file_path}")
 
         extracted_text = self.extract_text_from_file(file_path, filename)
 
@@ -50,9 +157,34 @@ class JiraAttachmentProcessor:
         else:
             return "⚠️ No text extracted from file."
 
-        # except Exception as e:
-        #     print(f"❌ Error processing {filename}: {e}")
-        #     return f"❌ Error: {e}"
+    def _stream_to_file(self, url, filename, file_path):
+        """Stream ``url`` to ``file_path``, enforcing the size cap and sniffing the type."""
+        ext = os.path.splitext(filename)[1].lower()
+        signatures = SUPPORTED_TYPES[ext][1]
+        written = 0
+        with self.session.get(url, stream=True, timeout=60) as response:
+            if response.status_code != 200:
+                raise Exception(f"Download failed with status code: {response.status_code}")
+            length = response.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > self.max_download_bytes:
+                raise AttachmentSkipped(f"file too large ({length} bytes > {self.max_download_bytes})")
+
+            try:
+                with open(file_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=65536):
+                        if not chunk:
+                            continue
+                        if written == 0 and signatures and not chunk.startswith(signatures):
+                            raise AttachmentSkipped(f"content does not look like {ext}")
+                        written += len(chunk)
+                        if written > self.max_download_bytes:
+                            raise AttachmentSkipped(f"file exceeded {self.max_download_bytes} bytes while downloading")
+                        f.write(chunk)
+            except AttachmentSkipped:
+                os.remove(file_path)
+                self._count("bytes_skipped", written)
+                raise
+        return written
 
     def extract_text_from_file(self, file_path, filename):
         ext = os.path.splitext(filename)[1].lower()
@@ -71,39 +203,13 @@ class JiraAttachmentProcessor:
             return None
 
     def extract_text_from_pdf(self, file_path):
-        text = ""
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text.strip()
+        return self.extraction_pool.extract(file_path, ".pdf")
 
     def extract_text_from_docx(self, file_path):
-        doc = DocxDocument(file_path)
-        return "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
+        return self.extraction_pool.extract(file_path, ".docx")
 
     def extract_text_from_pptx(self, file_path):
-        prs = Presentation(file_path)
-        text = ""
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + "\n"
-        return text.strip()
+        return self.extraction_pool.extract(file_path, ".pptx")
 
     def extract_text_from_image(self, file_path):
-        with open(file_path, "rb") as image_file:
-            encoded_image = base64.b64encode(image_file.read()).decode()
-
-        response = self.client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "user", "content": [
-                    {"type": "text", "text": "Please describe the contents of this image."},
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{encoded_image}"}}
-                ]}
-            ],
-            max_tokens=1000
-        )
-        return response.choices[0].message.content
+        return self.image_describer.describe(file_path)
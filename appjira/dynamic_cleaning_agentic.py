@@ -1,9 +1,25 @@
 import os
 import json
+import multiprocessing
+import tempfile
+import textwrap
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 from download_attachments import JiraAttachmentProcessor
+from attachment_chunks import is_extracted
+from adf_text import adf_to_text
+from issue_store import IssueStore, ISSUE_STORE_NAME, primary_sprint
+from fingerprint_store import fingerprint
+from pipeline_manifest import file_digest
 # from appjira.download_attachments import JiraAttachmentProcessor
 from dateutil import parser as date_parser
 
+# Keep markdown (code fences, lists, links) when flattening ADF descriptions.
+DESCRIPTION_MARKDOWN = os.getenv("DESCRIPTION_MARKDOWN", "0") == "1"
+# Issues per task when a large file is split across the cleaning pool.
+CLEAN_BATCH_SIZE = int(os.getenv("CLEAN_BATCH_SIZE", "500"))
+
 # === Helper to load JSON ===
 def load_json(file_path):
     with open(file_path, 'r') as f:
@@ -18,122 +34,329 @@ def get_all_json_files(folder_path):
     ]
 
 def parse_datetime_rfc3339(date_str):
+    if not date_str:
+        return ""
+    # Jira timestamps are ISO-8601, which fromisoformat reads far faster than dateutil
+    try:
+        return datetime.fromisoformat(date_str).isoformat()
+    except (TypeError, ValueError):
+        pass
     try:
         dt = date_parser.parse(date_str)
         return dt.isoformat()
     except Exception:
         return ""
 
-def extract_issue_data(issue, attachments_folder, processor):
-    fields = issue.get("fields", {})
+def attachment_jobs(issue, attachments_folder):
+    """Download jobs for every attachment of ``issue``."""
+    if not attachments_folder:
+        return []
+    issue_folder = os.path.join(attachments_folder, issue.get("key", ""))
+    return [
+        {"url": att["content"], "filename": att["filename"], "save_dir": issue_folder, "attachment": att}
+        for att in (issue.get("fields") or {}).get("attachment") or []
+        if att.get("filename") and att.get("content")
+    ]
+
+def extract_issue_data(issue, attachments_folder, processor, attachment_texts=None):
+    # Jira sends null (not a missing key) for unset fields, e.g. priority or reporter.
+    fields = issue.get("fields") or {}
     issue_key = issue.get("key", "")
-    project = fields.get("project", {})
-    parent = fields.get("parent", {})
+    project = fields.get("project") or {}
+    parent = fields.get("parent") or {}
 
     issue_data = {
         "key": issue_key,
         "project_key": project.get("key", ""),
         "project_name": project.get("name", ""),
         "summary": fields.get("summary", ""),
-        "description": fields.get("description", ""),
-        "issue_type": fields.get("issuetype", {}).get("name", ""),
-        "status": fields.get("status", {}).get("name", ""),
-        "priority": fields.get("priority", {}).get("name", ""),
+        "description": adf_to_text(fields.get("description"), markdown=DESCRIPTION_MARKDOWN),
+        "issue_type": (fields.get("issuetype") or {}).get("name", ""),
+        "status": (fields.get("status") or {}).get("name", ""),
+        "priority": (fields.get("priority") or {}).get("name", ""),
         "created": parse_datetime_rfc3339(fields.get("created", "")),
         "updated": parse_datetime_rfc3339(fields.get("updated", "")),
-        "reporter": fields.get("reporter", {}).get("displayName", ""),
-        "creator": fields.get("creator", {}).get("displayName", ""),
+        "reporter": (fields.get("reporter") or {}).get("displayName", ""),
+        "creator": (fields.get("creator") or {}).get("displayName", ""),
         "subtasks": [],
         "files": []
     }
 
     # ✅ Extract custom parent info with full issuetype details
     if parent and "fields" in parent:
-        parent_fields = parent["fields"]
-        issuetype = parent_fields.get("issuetype", {})
+        parent_fields = parent["fields"] or {}
+        issuetype = parent_fields.get("issuetype") or {}
 
         issue_data["parent_summary"] = parent_fields.get("summary", "")
         issue_data["parent_key"] = parent.get("key", "")
-        issue_data["parent_priority"] = parent_fields.get("priority", {}).get("name", "")
+        issue_data["parent_priority"] = (parent_fields.get("priority") or {}).get("name", "")
         issue_data["parent_description"] = issuetype.get("description", "")
         issue_data["parent_issuetype"] = issuetype.get("name", "")
         issue_data["parent_issuetype_icon"] = issuetype.get("iconUrl", "")
 
     # ✅ Add subtasks
-    for sub in fields.get("subtasks", []):
-        sub_fields = sub.get("fields", {})
+    for sub in fields.get("subtasks") or []:
+        sub_fields = sub.get("fields") or {}
         issue_data["subtasks"].append({
             "key": sub.get("key", ""),
             "summary": sub_fields.get("summary", ""),
-            "status": sub_fields.get("status", {}).get("name", ""),
-            "issuetype": sub_fields.get("issuetype", {}).get("name", "")
+            "status": (sub_fields.get("status") or {}).get("name", ""),
+            "issuetype": (sub_fields.get("issuetype") or {}).get("name", "")
         })
 
-    # ✅ Process attachments
-    for att in fields.get("attachment", []):
-        filename = att.get("filename")
-        content_url = att.get("content")
-        if filename and content_url and attachments_folder:
-            issue_folder = os.path.join(attachments_folder, issue_key)
-            extracted_text = processor.download_attachment(content_url, filename, issue_folder)
-            issue_data["files"].append({
-                "filename": filename,
-                "extracted_text": extracted_text
-            })
-        
-
+    # ✅ Process attachments (prefetched concurrently by process_all_files when available)
+    jobs = attachment_jobs(issue, attachments_folder)
+    if attachment_texts is None:
+        texts = processor.download_attachments(jobs) if jobs else []
+    else:
+        texts = [attachment_texts.get((job["save_dir"], job["filename"])) for job in jobs]
+    for job, extracted_text in zip(jobs, texts):
+        issue_data["files"].append({
+            "id": job["attachment"].get("id"),
+            "filename": job["filename"],
+            "extracted_text": extracted_text
+        })
 
     return issue_data
 
 # === Main processor ===
-def process_all_files(input_folder, output_folder, processor):
-    os.makedirs(output_folder, exist_ok=True)
-    all_files = get_all_json_files(input_folder)
-    print(f"Found {len(all_files)} JSON files to process.")
+def sprint_fields(board, sprint):
+    return {
+        "board_id": board.get("id"),
+        "board_name": board.get("name"),
+        "sprint_id": sprint.get("id"),
+        "sprint_name": sprint.get("name"),
+        "sprint_state": sprint.get("state"),
+    }
 
-    for file_path in all_files:
-        print(f"Processing file: {file_path}")
-        try:
-            data = load_json(file_path)
+def prefetch_attachments(issues, attachments_folder, processor):
+    """Download every attachment of ``issues`` concurrently, once per (folder, filename)."""
+    jobs = [job for issue in issues for job in attachment_jobs(issue, attachments_folder)]
+    unique_jobs = list({(job["save_dir"], job["filename"]): job for job in jobs}.values())
+    texts = processor.download_attachments(unique_jobs) if unique_jobs else []
+    return {(job["save_dir"], job["filename"]): text for job, text in zip(unique_jobs, texts)}
+
+def issue_json(cleaned):
+    """One cleaned issue as it appears inside the ``issues`` list of a cleaned file."""
+    return textwrap.indent(json.dumps(cleaned, indent=2), "    ")
+
+def clean_batch(entries, attachments_folder, attachment_texts):
+    """Clean ``(issue, extra fields)`` pairs into issue JSON texts, in order.
+
+    Needs no processor (attachments are prefetched), so it runs as is in a
+    worker process.
+    """
+    texts = []
+    for issue, extra in entries:
+        cleaned = extract_issue_data(issue, attachments_folder, None, attachment_texts)
+        cleaned.update(extra)
+        texts.append(issue_json(cleaned))
+    return texts
+
+def write_cleaned_texts(output_folder, filename_stem, project_name, issue_texts):
+    """Write a cleaned file from issue texts; same bytes as json.dump(..., indent=2).
+
+    Written to a temp file and moved into place, so a failed write leaves
+    the previous file (and nothing half-written) behind.
+    """
+    output_path = os.path.join(output_folder, filename_stem + "_cleaned.json")
+    header = json.dumps({"project_name": project_name, "total": len(issue_texts)}, indent=2)[:-2]
+    tmp_fd, tmp_path = tempfile.mkstemp(prefix="tmp_", dir=output_folder, text=True)
+    try:
+        with os.fdopen(tmp_fd, 'w') as f:
+            f.write(header + ",\n")
+            if issue_texts:
+                f.write('  "issues": [\n')
+                f.write(",\n".join(issue_texts))
+                f.write("\n  ]\n}")
+            else:
+                f.write('  "issues": []\n}')
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    print(f"✅ Saved cleaned file: {output_path}")
 
-            project_name = data.get("project", "UnknownProject")
-            cleaned_issues = []
+# ------------------ Units: what to clean, before the CPU work ------------------
+def prepare_project(store, project_key, output_folder, processor):
+    """Load a project's canonical issues, each with its sprint fields, and prefetch attachments."""
+    entries = []
+    for issue, sprints in store.iter_project_issues(project_key):
+        # Board/sprint fields describe the primary sprint; "sprints" lists all of them
+        primary = primary_sprint(sprints) or {}
+        extra = sprint_fields({"id": primary.get("board_id"), "name": primary.get("board_name")}, primary)
+        extra["sprints"] = [
+            {"id": s.get("id"), "name": s.get("name"), "state": s.get("state"), "board_id": s.get("board_id")}
+            for s in sprints
+        ]
+        entries.append((issue, extra))
+    print(f" - {project_key}: {len(entries)} issues")
+    attachments_folder = os.path.join(output_folder, f"project_{project_key}_attachments")
 
-            filename_stem = os.path.basename(file_path).replace(".json", "")
-            attachments_folder = os.path.join(output_folder, f"{filename_stem}_attachments")
+    def remove_board_files():
+        # Per-board files from the old layout would duplicate these issues in combine_issues.
+        # Called by finish_unit after the project file was written, never before.
+        for name in os.listdir(output_folder):
+            if name.startswith(f"project_{project_key}_board_") and name.endswith("_cleaned.json"):
+                os.remove(os.path.join(output_folder, name))
 
-            # ✅ Walk through boards → sprints → issues
-            for board in data.get("boards", []):
-                for sprint in board.get("sprints", []):
-                    issues = sprint.get("issues", [])
-                    print(f" - Found {len(issues)} issues in sprint {sprint.get('name')}.")
+    return {
+        "stem": f"project_{project_key}", "project_name": project_key, "entries": entries,
+        "attachments_folder": attachments_folder,
+        "attachment_texts": prefetch_attachments([issue for issue, _ in entries], attachments_folder, processor),
+        "after": remove_board_files,
+    }
+
+def prepare_board_file(file_path, output_folder, processor):
+    """Load a board file that embeds full issues per sprint (pre issue-store layout)."""
+    data = load_json(file_path)
+    filename_stem = os.path.basename(file_path).replace(".json", "")
+    attachments_folder = os.path.join(output_folder, f"{filename_stem}_attachments")
+
+    # ✅ Walk through boards → sprints → issues, adding sprint + board info to each
+    entries = []
+    for board in data.get("boards", []):
+        for sprint in board.get("sprints", []):
+            issues = sprint.get("issues", [])
+            print(f" - Found {len(issues)} issues in sprint {sprint.get('name')}.")
+            entries.extend((issue, sprint_fields(board, sprint)) for issue in issues)
+
+    return {
+        "stem": filename_stem, "project_name": data.get("project", "UnknownProject"), "entries": entries,
+        "attachments_folder": attachments_folder,
+        "attachment_texts": prefetch_attachments([issue for issue, _ in entries], attachments_folder, processor),
+        "after": None,
+    }
+
+def submit_unit(unit, pool=None, batch_size=CLEAN_BATCH_SIZE):
+    """Start cleaning a prepared unit; returns one result getter per batch, in order.
+
+    Large units are split into batches of ``batch_size`` issues so they spread
+    across the pool. Without a pool the batches are cleaned right away.
+    """
+    getters = []
+    entries, folder, texts = unit["entries"], unit["attachments_folder"], unit["attachment_texts"]
+    for i in range(0, len(entries), batch_size):
+        batch = entries[i:i + batch_size]
+        if pool is None:
+            result = clean_batch(batch, folder, texts)
+            getters.append(lambda result=result: result)
+        else:
+            dirs = {os.path.join(folder, issue.get("key", "")) for issue, _ in batch}
+            batch_texts = {k: v for k, v in texts.items() if k[0] in dirs}
+            getters.append(pool.submit(clean_batch, batch, folder, batch_texts).result)
+    return getters
+
+def finish_unit(unit, getters, output_folder):
+    """Collect a unit's batches in submission order and write its cleaned file.
+
+    The unit's ``after`` hook (e.g. removing superseded legacy files) runs
+    only once every batch succeeded and the new file is in place.
+    """
+    issue_texts = [text for get in getters for text in get()]
+    write_cleaned_texts(output_folder, unit["stem"], unit["project_name"], issue_texts)
+    if unit["after"] is not None:
+        unit["after"]()
 
-                    for issue in issues:
-                        cleaned = extract_issue_data(issue, attachments_folder, processor)
-                        # Add sprint + board info to issue
-                        cleaned["board_id"] = board.get("id")
-                        cleaned["board_name"] = board.get("name")
-                        cleaned["sprint_id"] = sprint.get("id")
-                        cleaned["sprint_name"] = sprint.get("name")
-                        cleaned_issues.append(cleaned)
+def clean_digest(source_digest):
+    """Input digest of one cleaned output: its source plus the cleaning settings."""
+    return fingerprint({"source": source_digest, "markdown": DESCRIPTION_MARKDOWN})
 
-            # ✅ Wrap up cleaned data
-            output_data = {
-                "project_name": project_name,
-                "total": len(cleaned_issues),
-                "issues": cleaned_issues
-            }
+def clean_workers():
+    """CLEAN_WORKERS processes; 1 cleans in this process.
 
-            output_filename = filename_stem + "_cleaned.json"
-            output_path = os.path.join(output_folder, output_filename)
+    Defaults to at most 4: inside a container os.cpu_count() reports the
+    host's cores, not the container's CPU quota.
+    """
+    workers = int(os.getenv("CLEAN_WORKERS", "0"))
+    return workers if workers > 0 else min(4, os.cpu_count() or 1)
 
-            with open(output_path, 'w') as f:
-                json.dump(output_data, f, indent=2)
+def process_all_files(input_folder, output_folder, processor, job=None, manifest=None, workers=None):
+    """Clean every project (or legacy board file).
 
-            print(f"✅ Saved cleaned file: {output_path}")
+    Attachments are downloaded here, unit by unit; the CPU-bound cleaning
+    of each unit's issue batches runs on a process pool of ``workers``
+    (CLEAN_WORKERS by default) while the next units are prepared. Units are
+    written in input order and batches reassembled in issue order, so the
+    output matches a sequential run. A unit that fails (to load, download
+    or clean) is reported and skipped without affecting the others.
 
+    ``job`` gets per-unit progress. With a ``manifest``, units whose inputs
+    are unchanged since their cleaned file was written are skipped.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    store_path = os.path.join(input_folder, ISSUE_STORE_NAME)
+
+    if os.path.exists(store_path):
+        store = IssueStore(store_path)
+        units = [
+            (project_key, f"project_{project_key}", lambda key=project_key: store.project_digest(key),
+             lambda key=project_key: prepare_project(store, key, output_folder, processor))
+            for project_key in store.projects()
+        ]
+        print(f"Found {len(units)} projects in the issue store.")
+    else:
+        units = [
+            (file_path, os.path.basename(file_path).replace(".json", ""), lambda path=file_path: file_digest(path),
+             lambda path=file_path: prepare_board_file(path, output_folder, processor))
+            for file_path in get_all_json_files(input_folder)
+        ]
+        print(f"Found {len(units)} JSON files to process.")
+
+    workers = workers or clean_workers()
+    # Spawned, not forked: this runs on a background thread of the API server, and
+    # forking a multi-threaded process can copy locks held by other threads.
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) if workers > 1 and units else None
+    inflight = deque()   # (name, digest, unit, getters), oldest first
+    skipped = 0
+
+    def finish_oldest():
+        name, digest, unit, getters = inflight.popleft()
+        try:
+            finish_unit(unit, getters, output_folder)
+            # Placeholders for failed or skipped attachments are retried by the next run.
+            if manifest is not None and all(is_extracted(text) for text in unit["attachment_texts"].values()):
+                manifest.record_output("clean", name, digest)
         except Exception as e:
-            print(f"❌ Error in {file_path}: {e}")
+            print(f"❌ Error in {name}: {e}")
+        if job is not None:
+            job.advance("clean")
+
+    if job is not None:
+        job.start_stage("clean", total=len(units))
+    try:
+        for name, stem, source_digest, prepare in units:
+            output_path = os.path.join(output_folder, stem + "_cleaned.json")
+            digest = clean_digest(source_digest()) if manifest is not None else None
+            if manifest is not None and manifest.is_current("clean", name, digest, output_path):
+                skipped += 1
+                if job is not None:
+                    job.advance("clean")
+                continue
+            print(f"Processing: {name}")
+            try:
+                unit = prepare()
+                inflight.append((name, digest, unit, submit_unit(unit, pool)))
+            except Exception as e:
+                print(f"❌ Error in {name}: {e}")
+                if job is not None:
+                    job.advance("clean")
+            # Keep a couple of units per worker queued; write the rest as they finish.
+            while len(inflight) > 2 * workers:
+                finish_oldest()
+        while inflight:
+            finish_oldest()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    if skipped:
+        print(f"⏭️ Skipped {skipped} unchanged units with up-to-date cleaned files.")
+
+    print(f"📥 Attachment downloads: {processor.download_stats}")
+    print(f"🖼️ Image descriptions: {processor.image_describer.stats}")
+    cache = getattr(processor, "cache", None)
+    if cache is not None:
+        print(f"📦 Attachment cache: {cache.stats} (hit ratio {cache.hit_ratio():.0%})")
 
 
 # === Run the script ===
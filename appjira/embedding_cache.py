@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH") or os.path.join("combined", "embeddings.sqlite")
+
+
+def embedder_name(embed_fn):
+    """Identity of an embedder for cache keys (its ``model`` attribute if set)."""
+    return getattr(embed_fn, "model", None) or getattr(embed_fn, "__qualname__", "embedder")
+
+
+class EmbeddingCache:
+    """Vectors keyed by a hash of (embedder, text), stored in SQLite.
+
+    Because keys depend only on content, a vector computed once is reused on
+    every reindex, schema migration or collection rebuild until the text (or
+    the embedding model) changes.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (hash TEXT PRIMARY KEY, dim INTEGER, vector BLOB)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, text):
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM vectors WHERE hash IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (hash, dim, vector) VALUES (?, ?, ?)",
+                [(key, len(vector), np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items],
+            )
+            self._conn.commit()
+
+    def embed(self, texts, embed_fn, batch_size=100):
+        """Vectors for ``texts`` (float32 matrix); only unseen texts reach ``embed_fn``."""
+        model = embedder_name(embed_fn)
+        keys = [self.make_key(model, text) for text in texts]
+        found = self.get_many(list(dict.fromkeys(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += len(missing)
+
+        pending = list(missing.items())
+        for i in range(0, len(pending), batch_size):
+            batch = pending[i:i + batch_size]
+            vectors = np.asarray(embed_fn([text for _, text in batch]), dtype=np.float32)
+            computed = [(key, vector) for (key, _), vector in zip(batch, vectors)]
+            self.put_many(computed)
+            found.update(computed)
+
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([found[key] for key in keys])
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / lookups if lookups else 0.0}
+
+
+def cached_embedder(embed_fn, cache=None):
+    """Wrap ``embed_fn`` so repeated texts are served from an EmbeddingCache."""
+    cache = cache or EmbeddingCache()
+
+    def embed(texts):
+        return cache.embed(list(texts), embed_fn)
+    embed.model = embedder_name(embed_fn)
+    embed.cache = cache
+    return embed
@@ -1,16 +1,31 @@
-import requests
 import json
 import hashlib
 import os
+from datetime import datetime, timezone
 from requests.auth import HTTPBasicAuth
 from dotenv import load_dotenv
+from jira_client import JiraClient
+from issue_store import IssueStore, ISSUE_STORE_NAME
 from dynamic_cleaning_agentic import process_all_files
 from download_attachments import JiraAttachmentProcessor
-from weaviate_create_collections import combine_issues, upload_to_weaviate
+from weaviate_create_collections import combine_issues, upload_to_weaviate, weaviate_index_exists
+from issue_summaries import summarize_issues
+from retrieval_backends import LocalHybridBackend, embedder_from_env
+from pipeline_jobs import PipelineJob
+from pipeline_manifest import PipelineManifest, MANIFEST_NAME, file_digest
+from fingerprint_store import fingerprint
+
+# Board types with sprints; issues of other boards (kanban) are stored without sprint membership.
+SPRINT_BOARD_TYPES = (None, "scrum")
+
+
+def has_sprints(board):
+    return board.get("board_type") in SPRINT_BOARD_TYPES
 
 
 class JiraPipeline:
-    def __init__(self, env_path="/Users/hemasagarendluri1996/jira-rag-pipeline/.env", output_dir="board_project_data"):
+    def __init__(self, env_path="/Users/hemasagarendluri1996/jira-rag-pipeline/.env", output_dir="board_project_data",
+                 max_workers=None, page_size=None):
         # Load credentials
         load_dotenv(env_path)
         self.jira_url = os.getenv("JIRA_URL")
@@ -21,10 +36,13 @@ class JiraPipeline:
         # Auth and headers
         self.auth = HTTPBasicAuth(self.user_email, self.jira_api_token)
         self.headers = {"Accept": "application/json"}
+        self.client = JiraClient(self.jira_url, auth=self.auth, headers=self.headers,
+                                 max_workers=max_workers, page_size=page_size)
 
         # Directories
         self.output_dir = output_dir
         os.makedirs(self.output_dir, exist_ok=True)
+        self.issue_store = IssueStore(os.path.join(self.output_dir, ISSUE_STORE_NAME))
 
     # ------------------ Utility Methods ------------------
     def _calculate_hash(self, data):
@@ -42,15 +60,27 @@ class JiraPipeline:
         with open(os.path.join(self.output_dir, f"board_{board_id}_hash.txt"), "w") as f:
             f.write(new_data_hash)
 
-    def _get(self, endpoint):
-        url = f"{self.jira_url}{endpoint}"
-        response = requests.get(url, headers=self.headers, auth=self.auth)
-        response.raise_for_status()
-        return response.json()
+    def _load_watermark(self, project_key):
+        path = os.path.join(self.output_dir, f"project_{project_key}_watermark.txt")
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                value = f.read().strip()
+            return datetime.fromisoformat(value) if value else None
+        return None
+
+    def _save_watermark(self, project_key, synced_at):
+        with open(os.path.join(self.output_dir, f"project_{project_key}_watermark.txt"), "w") as f:
+            f.write(synced_at.isoformat())
+
+    def _get(self, endpoint, params=None):
+        return self.client.get(endpoint, params)
+
+    def _get_all(self, endpoint, params=None, items_key="values"):
+        return self.client.paginate(endpoint, params, items_key)
 
     # ------------------ Jira Data Collection ------------------
     def get_all_boards(self):
-        return self._get("/rest/agile/1.0/board")
+        return {"values": self._get_all("/rest/agile/1.0/board")}
 
     def project_board_issues(self, boards):
         return [
@@ -65,63 +95,288 @@ class JiraPipeline:
             for board in boards.get("values", [])
         ]
 
-    def fetch_project_data(self, project_key):
-        """Fetch all boards, sprints, and issues for a given project key."""
-        project_url = f"/rest/agile/1.0/board?projectKeyOrId={project_key}"
-        boards = self._get(project_url)
+    def plan_fetch(self, boards):
+        """Group boards by project so every project and board is fetched once."""
+        projects = {}
+        seen_boards = set()
+        for board in self.project_board_issues(boards):
+            if board["board_id"] in seen_boards:
+                continue
+            seen_boards.add(board["board_id"])
+            project = projects.setdefault(board["project_key"], {
+                "project_key": board["project_key"],
+                "project_name": board["project_name"],
+                "boards": [],
+            })
+            project["boards"].append(board)
+        return list(projects.values())
 
-        project_data = {"project": project_key, "boards": []}
+    def _project_boards(self, project_key, boards=None):
+        if boards is not None:
+            return boards
+        return [
+            {"board_id": b["id"], "board_name": b["name"], "board_type": b.get("type")}
+            for b in self._get_all("/rest/agile/1.0/board", {"projectKeyOrId": project_key})
+        ]
 
-        for board in boards.get("values", []):
-            board_id = board["id"]
-            board_info = {"id": board_id, "name": board["name"], "sprints": []}
+    def fetch_board_sprints(self, board):
+        """Sprints of one board, tagged with the board (none for kanban boards)."""
+        if not has_sprints(board):
+            return []
+        return [
+            {**sprint, "board_id": board["board_id"], "board_name": board["board_name"]}
+            for sprint in self._get_all(f"/rest/agile/1.0/board/{board['board_id']}/sprint")
+        ]
 
-            # ---- Get Sprints ----
-            sprints = self._get(f"/rest/agile/1.0/board/{board_id}/sprint")
+    def fetch_board(self, board):
+        """Sprints of one board (none for kanban boards) and its issues, each issue fetched once."""
+        board_id = board["board_id"]
+        sprints = self._get_all(f"/rest/agile/1.0/board/{board_id}/sprint") if has_sprints(board) else []
+        issues = self._get_all(f"/rest/agile/1.0/board/{board_id}/issue", items_key="issues")
+        return board, sprints, issues
 
-            for sprint in sprints.get("values", []):
-                sprint_id = sprint["id"]
-                sprint_info = sprint.copy()
-                sprint_info["issues"] = []
+    def fetch_project_data(self, project_key, boards=None):
+        """Fetch the boards, sprints and issues of a project into the issue store.
 
-                # ---- Get Issues ----
-                issues = self._get(f"/rest/agile/1.0/sprint/{sprint_id}/issue")
-                sprint_info["issues"].extend(issues.get("issues", []))
-                board_info["sprints"].append(sprint_info)
+        Issues are fetched per board (not per sprint) and their sprint
+        membership is read from their sprint fields, so an issue carried over
+        across sprints is requested and stored once. Issues of kanban boards
+        are stored without sprint membership. Each board file holds only that
+        board's sprints and their issue keys (kanban: the board's issue keys).
+        """
+        boards = self._project_boards(project_key, boards)
+        all_sprints, issues_by_key, memberships = [], {}, set()
+        # ---- Boards fetched concurrently ----
+        for board, sprints, issues in self.client.map(self.fetch_board, boards):
+            board_id = board["board_id"]
+            sprint_ids = {sprint["id"] for sprint in sprints}
+            keys_by_sprint = {sprint_id: [] for sprint_id in sprint_ids}
+            for issue in issues:
+                for sprint_id in self._issue_sprint_ids(issue) & sprint_ids:
+                    keys_by_sprint[sprint_id].append(issue["key"])
+                    memberships.add((issue["key"], sprint_id))
+                    issues_by_key[issue["key"]] = issue
 
-            project_data["boards"].append(board_info)
+            board_info = {"id": board_id, "name": board["board_name"], "sprints": []}
+            if not has_sprints(board):
+                issues_by_key.update((issue["key"], issue) for issue in issues)
+                board_info["issue_keys"] = sorted(issue["key"] for issue in issues)
+            for sprint in sprints:
+                board_info["sprints"].append({**sprint, "issue_keys": sorted(set(keys_by_sprint[sprint["id"]]))})
+                all_sprints.append({**sprint, "board_id": board_id, "board_name": board["board_name"]})
 
             # ---- Save with Hash Check ----
-            new_hash = self._calculate_hash(project_data)
+            board_data = {"project": project_key, "boards": [board_info]}
+            new_hash = self._calculate_hash(board_data)
             if self._is_new_data(board_id, new_hash):
                 filename = os.path.join(self.output_dir, f"project_{project_key}_board_{board_id}.json")
                 with open(filename, "w") as f:
-                    json.dump(project_data, f, indent=2)
+                    json.dump(board_data, f, indent=2)
                 self._save_hash(board_id, new_hash)
                 print(f"✅ Issues updated for board {board_id}")
             else:
                 print(f"No changes in board {board_id}, skipping update.")
 
-        return project_data
+        self.issue_store.replace_project(project_key, all_sprints, issues_by_key.values(), memberships)
+        print(f"🗃️ {project_key}: {len(issues_by_key)} issues in {len(all_sprints)} sprints ({len(memberships)} memberships)")
+        return {"project": project_key, "issues": len(issues_by_key), "sprints": len(all_sprints)}
+
+    # ------------------ Incremental Sync ------------------
+    def fetch_updated_issues(self, project_key, since, overlap_minutes=2):
+        """Fetch issues of ``project_key`` updated since ``since`` via JQL search.
+
+        The window is expressed as a relative JQL offset (``-Nm``) so it does not
+        depend on the time zone of the Jira user's profile. A small overlap
+        re-fetches a few issues rather than risking a gap; merging is idempotent.
+        ``/rest/api/3/search/jql`` returns only issue ids unless fields are
+        asked for, and is paged by ``nextPageToken``.
+        """
+        elapsed = datetime.now(timezone.utc) - since
+        minutes = int(elapsed.total_seconds() // 60) + overlap_minutes
+        jql = f'project = "{project_key}" AND updated >= "-{minutes}m" ORDER BY updated ASC'
+        return self._get_all("/rest/api/3/search/jql", {"jql": jql, "fields": "*all"}, items_key="issues")
+
+    @staticmethod
+    def _issue_sprint_ids(issue):
+        """Sprint ids an issue belongs to, from the agile or the custom sprint field."""
+        fields = issue.get("fields", {})
+        sprint_ids = set()
+        candidates = [fields.get("sprint"), fields.get("closedSprints")]
+        candidates += [value for name, value in fields.items() if name.startswith("customfield_")]
+        for value in candidates:
+            values = value if isinstance(value, list) else [value]
+            for sprint in values:
+                if isinstance(sprint, dict) and "id" in sprint and ("boardId" in sprint or "state" in sprint):
+                    sprint_ids.add(sprint["id"])
+        return sprint_ids
+
+    def merge_updated_issues(self, project_key, issues, keep_unplaced=False):
+        """Merge changed issues into the issue store.
+
+        Known issues are replaced; new issues are added when they belong to a
+        known sprint of the project (or always, with ``keep_unplaced``, for
+        projects with a kanban board). Sprint membership is updated whenever
+        the issue's sprint fields name a known sprint. Returns the keys of new
+        issues that were left out.
+        """
+        sprint_ids = self.issue_store.sprint_ids(project_key)
+        known = self.issue_store.known_keys(issue["key"] for issue in issues)
+        keep, memberships, unplaced = [], set(), []
+        for issue in issues:
+            ids = self._issue_sprint_ids(issue) & sprint_ids
+            if not ids and issue["key"] not in known and not keep_unplaced:
+                unplaced.append(issue["key"])
+                continue
+            keep.append(issue)
+            memberships.update((issue["key"], sprint_id) for sprint_id in ids)
+        self.issue_store.upsert_issues(project_key, keep, memberships)
+        return sorted(unplaced)
+
+    def sync_project(self, project_key, boards=None):
+        """Incrementally sync ``project_key``, falling back to a full export."""
+        synced_at = datetime.now(timezone.utc)
+        since = self._load_watermark(project_key)
+
+        if since is None or not self.issue_store.has_project(project_key):
+            print(f"🔄 Exporting project: {project_key}")
+            self.fetch_project_data(project_key, boards)
+        else:
+            # Refresh the sprint lists first, so issues moved into a sprint created since the last sync are placed.
+            boards = self._project_boards(project_key, boards)
+            sprints = [sprint for board_sprints in self.client.map(self.fetch_board_sprints, boards) for sprint in board_sprints]
+            self.issue_store.upsert_sprints(project_key, sprints)
+            issues = self.fetch_updated_issues(project_key, since)
+            kanban = any(not has_sprints(board) for board in boards)
+            unplaced = self.merge_updated_issues(project_key, issues, keep_unplaced=kanban)
+            print(f"🔁 {project_key}: merged {len(issues)} issues updated since {since.isoformat()}")
+            if unplaced:
+                print(f"ℹ️ {len(unplaced)} updated issues are not in any known sprint: {unplaced}")
+
+        self._save_watermark(project_key, synced_at)
 
     # ------------------ Full Pipeline ------------------
-    def run_pipeline(self):
-        boards = self.get_all_boards()
-        projects = self.project_board_issues(boards)
-        print("Boards and Projects:", projects)
+    def index_digest(self, cleaned_folder):
+        """Digest of everything the combine → summarize → index stages read."""
+        cleaned = sorted(
+            (name, file_digest(os.path.join(cleaned_folder, name)))
+            for name in os.listdir(cleaned_folder) if name.endswith("_cleaned.json")
+        )
+        settings = {name: os.getenv(name) for name in (
+            "RETRIEVAL_BACKEND", "LOCAL_INDEX_DIR", "WEAVIATE_URL", "WEAVIATE_COLLECTION_NAME",
+            "EMBEDDING_MODE", "OPENAI_EMBEDDING_MODEL", "COMBINE_EXPORTS",
+        )}
+        return fingerprint({"cleaned": cleaned, "settings": settings})
+
+    @staticmethod
+    def local_index_dir():
+        return os.getenv("LOCAL_INDEX_DIR") or os.path.join("combined", "local_index")
+
+    def index_exists(self):
+        """Whether the retrieval backend still holds an index to skip re-uploading into."""
+        if (os.getenv("RETRIEVAL_BACKEND") or "weaviate").lower() == "local":
+            return os.path.exists(os.path.join(self.local_index_dir(), "meta.json"))
+        return weaviate_index_exists()
 
-        for project in projects:
-            print(f"🔄 Exporting project: {project['project_key']}")
-            self.fetch_project_data(project["project_key"])
+    def run_pipeline(self, incremental=False, job=None, force=False):
+        """Fetch → clean → combine → summarize → index, with checkpoints.
 
-        # ---- Cleaning + Upload to Weaviate ----
+        Progress is kept in ``pipeline_manifest.json`` in the data directory.
+        A run that failed part way is resumed by the next one if it started
+        within PIPELINE_RESUME_MAX_AGE. A full export then skips projects it
+        already fetched, while an incremental run always fetches again.
+        Projects whose stored issues did not change are not cleaned again,
+        and the upload skips objects committed at its last checkpoint. When
+        nothing the index reads has changed since the last successful upload
+        and the index is still there, indexing is skipped altogether.
+        ``force`` ignores the manifest. ``job`` records progress and can
+        cancel between units.
+        """
+        job = job or PipelineJob(params={"incremental": incremental})
+        manifest = PipelineManifest(os.path.join(self.output_dir, MANIFEST_NAME))
+        if force:
+            manifest.data = {"run": None, "outputs": {}}
+        manifest.begin({"incremental": incremental})
+        try:
+            result = self._run_stages(incremental, job, manifest)
+        except BaseException as e:
+            manifest.end("failed", error=f"{type(e).__name__}: {e}")
+            raise
+        manifest.end("succeeded")
+        return result
+
+    def _run_stages(self, incremental, job, manifest):
+        # ---- Fetch ----
+        if incremental and manifest.resumed:
+            # Incremental fetches are cheap; redo them rather than keep the failed run's snapshot.
+            manifest.reset_stage("fetch")
+        if manifest.stage_done("fetch"):
+            print("⏭️ Fetch already completed in this run, skipping.")
+        else:
+            manifest.start_stage("fetch")
+            job.start_stage("plan")
+            boards = self.get_all_boards()
+            projects = self.plan_fetch(boards)
+            print(f"🗺️ Fetch plan: {len(projects)} projects, {sum(len(p['boards']) for p in projects)} boards")
+
+            job.start_stage("fetch", total=len(projects))
+            for project in projects:
+                project_key = project["project_key"]
+                if manifest.item_done("fetch", project_key):
+                    print(f"⏭️ {project_key} already fetched in this run.")
+                elif incremental:
+                    self.sync_project(project_key, project["boards"])
+                else:
+                    synced_at = datetime.now(timezone.utc)
+                    print(f"🔄 Exporting project: {project_key}")
+                    self.fetch_project_data(project_key, project["boards"])
+                    self._save_watermark(project_key, synced_at)
+                manifest.commit_item("fetch", project_key)
+                job.advance("fetch")
+            manifest.finish_stage("fetch", projects=len(projects))
+        print(f"🗃️ Issue store: {self.issue_store.stats()}")
+
+        # ---- Cleaning ----
         input_folder = self.output_dir
         output_folder = f"{self.output_dir}_cleaned"
         processor = JiraAttachmentProcessor()
+        manifest.start_stage("clean")
         print("Starting data cleaning...",input_folder,output_folder)
-        process_all_files(input_folder, output_folder, processor)
-        combined_df, _ = combine_issues(output_folder)
-        upload_to_weaviate(combined_df)
+        process_all_files(input_folder, output_folder, processor, job=job, manifest=manifest)
+        manifest.finish_stage("clean")
+
+        # ---- Combine → summarize → index (streamed together) ----
+        digest = self.index_digest(output_folder)
+        if manifest.is_current("index", "all", digest):
+            if self.index_exists():
+                print("⏭️ Cleaned data and index settings unchanged since the last upload; skipping indexing.")
+                return None
+            print("⚠️ The index was removed since the last upload; rebuilding it.")
+        for stage in ("combine", "summarize", "index"):
+            manifest.start_stage(stage)
+        unsummarized = []
+
+        def note_unsummarized(items):
+            for issue in items:
+                if not issue.get("summary_llm"):
+                    unsummarized.append(issue.get("key"))
+                yield issue
+
+        load_errors = []
+        combined = job.track("combine", combine_issues(output_folder, failed=load_errors))
+        issues = job.track("index", note_unsummarized(summarize_issues(combined)))
+        if (os.getenv("RETRIEVAL_BACKEND") or "weaviate").lower() == "local":
+            backend = LocalHybridBackend(self.local_index_dir(), embed_fn=embedder_from_env())
+            result = backend.sync(issues, load_errors=load_errors)
+            print(f"🗂️ Local index: {result}")
+        else:
+            result = upload_to_weaviate(issues, load_errors=load_errors)
+        for stage in ("combine", "summarize", "index"):
+            manifest.finish_stage(stage)
+        # Failed uploads or summaries are retried by the next run, so only a clean pass is recorded.
+        if not (result or {}).get("failed") and not unsummarized and not load_errors:
+            manifest.record_output("index", "all", digest)
+        print("Jira request stats:", self.client.stats)
+        return result
 
 
 # if __name__ == "__main__":
@@ -0,0 +1,49 @@
+import os
+import json
+import hashlib
+import tempfile
+
+
+def fingerprint(obj):
+    """Stable content hash of a JSON-serializable object."""
+    payload = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class FingerprintStore:
+    """Per-issue content hashes persisted as a single JSON file.
+
+    Comparing the hashes of the objects about to be uploaded with the stored
+    ones tells which issues were added, changed, left unchanged or deleted
+    since the last successful upload.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hashes = {}
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "r", encoding="utf-8") as f:
+                self.hashes = json.load(f)
+
+    def get(self, key):
+        return self.hashes.get(key)
+
+    def update(self, new_hashes, deleted=()):
+        self.hashes.update(new_hashes)
+        for key in deleted:
+            self.hashes.pop(key, None)
+
+    def clear(self):
+        self.hashes = {}
+
+    def save(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        tmp_fd, tmp_path = tempfile.mkstemp(prefix="tmp_", dir=directory, text=True)
+        try:
+            with os.fdopen(tmp_fd, "w", encoding="utf-8") as f:
+                json.dump(self.hashes, f, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,159 @@
+import io
+import os
+import base64
+import hashlib
+import sqlite3
+import threading
+
+from PIL import Image
+
+
+# === Pre-processing ===
+def downscale_image(file_path, max_dim):
+    """Return (bytes, mime_type) of the image shrunk to fit ``max_dim`` pixels."""
+    with Image.open(file_path) as img:
+        img.thumbnail((max_dim, max_dim))
+        if img.mode in ("RGBA", "LA", "P"):
+            # Keep screenshots with transparency lossless.
+            buffer = io.BytesIO()
+            img.save(buffer, format="PNG", optimize=True)
+            return buffer.getvalue(), "image/png"
+        buffer = io.BytesIO()
+        img.convert("RGB").save(buffer, format="JPEG", quality=85, optimize=True)
+        return buffer.getvalue(), "image/jpeg"
+
+
+def perceptual_hash(file_path, hash_size=8):
+    """64-bit difference hash (dHash) of an image, as an int.
+
+    Near-identical screenshots (re-saved, rescaled, slightly recompressed)
+    produce hashes a few bits apart.
+    """
+    with Image.open(file_path) as img:
+        small = img.convert("L").resize((hash_size + 1, hash_size))
+        pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def pixel_hash(file_path):
+    """sha256 of an image's decoded pixels; unaffected by metadata or lossless re-saves."""
+    with Image.open(file_path) as img:
+        digest = hashlib.sha256(f"{img.mode}:{img.size}:".encode())
+        digest.update(img.tobytes())
+    return "px:" + digest.hexdigest()
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+# === Describer ===
+class ImageDescriber:
+    """Describes images with a vision model, reusing answers for repeats.
+
+    Images are downscaled before upload. By default a description is only
+    reused for an image with exactly the same pixels. IMAGE_MATCH_DISTANCE
+    > 0 opts into perceptual matching (dHash within that many bits), which
+    also catches rescaled or recompressed copies but can confuse screenshots
+    that share a layout. At most ``max_workers`` vision calls run at once,
+    and concurrent requests for the same image share one call.
+    """
+
+    PROMPT = "Please describe the contents of this image."
+
+    def __init__(self, client, cache_dir="attachment_cache", model="gpt-4o", max_dim=None,
+                 max_workers=None, max_distance=None):
+        self.client = client
+        self.model = model
+        self.max_dim = max_dim or int(os.getenv("IMAGE_MAX_DIM", "1024"))
+        self.max_distance = int(os.getenv("IMAGE_MATCH_DISTANCE", "0")) if max_distance is None else max_distance
+        self.max_workers = max_workers or int(os.getenv("IMAGE_VISION_WORKERS", "4"))
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "image_descriptions.sqlite"), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS descriptions (phash TEXT PRIMARY KEY, description TEXT)")
+        self._conn.commit()
+        # Keys are "px:<sha256>" pixel hashes, or 16-hex-digit dHashes in perceptual mode.
+        self._known = dict(self._conn.execute("SELECT phash, description FROM descriptions"))
+        self._in_flight = {}
+        self.stats = {"vision_calls": 0, "cache_hits": 0, "bytes_original": 0, "bytes_sent": 0}
+
+    def image_key(self, file_path):
+        if self.max_distance > 0:
+            return f"{perceptual_hash(file_path):016x}"
+        return pixel_hash(file_path)
+
+    def _lookup(self, key):
+        if key in self._known:
+            return self._known[key]
+        if self.max_distance > 0:
+            for known_key, description in self._known.items():
+                if not known_key.startswith("px:") and hamming_distance(int(key, 16), int(known_key, 16)) <= self.max_distance:
+                    return description
+        return None
+
+    def _remember(self, key, description):
+        with self._lock:
+            self._known[key] = description
+            self._conn.execute(
+                "INSERT OR REPLACE INTO descriptions (phash, description) VALUES (?, ?)", (key, description)
+            )
+            self._conn.commit()
+
+    def describe(self, file_path):
+        phash = self.image_key(file_path)
+
+        with self._lock:
+            description = self._lookup(phash)
+            if description is not None:
+                self.stats["cache_hits"] += 1
+                return description
+            waiter = self._in_flight.get(phash)
+            if waiter is None:
+                self._in_flight[phash] = threading.Event()
+
+        if waiter is not None:
+            waiter.wait()
+            with self._lock:
+                description = self._known.get(phash)
+                if description is not None:
+                    self.stats["cache_hits"] += 1
+                    return description
+            return self.describe(file_path)
+
+        try:
+            description = self._call_vision(file_path)
+            self._remember(phash, description)
+            return description
+        finally:
+            with self._lock:
+                self._in_flight.pop(phash).set()
+
+    def _call_vision(self, file_path):
+        payload, mime_type = downscale_image(file_path, self.max_dim)
+        encoded_image = base64.b64encode(payload).decode()
+        with self._lock:
+            self.stats["vision_calls"] += 1
+            self.stats["bytes_original"] += os.path.getsize(file_path)
+            self.stats["bytes_sent"] += len(payload)
+
+        with self._slots:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "user", "content": [
+                        {"type": "text", "text": self.PROMPT},
+                        {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{encoded_image}"}}
+                    ]}
+                ],
+                max_tokens=1000
+            )
+        return response.choices[0].message.content
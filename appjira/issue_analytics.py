@@ -0,0 +1,287 @@
+import os
+import re
+import json
+import tempfile
+import threading
+
+from fingerprint_store import fingerprint
+from query_planner import (
+    plan_query, matches, DONE_STATUSES, ISSUE_TYPES, STATUSES, PRIORITIES,
+    SPRINT_RE, LAST_N_RE, SINCE_RE, RELATIVE_DAYS,
+)
+
+ANALYTICS_PATH = os.getenv("ANALYTICS_PATH") or os.path.join("combined", "issue_analytics.json")
+
+# Dimensions issues are grouped by, and the words questions use for them.
+DIMENSIONS = {
+    "project_key": ("project", "projects"),
+    "sprint_name": ("sprint", "sprints"),
+    "status": ("status", "statuses", "state"),
+    "priority": ("priority", "priorities"),
+    "issue_type": ("type", "types", "issue type", "issue types"),
+    "reporter": ("reporter", "reporters"),
+    "creator": ("creator", "creators"),
+}
+RECORD_FIELDS = (
+    "key", "summary", "project_key", "project_name", "status", "priority", "issue_type",
+    "reporter", "creator", "created", "updated",
+)
+
+COUNT_RE = re.compile(r"\b(?:how many|number of|count(?: of)?|total)\b", re.IGNORECASE)
+LIST_RE = re.compile(r"\b(?:list|show)(?: me)?\s+(?:all|every)\b|\bwhat(?:'s| is| are)?\s+(?:left|remaining)\b", re.IGNORECASE)
+GROUP_RE = re.compile(r"\b(?:by|per|breakdown of|broken down by|grouped by)\s+(issue types?|[a-z]+)\b", re.IGNORECASE)
+CURRENT_SPRINT_RE = re.compile(r"\b(?:current|active|this)\s+sprint\b", re.IGNORECASE)
+ISSUES_RE = re.compile(r"\b(?:issues|tickets|bugs|stories|tasks|epics)\b", re.IGNORECASE)
+LEFT_RE = re.compile(r"\b(?:left|remaining|outstanding|not done)\b", re.IGNORECASE)
+# Words that may remain in an aggregate question once its filters are taken
+# out. Anything else ("mention the login timeout", "did Alice close") is a
+# predicate the analytics cannot apply, so the question goes to search.
+FILLER_WORDS = frozenset("""
+    a an the of in on for to with and or at from is are was were be been do does did has have had
+    there what which s me us we our i all every any each currently still now right so far please
+    how many much total number count jira issue issues ticket tickets item items
+    project projects sprint sprints status statuses priority priorities type types
+    created updated opened changed
+""".split())
+
+
+class IssueAnalytics:
+    """Precomputed issue counts and lists for aggregate questions.
+
+    Keeps one compact record per issue (with every sprint it appears in) and,
+    per dimension, the set of issue keys for each value. ``sync`` applies only
+    the issues whose record changed, so rebuilding after an incremental ingest
+    touches just those groups.
+    """
+
+    def __init__(self, path=ANALYTICS_PATH):
+        self.path = path
+        self.records = {}   # key -> compact issue record
+        self.hashes = {}    # key -> fingerprint of the record
+        self.groups = {dimension: {} for dimension in DIMENSIONS}
+        self.groups["sprint_state"] = {}
+        self._loaded_mtime = None
+        self._lock = threading.RLock()
+        if os.path.exists(path):
+            self._load()
+
+    # ------------------ Persistence ------------------
+    def _load(self):
+        self._loaded_mtime = os.path.getmtime(self.path)
+        with open(self.path, "r", encoding="utf-8") as f:
+            self.records = json.load(f)
+        self.hashes = {key: fingerprint(record) for key, record in self.records.items()}
+        self.groups = {dimension: {} for dimension in self.groups}
+        for key, record in self.records.items():
+            self._index(key, record)
+
+    def save(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        tmp_fd, tmp_path = tempfile.mkstemp(prefix="tmp_", dir=directory, text=True)
+        try:
+            with os.fdopen(tmp_fd, "w", encoding="utf-8") as f:
+                json.dump(self.records, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._loaded_mtime = os.path.getmtime(self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def reload_if_changed(self):
+        with self._lock:
+            if os.path.exists(self.path) and os.path.getmtime(self.path) != self._loaded_mtime:
+                self._load()
+
+    # ------------------ Indexing ------------------
+    @staticmethod
+    def _values(record, dimension):
+        if dimension == "sprint_name":
+            return [s["name"] for s in record.get("sprints", []) if s.get("name")]
+        if dimension == "sprint_state":
+            return [s["state"] for s in record.get("sprints", []) if s.get("state")]
+        value = record.get(dimension)
+        return [value] if value else []
+
+    def _index(self, key, record):
+        for dimension, groups in self.groups.items():
+            for value in self._values(record, dimension):
+                groups.setdefault(value, set()).add(key)
+
+    def _unindex(self, key, record):
+        for dimension, groups in self.groups.items():
+            for value in self._values(record, dimension):
+                keys = groups.get(value)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del groups[value]
+
+    @staticmethod
+    def _build_records(issues):
+        """One record per key; an issue listed under several sprints keeps all of them."""
+        records = {}
+        for issue in issues:
+            key = issue.get("key")
+            if not key:
+                continue
+            record = records.get(key)
+            if record is None:
+                record = {field: str(issue.get(field) or "") for field in RECORD_FIELDS}
+                record["sprints"] = []
+                records[key] = record
+            # Canonical issues list every sprint; per-sprint rows carry one each.
+            sprints = issue.get("sprints") or [{
+                "id": issue.get("sprint_id"),
+                "name": issue.get("sprint_name"),
+                "state": issue.get("sprint_state"),
+            }]
+            for sprint in sprints:
+                sprint = {"id": sprint.get("id"), "name": sprint.get("name"), "state": sprint.get("state")}
+                if sprint["name"] and sprint not in record["sprints"]:
+                    record["sprints"].append(sprint)
+        return records
+
+    def sync(self, issues, delete_missing=True):
+        """Update the groups for added/changed issues and drop vanished ones (if ``delete_missing``)."""
+        with self._lock:
+            records = self._build_records(issues)
+            changed = 0
+            for key in [k for k in self.records if delete_missing and k not in records]:
+                self._unindex(key, self.records.pop(key))
+                self.hashes.pop(key, None)
+            for key, record in records.items():
+                record_hash = fingerprint(record)
+                if self.hashes.get(key) == record_hash:
+                    continue
+                if key in self.records:
+                    self._unindex(key, self.records[key])
+                self.records[key] = record
+                self.hashes[key] = record_hash
+                self._index(key, record)
+                changed += 1
+            self.save()
+            return {"changed": changed, "total": len(self.records)}
+
+    # ------------------ Queries ------------------
+    def project_keys(self):
+        """Project keys present in the data, for the query planner."""
+        self.reload_if_changed()
+        with self._lock:
+            return set(self.groups["project_key"])
+
+    def select(self, filters, current_sprint=False):
+        """Keys of issues matching planner-style filters."""
+        with self._lock:
+            keys = set(self.records)
+            if current_sprint:
+                keys &= self.groups["sprint_state"].get("active", set())
+            for field, condition in (filters or {}).items():
+                # Records keep every sprint, grouped under the sprint_name dimension.
+                groups = self.groups.get("sprint_name" if field == "sprint_names" else field)
+                for op, expected in condition.items():
+                    if groups is not None and op in ("eq", "in"):
+                        values = [expected] if op == "eq" else expected
+                        lowered = {str(v).lower() for v in values}
+                        selected = set()
+                        for value, members in groups.items():
+                            if str(value).lower() in lowered:
+                                selected |= members
+                        keys &= selected
+                    elif groups is not None and op == "not_in":
+                        lowered = {str(v).lower() for v in expected}
+                        for value, members in groups.items():
+                            if str(value).lower() in lowered:
+                                keys -= members
+                    elif field == "sprint_names" and op == "match":
+                        selected = set()
+                        for value, members in groups.items():
+                            if matches({"sprint_name": value}, {"sprint_name": {"match": expected}}):
+                                selected |= members
+                        keys &= selected
+                    else:
+                        keys = {k for k in keys if matches(self.records[k], {field: {op: expected}})}
+            return keys
+
+    def group_counts(self, keys, dimension):
+        with self._lock:
+            counts = {}
+            for value, members in self.groups.get(dimension, {}).items():
+                overlap = len(members & keys)
+                if overlap:
+                    counts[value] = overlap
+            return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+    def answer(self, question, max_listed=50):
+        """Exact answer to an aggregate question, or None if it is not one."""
+        wants_count = bool(COUNT_RE.search(question))
+        group = GROUP_RE.search(question)
+        dimension = None
+        if group:
+            word = group.group(1).lower()
+            dimension = next((d for d, words in DIMENSIONS.items() if word in words), None)
+        current_sprint = bool(CURRENT_SPRINT_RE.search(question))
+        wants_list = bool(LIST_RE.search(question)) or (current_sprint and LEFT_RE.search(question))
+        if not (wants_count or dimension or wants_list):
+            return None
+
+        self.reload_if_changed()
+        if not self.records:
+            return None
+
+        projects = self.project_keys()
+        if self._unrecognized_words(question, projects, group if dimension else None):
+            return None
+        filters = plan_query(question, known_projects=projects)["filters"]
+        if current_sprint:
+            filters.pop("sprint_names", None)
+        if LEFT_RE.search(question) and "status" not in filters:
+            filters["status"] = {"not_in": DONE_STATUSES}
+        if not filters and not current_sprint and not dimension and not ISSUES_RE.search(question):
+            # e.g. "how many retries does the client do?" is a search question.
+            return None
+
+        keys = self.select(filters, current_sprint=current_sprint)
+        scope = "in the current sprint" if current_sprint else "matching"
+
+        if dimension:
+            counts = self.group_counts(keys, dimension)
+            lines = [f"- {value}: {count}" for value, count in counts.items()]
+            return f"{len(keys)} issues {scope}, by {dimension.replace('_', ' ')}:\n" + "\n".join(lines)
+
+        if wants_count and not wants_list:
+            return f"{len(keys)} issues {scope} ({self._describe(filters)})."
+
+        with self._lock:
+            listed = sorted(keys)[:max_listed]
+            lines = [
+                f"- {k}: {self.records[k]['summary']} [{self.records[k]['status']} | {self.records[k]['priority']}]"
+                for k in listed
+            ]
+        more = f"\n... and {len(keys) - len(listed)} more." if len(keys) > len(listed) else ""
+        return f"{len(keys)} issues {scope} ({self._describe(filters)}):\n" + "\n".join(lines) + more
+
+    @staticmethod
+    def _unrecognized_words(question, projects, group=None):
+        """Words of ``question`` not covered by a filter, grouping or filler word."""
+        text = (question if group is None else question.replace(group.group(0), " ")).lower()
+        # Status and priority words are recognized by the issue words after them, so those go last.
+        for pattern, _ in STATUSES + PRIORITIES + ISSUE_TYPES:
+            text = re.sub(pattern, " ", text)
+        for pattern in (COUNT_RE, LIST_RE, CURRENT_SPRINT_RE, ISSUES_RE, LEFT_RE, SPRINT_RE, LAST_N_RE, SINCE_RE):
+            text = pattern.sub(" ", text)
+        for phrase in RELATIVE_DAYS:
+            text = text.replace(phrase, " ")
+        projects = {p.lower() for p in projects}
+        return [w for w in re.findall(r"[a-z0-9]+", text) if w not in FILLER_WORDS and w not in projects]
+
+    @staticmethod
+    def _describe(filters):
+        parts = []
+        for field, condition in filters.items():
+            for op, value in condition.items():
+                if isinstance(value, list):
+                    value = ", ".join(map(str, value))
+                symbol = {"eq": "=", "in": "in", "not_in": "not in", "match": "~", "gte": ">=", "lte": "<="}[op]
+                parts.append(f"{field} {symbol} {value}")
+        return "; ".join(parts) or "all issues"
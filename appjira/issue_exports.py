@@ -0,0 +1,137 @@
+import os
+import csv
+import json
+
+# Columns written by the tabular formats (csv, xlsx, parquet); json/jsonl keep every field.
+EXPORT_COLUMNS = (
+    "key", "project_key", "project_name", "summary", "description", "issue_type", "status",
+    "priority", "created", "updated", "reporter", "creator", "subtasks", "files",
+    "parent_summary", "parent_key", "parent_priority", "parent_description", "parent_issuetype",
+    "parent_issuetype_icon", "board_id", "board_name", "sprint_id", "sprint_name", "sprint_state", "sprints",
+)
+INT_COLUMNS = ("board_id", "sprint_id")
+EXPORT_FORMATS = ("jsonl", "json", "csv", "xlsx", "parquet")
+XLSX_CELL_LIMIT = 32767
+PARQUET_ROW_GROUP = 10000
+
+
+def exports_from_env():
+    """Formats listed in COMBINE_EXPORTS (comma separated); jsonl by default."""
+    value = os.getenv("COMBINE_EXPORTS", "jsonl")
+    formats = [f.strip().lower() for f in value.split(",") if f.strip() and f.strip().lower() != "none"]
+    unknown = [f for f in formats if f not in EXPORT_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown export format(s) {unknown}; choose from {EXPORT_FORMATS}")
+    return formats
+
+
+def _cell(issue, column):
+    value = issue.get(column)
+    if column in INT_COLUMNS:
+        try:
+            return None if value is None or value == "" else int(value)
+        except (TypeError, ValueError):
+            return None
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return "" if value is None else str(value)
+
+
+class IssueExporter:
+    """Writes combined issues to the requested formats one issue at a time.
+
+    Every writer streams, so memory does not grow with the number of issues:
+    json is written as an array element by element, xlsx uses xlsxwriter's
+    constant_memory mode and parquet is flushed in row groups with pyarrow.
+    """
+
+    def __init__(self, output_path, formats=("jsonl",)):
+        self.output_path = output_path
+        self.formats = list(formats)
+        self.count = 0
+        self._files = {}
+        self._csv = None
+        self._sheet = None
+        self._sheet_row = 0
+        self._workbook = None
+        self._parquet = None
+        self._parquet_rows = []
+        self._closed = False
+        os.makedirs(output_path, exist_ok=True)
+
+        if "jsonl" in self.formats:
+            self._files["jsonl"] = open(self._path("jsonl"), "w", encoding="utf-8")
+        if "json" in self.formats:
+            self._files["json"] = open(self._path("json"), "w", encoding="utf-8")
+            self._files["json"].write("[")
+        if "csv" in self.formats:
+            self._files["csv"] = open(self._path("csv"), "w", encoding="utf-8", newline="")
+            self._csv = csv.writer(self._files["csv"])
+            self._csv.writerow(EXPORT_COLUMNS)
+        if "xlsx" in self.formats:
+            import xlsxwriter
+            # Cells are text as exported, not formulas or links.
+            self._workbook = xlsxwriter.Workbook(self._path("xlsx"), {
+                "constant_memory": True, "strings_to_formulas": False, "strings_to_urls": False,
+            })
+            self._sheet = self._workbook.add_worksheet()
+            self._append_row(EXPORT_COLUMNS)
+        if "parquet" in self.formats:
+            import pyarrow  # noqa: F401  (fail before streaming, not at the first row group)
+
+    def _path(self, fmt):
+        return os.path.join(self.output_path, f"all_issues.{fmt}")
+
+    def _append_row(self, values):
+        self._sheet.write_row(self._sheet_row, 0, values)
+        self._sheet_row += 1
+
+    def write(self, issue):
+        if "jsonl" in self._files:
+            self._files["jsonl"].write(json.dumps(issue, ensure_ascii=False) + "\n")
+        if "json" in self._files:
+            separator = ",\n" if self.count else "\n"
+            self._files["json"].write(separator + json.dumps(issue, indent=2, ensure_ascii=False))
+        if self._csv is not None or self._sheet is not None or "parquet" in self.formats:
+            row = [_cell(issue, column) for column in EXPORT_COLUMNS]
+            if self._csv is not None:
+                self._csv.writerow(row)
+            if self._sheet is not None:
+                self._append_row([v[:XLSX_CELL_LIMIT] if isinstance(v, str) else v for v in row])
+            if "parquet" in self.formats:
+                self._parquet_rows.append(row)
+                if len(self._parquet_rows) >= PARQUET_ROW_GROUP:
+                    self._flush_parquet()
+        self.count += 1
+
+    def _flush_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        columns = list(zip(*self._parquet_rows)) if self._parquet_rows else [[] for _ in EXPORT_COLUMNS]
+        schema = pa.schema([
+            (column, pa.int64() if column in INT_COLUMNS else pa.string()) for column in EXPORT_COLUMNS
+        ])
+        table = pa.Table.from_arrays([pa.array(list(values), type=field.type) for values, field in zip(columns, schema)], schema=schema)
+        if self._parquet is None:
+            self._parquet = pq.ParquetWriter(self._path("parquet"), schema)
+        self._parquet.write_table(table)
+        self._parquet_rows = []
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if "json" in self._files:
+            self._files["json"].write("\n]\n")
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+            self._sheet = None
+        if "parquet" in self.formats:
+            if self._parquet_rows or self._parquet is None:
+                self._flush_parquet()
+            self._parquet.close()
+            self._parquet = None
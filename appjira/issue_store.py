@@ -0,0 +1,162 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+
+from fingerprint_store import fingerprint
+
+ISSUE_STORE_NAME = "issue_store.sqlite"
+SPRINT_FIELDS = ("id", "name", "state", "startDate", "endDate", "board_id", "board_name")
+# Preferred sprint to describe an issue by when it belongs to several.
+SPRINT_STATE_RANK = {"active": 0, "future": 1, "closed": 2}
+
+
+def primary_sprint(sprints):
+    """The active sprint if any, else the most recent one."""
+    if not sprints:
+        return None
+    return min(sprints, key=lambda s: (SPRINT_STATE_RANK.get(s.get("state"), 3), -(s.get("id") or 0)))
+
+
+class IssueStore:
+    """One canonical raw Jira issue per key, plus the sprints it belongs to.
+
+    An issue that carries over across sprints (or shows up on several boards)
+    is stored once, so it is cleaned and its attachments downloaded once.
+    Sprint membership is kept in its own table, keyed by (issue, sprint).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS issues (
+                key TEXT PRIMARY KEY, project_key TEXT, hash TEXT, data TEXT
+            );
+            CREATE INDEX IF NOT EXISTS issues_project ON issues (project_key);
+            CREATE TABLE IF NOT EXISTS sprints (
+                id INTEGER PRIMARY KEY, project_key TEXT, data TEXT
+            );
+            CREATE TABLE IF NOT EXISTS memberships (
+                issue_key TEXT, sprint_id INTEGER, PRIMARY KEY (issue_key, sprint_id)
+            );
+        """)
+        self._conn.commit()
+
+    # ------------------ Writes ------------------
+    def _write_issues(self, project_key, issues):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO issues (key, project_key, hash, data) VALUES (?, ?, ?, ?)",
+            [(issue["key"], project_key, fingerprint(issue), json.dumps(issue)) for issue in issues],
+        )
+
+    def replace_project(self, project_key, sprints, issues, memberships):
+        """Swap in a full export of ``project_key`` in one transaction."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM memberships WHERE issue_key IN (SELECT key FROM issues WHERE project_key = ?)",
+                (project_key,),
+            )
+            self._conn.execute("DELETE FROM issues WHERE project_key = ?", (project_key,))
+            self._conn.execute("DELETE FROM sprints WHERE project_key = ?", (project_key,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sprints (id, project_key, data) VALUES (?, ?, ?)",
+                [(sprint["id"], project_key, json.dumps({f: sprint.get(f) for f in SPRINT_FIELDS})) for sprint in sprints],
+            )
+            self._write_issues(project_key, issues)
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO memberships (issue_key, sprint_id) VALUES (?, ?)", sorted(memberships)
+            )
+
+    def upsert_sprints(self, project_key, sprints):
+        """Add new sprints of ``project_key`` and refresh the state and dates of known ones."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sprints (id, project_key, data) VALUES (?, ?, ?)",
+                [(sprint["id"], project_key, json.dumps({f: sprint.get(f) for f in SPRINT_FIELDS})) for sprint in sprints],
+            )
+
+    def upsert_issues(self, project_key, issues, memberships):
+        """Replace ``issues``; issues with entries in ``memberships`` get exactly those sprints."""
+        with self._lock, self._conn:
+            self._write_issues(project_key, issues)
+            for key in {key for key, _ in memberships}:
+                self._conn.execute("DELETE FROM memberships WHERE issue_key = ?", (key,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO memberships (issue_key, sprint_id) VALUES (?, ?)", sorted(memberships)
+            )
+
+    # ------------------ Reads ------------------
+    def projects(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT project_key FROM issues ORDER BY project_key")]
+
+    def has_project(self, project_key):
+        """True once a full export of ``project_key`` stored any sprint or issue (kanban projects have no sprints)."""
+        with self._lock:
+            for table in ("sprints", "issues"):
+                if self._conn.execute(f"SELECT 1 FROM {table} WHERE project_key = ? LIMIT 1", (project_key,)).fetchone():
+                    return True
+            return False
+
+    def known_keys(self, keys):
+        keys = list(keys)
+        found = set()
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._conn.execute(f"SELECT key FROM issues WHERE key IN ({','.join('?' * len(part))})", part)
+                found.update(row[0] for row in rows)
+        return found
+
+    def sprint_ids(self, project_key):
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT id FROM sprints WHERE project_key = ?", (project_key,))}
+
+    def iter_project_issues(self, project_key):
+        """Yield ``(issue, sprints)`` for every issue of a project, by key."""
+        with self._lock:
+            sprints = {
+                sprint_id: json.loads(data)
+                for sprint_id, data in self._conn.execute("SELECT id, data FROM sprints WHERE project_key = ?", (project_key,))
+            }
+            members = {}
+            for issue_key, sprint_id in self._conn.execute(
+                "SELECT m.issue_key, m.sprint_id FROM memberships m JOIN issues i ON i.key = m.issue_key "
+                "WHERE i.project_key = ? ORDER BY m.sprint_id", (project_key,)
+            ):
+                if sprint_id in sprints:
+                    members.setdefault(issue_key, []).append(sprints[sprint_id])
+            rows = self._conn.execute(
+                "SELECT key, data FROM issues WHERE project_key = ? ORDER BY key", (project_key,)
+            ).fetchall()
+        for key, data in rows:
+            yield json.loads(data), members.get(key, [])
+
+    def project_digest(self, project_key):
+        """Hash of a project's issues, sprints and memberships; changes whenever any of them does."""
+        digest = hashlib.sha256()
+        with self._lock:
+            queries = (
+                ("SELECT key, hash FROM issues WHERE project_key = ? ORDER BY key", (project_key,)),
+                ("SELECT id, data FROM sprints WHERE project_key = ? ORDER BY id", (project_key,)),
+                ("SELECT m.issue_key, m.sprint_id FROM memberships m JOIN issues i ON i.key = m.issue_key "
+                 "WHERE i.project_key = ? ORDER BY m.issue_key, m.sprint_id", (project_key,)),
+            )
+            for query, args in queries:
+                for row in self._conn.execute(query, args):
+                    digest.update(json.dumps(row).encode("utf-8"))
+                digest.update(b"\0")
+        return digest.hexdigest()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "issues": self._conn.execute("SELECT COUNT(*) FROM issues").fetchone()[0],
+                "sprints": self._conn.execute("SELECT COUNT(*) FROM sprints").fetchone()[0],
+                "memberships": self._conn.execute("SELECT COUNT(*) FROM memberships").fetchone()[0],
+            }
@@ -0,0 +1,105 @@
+import os
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain.chat_models import ChatOpenAI
+from langchain.schema import HumanMessage
+
+from fingerprint_store import fingerprint
+from issue_text import format_issue_doc, iter_windows
+
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL") or "gpt-3.5-turbo"
+SUMMARY_FIELDS = ("project_name", "key", "summary", "description", "status", "priority")
+
+
+class SummaryStore:
+    """``{issue key: {"hash": ..., "summary": ...}}`` persisted as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, key, content_hash):
+        entry = self.entries.get(key)
+        if entry and entry.get("hash") == content_hash:
+            return entry.get("summary")
+        return None
+
+    def put(self, key, content_hash, summary):
+        self.entries[key] = {"hash": content_hash, "summary": summary}
+
+    def save(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        tmp_fd, tmp_path = tempfile.mkstemp(prefix="tmp_", dir=directory, text=True)
+        try:
+            with os.fdopen(tmp_fd, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def summarize_issue(llm, props: dict) -> str:
+    prompt = f"Summarize this Jira issue in one short sentence:\n{format_issue_doc(props)}"
+    return llm([HumanMessage(content=prompt)]).content.strip()
+
+
+def summarize_issues(issues, store_path=os.path.join("combined", "issue_summaries.json"), llm=None, max_workers=None, window=None):
+    """Yield every issue with a ``summary_llm`` field holding a one-sentence summary.
+
+    Summaries are keyed by a hash of the fields they are generated from, so an
+    issue is only sent to the LLM again when one of those fields changes.
+    Issues are consumed in windows of SUMMARY_WINDOW, so a stream of any size
+    passes through with bounded memory.
+    """
+    store = SummaryStore(store_path)
+    window = window or int(os.getenv("SUMMARY_WINDOW", "256"))
+    workers = max_workers or int(os.getenv("SUMMARY_MAX_WORKERS", "8"))
+    executor = None
+    generated = reused = unsaved = 0
+
+    def run(item):
+        key, (record, content_hash) = item
+        try:
+            return key, content_hash, summarize_issue(llm, record)
+        except Exception as e:
+            print(f"❌ Failed to summarize {key}: {e}")
+            return key, content_hash, None
+
+    try:
+        for records in iter_windows(issues, window):
+            hashes = [fingerprint({field: str(r.get(field, "")) for field in SUMMARY_FIELDS}) for r in records]
+            todo = {}
+            for record, content_hash in zip(records, hashes):
+                key = str(record.get("key", ""))
+                if store.get(key, content_hash) is None:
+                    todo[key] = (record, content_hash)
+            reused += len(records) - len(todo)
+
+            if todo:
+                llm = llm or ChatOpenAI(openai_api_key=os.getenv("OPENAI_API_KEY"), model=SUMMARY_MODEL, temperature=0)
+                executor = executor or ThreadPoolExecutor(max_workers=workers)
+                for key, content_hash, summary in executor.map(run, todo.items()):
+                    if summary is not None:
+                        store.put(key, content_hash, summary)
+                        generated += 1
+                        unsaved += 1
+                if unsaved >= 1000:
+                    store.save()
+                    unsaved = 0
+
+            for record, content_hash in zip(records, hashes):
+                record["summary_llm"] = store.get(str(record.get("key", "")), content_hash) or ""
+                yield record
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if unsaved:
+            store.save()
+    print(f"🧾 Summaries: {generated} generated, {reused} reused.")
@@ -0,0 +1,33 @@
+def format_issue_doc(props: dict) -> str:
+    """Plain-text block describing one issue, as fed to the LLM"""
+    return (
+        f"🔹 Project: {props.get('project_name', 'Unknown Project')}\n"
+        f"Issue Key: {props.get('key', '')}\n"
+        f"Summary: {props.get('summary', '')}\n"
+        f"Description: {props.get('description', '')}\n"
+        f"Status: {props.get('status', '')} | Priority: {props.get('priority', '')}\n"
+    )
+
+
+def sprint_names(issue: dict) -> list:
+    """Names of every sprint an issue is in, from its ``sprints`` list (or the single ``sprint_name``)."""
+    sprints = issue.get("sprints")
+    if isinstance(sprints, list):
+        names = [s.get("name") for s in sprints if isinstance(s, dict)]
+    elif isinstance(issue.get("sprint_names"), list):
+        names = issue["sprint_names"]
+    else:
+        names = [issue.get("sprint_name")]
+    return list(dict.fromkeys(str(name) for name in names if isinstance(name, str) and name))
+
+
+def iter_windows(items, size):
+    """Yield lists of up to ``size`` consecutive items from any iterable."""
+    window = []
+    for item in items:
+        window.append(item)
+        if len(window) >= size:
+            yield window
+            window = []
+    if window:
+        yield window
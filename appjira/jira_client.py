@@ -0,0 +1,163 @@
+import os
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class JiraClient:
+    """Pooled, rate-limit aware HTTP client for the Jira REST and Agile APIs.
+
+    All requests go through a single ``requests.Session`` whose connection pool
+    is sized to ``max_workers`` so concurrent page fetches reuse keep-alive
+    connections. A semaphore of the same size bounds the requests in flight,
+    even when ``map`` calls are nested (boards mapped, then each board's pages). ``base_url`` can point at any server speaking the Jira API,
+    which makes the client easy to exercise against a local fake server.
+    """
+
+    RETRY_STATUSES = {429, 502, 503, 504}
+
+    def __init__(self, base_url, auth=None, headers=None, max_workers=None, page_size=None,
+                 max_retries=5, backoff=1.0, max_backoff=60.0, timeout=30):
+        self.base_url = (base_url or "").rstrip("/")
+        self.max_workers = max_workers or int(os.getenv("JIRA_MAX_WORKERS", "8"))
+        self.page_size = page_size or int(os.getenv("JIRA_PAGE_SIZE", "50"))
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.auth = auth
+        self.session.headers.update(headers or {"Accept": "application/json"})
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+
+        # Shared pause so one throttled worker holds back all the others.
+        self._pause_lock = threading.Lock()
+        self._pause_until = 0.0
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0}
+
+    def close(self):
+        self.session.close()
+
+    # ------------------ Rate Limiting ------------------
+    def _retry_delay(self, response, attempt):
+        """Seconds to wait before retrying, preferring the server's hints."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+
+        reset = response.headers.get("X-RateLimit-Reset") if response is not None else None
+        if reset:
+            try:
+                reset_at = datetime.fromisoformat(reset.replace("Z", "+00:00"))
+                delay = (reset_at - datetime.now(timezone.utc)).total_seconds()
+                if delay > 0:
+                    return min(delay, self.max_backoff)
+            except ValueError:
+                pass
+
+        delay = min(self.backoff * (2 ** attempt), self.max_backoff)
+        return delay + random.uniform(0, delay / 2)
+
+    def _count(self, name):
+        with self._pause_lock:
+            self.stats[name] += 1
+
+    def _pause(self, seconds):
+        with self._pause_lock:
+            self._pause_until = max(self._pause_until, time.monotonic() + seconds)
+
+    def _wait_if_paused(self):
+        with self._pause_lock:
+            remaining = self._pause_until - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    # ------------------ Requests ------------------
+    def get(self, endpoint, params=None):
+        """GET ``endpoint`` and return the decoded JSON, retrying on throttling."""
+        url = endpoint if endpoint.startswith("http") else f"{self.base_url}{endpoint}"
+
+        for attempt in range(self.max_retries + 1):
+            self._wait_if_paused()
+            response = None
+            try:
+                with self._slots:
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+                self._count("requests")
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if response.status_code not in self.RETRY_STATUSES:
+                    if response.headers.get("X-RateLimit-Remaining") == "0":
+                        self._pause(self._retry_delay(response, attempt))
+                    response.raise_for_status()
+                    return response.json()
+                if attempt >= self.max_retries:
+                    response.raise_for_status()
+                if response.status_code == 429:
+                    self._count("throttled")
+
+            delay = self._retry_delay(response, attempt)
+            self._count("retries")
+            print(f"⏳ Retrying {url} in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+            self._pause(delay)
+
+    def paginate(self, endpoint, params=None, items_key="values"):
+        """Return every item of a paged endpoint.
+
+        Endpoints that report ``total`` (issue listings) have their remaining
+        pages fetched concurrently once the first page is known. Endpoints that
+        only report ``isLast`` (boards, sprints) are walked page by page, and
+        so are those paged by ``nextPageToken`` (``/rest/api/3/search/jql``).
+        """
+        params = dict(params or {})
+        params.setdefault("maxResults", self.page_size)
+        first = self.get(endpoint, {**params, "startAt": 0})
+        items = list(first.get(items_key, []))
+        page_size = first.get("maxResults") or params["maxResults"]
+
+        if "nextPageToken" in first:
+            page = first
+            while page.get("nextPageToken") and not page.get("isLast", False):
+                page = self.get(endpoint, {**params, "nextPageToken": page["nextPageToken"]})
+                items.extend(page.get(items_key, []))
+            return items
+
+        total = first.get("total")
+        if total is not None and "isLast" not in first:
+            starts = list(range(len(items), total, page_size)) if items else []
+            pages = self.map(lambda start: self.get(endpoint, {**params, "startAt": start}), starts)
+            for page in pages:
+                items.extend(page.get(items_key, []))
+            return items
+
+        start = len(items)
+        page = first
+        while items and not page.get("isLast", True) and page.get(items_key):
+            page = self.get(endpoint, {**params, "startAt": start})
+            batch = page.get(items_key, [])
+            items.extend(batch)
+            start += len(batch)
+        return items
+
+    def map(self, fn, items):
+        """Apply ``fn`` to ``items`` concurrently, preserving input order."""
+        items = list(items)
+        if len(items) <= 1 or self.max_workers <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(fn, items))
@@ -94,7 +94,7 @@ def run_jira_pipeline():
     output_folder = "board_project_data_cleaned"
     processor = JiraAttachmentProcessor()
     process_all_files(input_folder, output_folder, processor)
-    df ,json_all_issues = combine_issues(output_folder)
+    json_all_issues = list(combine_issues(output_folder))
     # print(df)
     # print(json_all_issues)
     # with open(os.path.join(output_path, "project_summary.json"), "w", encoding="utf-8") as f:
@@ -0,0 +1,175 @@
+import os
+import time
+import json
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+
+INGEST_VERSION_PATH = os.getenv("INGEST_VERSION_PATH") or os.path.join("combined", "ingest_version.txt")
+
+
+# === Ingest version ===
+def read_ingest_version(path=INGEST_VERSION_PATH) -> int:
+    """Version of the indexed data; answer cache entries from older versions are stale."""
+    try:
+        with open(path, "r") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_ingest_version(path=INGEST_VERSION_PATH) -> int:
+    version = read_ingest_version(path) + 1
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write(str(version))
+    return version
+
+
+# === Backends ===
+class MemoryLRUBackend:
+    """In-process LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries=2048, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteBackend:
+    """On-disk cache shared by every worker process pointing at the same file."""
+
+    def __init__(self, path="llm_cache.sqlite", ttl=3600):
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl),
+            )
+            self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+
+# === Cache ===
+class LLMCache:
+    """Caches LLM responses by model and prompt hash.
+
+    Concurrent misses for the same key inside one event loop wait for a
+    single upstream call. Hit/miss counts are kept per ``kind`` (e.g. "rewrite",
+    "answer") so each hit ratio can be reported separately.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._async_in_flight = {}
+
+    @staticmethod
+    def make_key(model, prompt, version=None):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{model}:{version if version is not None else '-'}:{digest}"
+
+    def _record(self, kind, hit):
+        with self._lock:
+            counts = self.counts.setdefault(kind, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    async def aget_or_call(self, kind, model, prompt, call, version=None):
+        """Return the cached response for ``prompt`` or compute it with ``call()`` (an awaitable).
+
+        Backend lookups run in a thread so SQLite never blocks the event loop.
+        If the task computing a response is cancelled, tasks waiting on it
+        retry instead of hanging.
+        """
+        key = self.make_key(model, prompt, version)
+        value = await asyncio.to_thread(self.backend.get, key)
+        if value is not None:
+            self._record(kind, True)
+            return value
+
+        pending = self._async_in_flight.get(key)
+        if pending is not None:
+            try:
+                value = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # this task itself was cancelled
+                return await self.aget_or_call(kind, model, prompt, call, version)
+            self._record(kind, True)
+            return value
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_in_flight[key] = future
+        try:
+            self._record(kind, False)
+            value = await call()
+            await asyncio.to_thread(self.backend.set, key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved in case nobody else was waiting.
+            future.exception()
+            raise
+        finally:
+            # Cancelled (a BaseException): release the waiters.
+            if not future.done():
+                future.cancel()
+            self._async_in_flight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = {}
+            for kind, counts in self.counts.items():
+                lookups = counts["hits"] + counts["misses"]
+                stats[kind] = {**counts, "hit_ratio": counts["hits"] / lookups if lookups else 0.0}
+            return stats
+
+
+def cache_from_env():
+    """Build the cache selected by LLM_CACHE_BACKEND (memory, sqlite or none)."""
+    backend = (os.getenv("LLM_CACHE_BACKEND") or "memory").lower()
+    ttl = float(os.getenv("LLM_CACHE_TTL", "3600"))
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        return LLMCache(SQLiteBackend(os.getenv("LLM_CACHE_PATH") or "llm_cache.sqlite", ttl=ttl))
+    return LLMCache(MemoryLRUBackend(int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048")), ttl=ttl))
@@ -1,12 +1,17 @@
 from fastapi import FastAPI, Request,HTTPException
+from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 # from appjira.rag_engine import run_rag_query
 # from appjira.jira_fetcher import run_jira_pipeline
-from rag_engine import run_rag_query
+from rag_engine import run_rag_queries, llm_cache_stats, retrieval_backend
+from webhook_indexer import WebhookIndexer, sink_for_backend, parse_webhook_event
+from webhook_insert import upsert_issue, delete_issue, export_csv
 # from jira_fetcher import run_jira_pipeline
 
 from datetime import datetime
 from fetch_all import JiraPipeline
+from pipeline_jobs import JobRunner, JobConflict
 from dotenv import load_dotenv
 
 import os
@@ -17,12 +22,15 @@ import json
 
 
 app = FastAPI()
+webhook_indexer = WebhookIndexer(sink_for_backend(retrieval_backend))
 
 # Load env
 load_dotenv("/Users/hemasagarendluri1996/Jira_RAG/.env")
 JIRA_DOMAIN = os.getenv("JIRA_URL")
 API_TOKEN = os.getenv("JIRA_API_TOKEN")
 EMAIL = os.getenv("USER_EMAIL")
+JIRA_DATA_DIR = os.getenv("JIRA_DATA_DIR", "board_project_data")
+job_runner = JobRunner()
 
 
 # Accept a list of questions
@@ -30,33 +38,111 @@ class QueryRequest(BaseModel):
     questions: list[str]
 
 @app.post("/rag-query/")
-def rag_query(payload: QueryRequest):
+async def rag_query(payload: QueryRequest):
     try:
-        responses = {}
-        for question in payload.questions:
-            result = run_rag_query(question)
-            responses[question] = result
+        responses = await run_rag_queries(payload.questions)
         return {"responses": responses}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/fetch-jira-data/")
-def fetch_jira_data():
+@app.get("/llm-cache-stats/")
+def get_llm_cache_stats():
+    return {"stats": llm_cache_stats()}
+
+
+def start_fetch_job(incremental: bool, force: bool = False):
     try:
-        pipeline = JiraPipeline()
-        pipeline.run_pipeline()
-        return {"status": "Pipeline executed successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    
+        job = job_runner.start(
+            JIRA_DATA_DIR,
+            lambda job: JiraPipeline(output_dir=JIRA_DATA_DIR).run_pipeline(incremental=incremental, job=job, force=force),
+            name="fetch-jira-data",
+            params={"incremental": incremental, "force": force},
+        )
+    except JobConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "job_id": e.job_id})
+    return job.to_dict()
+
+
+# force=true ignores the checkpoints of earlier runs and redoes every stage.
+@app.post("/fetch-jira-data/", status_code=202)
+def fetch_jira_data(incremental: bool = False, force: bool = False):
+    return start_fetch_job(incremental, force)
+
+
+# Kept for existing callers: now starts a background job instead of blocking.
+@app.get("/fetch-jira-data/", status_code=202)
+def fetch_jira_data_get(incremental: bool = False, force: bool = False):
+    return start_fetch_job(incremental, force)
+
+
+@app.get("/fetch-jira-data/jobs/")
+def list_fetch_jobs():
+    return {"jobs": job_runner.list()}
+
+
+@app.get("/fetch-jira-data/jobs/{job_id}")
+def get_fetch_job(job_id: str):
+    job = job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.post("/fetch-jira-data/jobs/{job_id}/cancel")
+def cancel_fetch_job(job_id: str):
+    job = job_runner.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.on_event("startup")
+def start_webhook_indexer():
+    webhook_indexer.start()
+
+
+@app.on_event("shutdown")
+def stop_webhook_indexer():
+    webhook_indexer.stop()
+
+
+@app.get("/webhook-stats/")
+def get_webhook_stats():
+    return {"stats": webhook_indexer.stats}
+
+
+@app.get("/webhook-issues.csv")
+def export_webhook_issues():
+    return FileResponse(export_csv(), media_type="text/csv", filename="all_issues.csv")
+
+
+def ingest_webhook(payload):
+    """Queue one event for indexing and record it in the issue store (blocking)."""
+    parsed = parse_webhook_event(payload)
+    action = webhook_indexer.enqueue(parsed)
+    if action == "upsert":
+        upsert_issue(parsed[2])
+    elif action == "delete":
+        delete_issue(parsed[1])
+    return action
 
 
 @app.post("/")
 async def webhook_listener(request: Request):
-    # Get the raw payload (bytes)
+    # Parse and queue the event; the indexer coalesces bursts and writes them in micro-batches
     payload_bytes = await request.body()
-    # Decode to string for printing (assumes utf-8, which is typical for webhooks)
-    payload_str = payload_bytes.decode('utf-8', errors='replace')
-    print("🔔 Raw payload received:", payload_str)
-    return {"status": "ok", "received": bool(payload_str)}
\ No newline at end of file
+    try:
+        payload = json.loads(payload_bytes.decode('utf-8', errors='replace'))
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    event = payload.get('webhookEvent', '?') if isinstance(payload, dict) else '?'
+    # Parsing and the SQLite upsert block, so they run off the event loop. A payload
+    # that fails here would fail on every retry, so it is logged and acknowledged.
+    try:
+        action = await run_in_threadpool(ingest_webhook, payload)
+    except Exception as e:
+        print(f"❌ Webhook {event} could not be processed: {type(e).__name__}: {e}")
+        return {"status": "error", "queued": None, "detail": str(e)}
+    print(f"🔔 Webhook {event} → {action or 'ignored'}")
+    return {"status": "ok", "queued": action}
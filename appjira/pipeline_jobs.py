@@ -0,0 +1,182 @@
+import os
+import time
+import uuid
+import fcntl
+import threading
+import traceback
+
+MAX_FINISHED_JOBS = int(os.getenv("PIPELINE_JOB_HISTORY", "50"))
+LOCK_FILE_NAME = ".pipeline.lock"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobConflict(Exception):
+    """Raised when a data directory already has a running job."""
+
+    def __init__(self, data_dir, job_id=None):
+        super().__init__(f"A pipeline run is already in progress for {data_dir}")
+        self.data_dir = data_dir
+        self.job_id = job_id
+
+
+class PipelineJob:
+    """Status, per-stage progress and cancellation flag of one pipeline run.
+
+    Also usable on its own (e.g. a direct ``run_pipeline()`` call), where it
+    simply records progress that nobody polls.
+    """
+
+    def __init__(self, name="pipeline", params=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.params = params or {}
+        self.status = "queued"
+        self.stage = None
+        self.stages = {}
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    # ------------------ Progress ------------------
+    def start_stage(self, stage, total=None):
+        self.check_cancelled()
+        with self._lock:
+            self.stage = stage
+            self.stages[stage] = {"done": 0, "total": total, "started_at": time.time()}
+        print(f"▶️ Stage {stage}" + (f" ({total} units)" if total is not None else ""))
+
+    def advance(self, stage=None, n=1):
+        """Count ``n`` finished units; raises JobCancelled once cancel was requested."""
+        with self._lock:
+            entry = self.stages.setdefault(stage or self.stage, {"done": 0, "total": None, "started_at": time.time()})
+            entry["done"] += n
+        self.check_cancelled()
+
+    def track(self, stage, items):
+        """Pass ``items`` through, counting each one as progress of ``stage``."""
+        self.start_stage(stage)
+        for item in items:
+            yield item
+            self.advance(stage)
+
+    # ------------------ Cancellation ------------------
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def to_dict(self):
+        with self._lock:
+            stages = {name: dict(entry) for name, entry in self.stages.items()}
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "name": self.name,
+            "params": self.params,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": stages,
+            "cancel_requested": self.cancel_requested,
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(end - self.started_at, 1) if self.started_at else None,
+        }
+
+
+class JobRunner:
+    """Runs pipeline jobs on background threads, one at a time per data directory.
+
+    The single-flight lock is an in-process map of running jobs plus an
+    exclusive ``flock`` on ``<data_dir>/.pipeline.lock``, so a second API
+    worker process (or a CLI run using the same lock) cannot start an
+    overlapping run that writes the same files.
+    """
+
+    def __init__(self, max_finished=MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self.jobs = {}
+        self._active = {}    # data_dir -> job id
+        self._lock = threading.Lock()
+
+    def _acquire(self, data_dir):
+        os.makedirs(data_dir, exist_ok=True)
+        handle = open(os.path.join(data_dir, LOCK_FILE_NAME), "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            raise JobConflict(data_dir)
+        handle.write(str(os.getpid()))
+        handle.flush()
+        return handle
+
+    def start(self, data_dir, target, name="pipeline", params=None):
+        """Start ``target(job)`` in the background; raises JobConflict if ``data_dir`` is busy."""
+        data_dir = os.path.realpath(data_dir)
+        with self._lock:
+            if data_dir in self._active:
+                raise JobConflict(data_dir, self._active[data_dir])
+            handle = self._acquire(data_dir)
+            job = PipelineJob(name, params)
+            self.jobs[job.id] = job
+            self._active[data_dir] = job.id
+            self._prune()
+
+        thread = threading.Thread(target=self._run, args=(job, target, data_dir, handle),
+                                  name=f"job-{job.id}", daemon=True)
+        thread.start()
+        return job
+
+    def _run(self, job, target, data_dir, handle):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = target(job)
+            job.status = "succeeded"
+        except JobCancelled:
+            job.status = "cancelled"
+            print(f"🛑 Job {job.id} cancelled during stage {job.stage}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._active.pop(data_dir, None)
+                fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+            print(f"🏁 Job {job.id} {job.status} in {job.finished_at - job.started_at:.1f}s")
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.finished_at]
+        for job in sorted(finished, key=lambda j: j.finished_at)[:max(len(finished) - self.max_finished, 0)]:
+            del self.jobs[job.id]
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None and job.status in ("queued", "running"):
+            job.cancel()
+        return job
+
+    def list(self):
+        return [job.to_dict() for job in sorted(self.jobs.values(), key=lambda j: j.created_at, reverse=True)]
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import tempfile
+import threading
+
+MANIFEST_NAME = "pipeline_manifest.json"
+PIPELINE_STAGES = ("fetch", "clean", "combine", "summarize", "index")
+# A failed run older than this (seconds) is not resumed: its fetched data is stale. 0 never resumes.
+RESUME_MAX_AGE = float(os.getenv("PIPELINE_RESUME_MAX_AGE", str(6 * 3600)))
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """sha256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PipelineManifest:
+    """Checkpoints of JiraPipeline runs, persisted as one JSON file.
+
+    Two kinds of records are kept:
+
+    - ``run``: the current run's parameters, status and, per stage, the
+      items already committed. A run that did not finish (failed, cancelled
+      or killed) is resumed by the next run with the same parameters, so
+      e.g. projects fetched before the failure are not fetched again. Only
+      runs started within ``RESUME_MAX_AGE`` are resumed.
+    - ``outputs``: per stage, the input digest each item's output was last
+      built from. These survive across runs, so an item whose inputs did
+      not change is skipped as long as its output is still on disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {"run": None, "outputs": {}}
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        self.resumed = False
+
+    def save(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        tmp_fd, tmp_path = tempfile.mkstemp(prefix="tmp_", dir=directory, text=True)
+        try:
+            with os.fdopen(tmp_fd, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    # ------------------ Runs ------------------
+    def begin(self, params, max_age=None):
+        """Start a run, resuming the previous one if it did not finish with the same params.
+
+        A previous run started more than ``max_age`` seconds ago
+        (RESUME_MAX_AGE by default) is abandoned and a fresh run started.
+        """
+        max_age = RESUME_MAX_AGE if max_age is None else max_age
+        with self._lock:
+            run = self.data.get("run")
+            self.resumed = bool(run) and run["status"] != "succeeded" and run["params"] == params
+            if self.resumed and time.time() - run["started_at"] > max_age:
+                print(f"⏱️ Not resuming pipeline run {run['id']}: started {(time.time() - run['started_at']) / 3600:.1f}h ago")
+                self.resumed = False
+            if self.resumed:
+                run["status"] = "running"
+                run["resumed_at"] = time.time()
+                done = [name for name, stage in run["stages"].items() if stage["status"] == "done"]
+                print(f"⏯️ Resuming pipeline run {run['id']} (stages done: {done or 'none'})")
+            else:
+                self.data["run"] = {
+                    "id": uuid.uuid4().hex[:12], "params": params, "status": "running",
+                    "started_at": time.time(), "stages": {},
+                }
+            self.save()
+        return self.resumed
+
+    def _stage(self, stage):
+        return self.data["run"]["stages"].setdefault(stage, {"status": "pending", "items": []})
+
+    def start_stage(self, stage):
+        with self._lock:
+            entry = self._stage(stage)
+            if entry["status"] != "done":
+                entry["status"] = "running"
+            entry.setdefault("started_at", time.time())
+            self.save()
+
+    def finish_stage(self, stage, **info):
+        with self._lock:
+            entry = self._stage(stage)
+            entry.update(info, status="done", finished_at=time.time())
+            self.save()
+
+    def reset_stage(self, stage):
+        """Forget a stage's progress in the current run, so it runs again in full."""
+        with self._lock:
+            self.data["run"]["stages"].pop(stage, None)
+            self.save()
+
+    def stage_done(self, stage):
+        return self._stage(stage)["status"] == "done"
+
+    def item_done(self, stage, item):
+        return item in self._stage(stage)["items"]
+
+    def commit_item(self, stage, item):
+        with self._lock:
+            items = self._stage(stage)["items"]
+            if item not in items:
+                items.append(item)
+            self.save()
+
+    def end(self, status="succeeded", error=None):
+        with self._lock:
+            run = self.data["run"]
+            run.update(status=status, error=error, finished_at=time.time())
+            self.save()
+
+    # ------------------ Content-addressed outputs ------------------
+    def output_digest(self, stage, item):
+        return self.data["outputs"].get(stage, {}).get(item)
+
+    def is_current(self, stage, item, digest, output_path=None):
+        """True if ``item`` was last built from ``digest`` and its output still exists."""
+        if self.output_digest(stage, item) != digest:
+            return False
+        return output_path is None or os.path.exists(output_path)
+
+    def record_output(self, stage, item, digest):
+        with self._lock:
+            self.data["outputs"].setdefault(stage, {})[item] = digest
+            self.save()
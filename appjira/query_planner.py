@@ -0,0 +1,194 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+# Filters are ``{property: {op: value}}`` with ops:
+#   "eq"     exact value
+#   "in"     any of a list of values
+#   "not_in" none of a list of values
+#   "match"  every word of the value appears in the property (text fields)
+#   "gte"/"lte" datetime bounds
+
+# "task" is also an everyday word ("what tasks are blocking X"), so it only
+# counts as the issue type when phrased as one. Jira names sub-tasks
+# "Sub-task" (company-managed) or "Subtask" (team-managed projects).
+ISSUE_TYPES = [
+    (r"\bsub-?tasks?\b", {"in": ["Sub-task", "Subtask"]}),
+    (r"\bbugs?\b|\bdefects?\b", {"eq": "Bug"}),
+    (r"\bstor(?:y|ies)\b", {"eq": "Story"}),
+    (r"\bepics?\b", {"eq": "Epic"}),
+    (r"\btasks?\s+(?:issues?|tickets?)\b|\b(?:issue\s+)?type\s*[:=]?\s*task\b", {"eq": "Task"}),
+]
+DONE_STATUSES = ["Done", "Closed", "Resolved"]
+STATUS_WORDS = [
+    (r"in[- ]progress", {"in": ["In Progress"]}),
+    (r"in[- ]review", {"in": ["In Review"]}),
+    (r"to[- ]?do", {"in": ["To Do"]}),
+    (r"open|unresolved|outstanding|remaining|pending", {"not_in": DONE_STATUSES}),
+    (r"closed|done|resolved|completed|finished", {"in": DONE_STATUSES}),
+]
+PRIORITY_WORDS = [
+    (r"highest|critical|blocker", "Highest"),
+    (r"lowest", "Lowest"),
+    (r"high", "High"),
+    (r"medium", "Medium"),
+    (r"low", "Low"),
+]
+# Status and priority words are everyday words too ("open the file", "low
+# memory"), so they only count when phrased as a status or priority:
+# "status open", "priority: low", "low priority", "open bugs",
+# "critical open issues", "tickets that are done".
+ISSUE_NOUN = r"(?:sub-?tasks?|issues?|tickets?|bugs?|defects?|stor(?:y|ies)|epics?|tasks?|items?)"
+QUALIFIER = "(?:" + "|".join(w for w, _ in STATUS_WORDS + PRIORITY_WORDS) + "|priority)"
+
+
+def _qualifier_pattern(words, field, after_noun=False):
+    pattern = (
+        rf"\b{field}\s*(?:is|=|:)?\s*(?:{words})\b"
+        rf"|\b(?:{words})[- ]{field}\b"
+        rf"|\b(?:{words})\b(?=(?:[\s-]+{QUALIFIER})*\s+{ISSUE_NOUN}\b)"
+    )
+    if after_noun:
+        pattern += rf"|\b{ISSUE_NOUN}\s+(?:(?:that|which)\s+)?(?:(?:are|is|were|was)\s+(?:still\s+|already\s+|now\s+)?)?(?:{words})\b"
+    return pattern
+
+
+STATUSES = [(_qualifier_pattern(words, "status", after_noun=True), condition) for words, condition in STATUS_WORDS]
+PRIORITIES = [(_qualifier_pattern(words, "priority"), value) for words, value in PRIORITY_WORDS]
+PROJECT_RE = re.compile(r"\b(?:in|for|of|project)\s+([A-Z][A-Z0-9_]{1,9})\b")
+SPRINT_RE = re.compile(r"\bsprint\s*#?\s*(\d+)\b", re.IGNORECASE)
+LAST_N_RE = re.compile(
+    r"\b(created|updated|opened|changed|modified)?\s*(?:in\s+)?(?:the\s+)?(?:last|past)\s+(\d+)\s+(day|week|month)s?\b",
+    re.IGNORECASE,
+)
+SINCE_RE = re.compile(r"\b(created|updated)?\s*(since|after|before)\s+(\d{4}-\d{2}-\d{2})\b", re.IGNORECASE)
+RELATIVE_DAYS = {"today": 0, "yesterday": 1, "this week": 7, "this month": 30}
+
+
+def _date_field(verb):
+    return "updated" if verb and verb.lower() in ("updated", "changed", "modified") else "created"
+
+
+def plan_query(question, known_projects=None, now=None):
+    """Split a question into search text and structured filters.
+
+    Returns ``{"text": ..., "filters": {...}}``. Only predicates stated
+    explicitly in the question are extracted; everything else stays in the
+    text for the ranker.
+    """
+    now = now or datetime.now(timezone.utc)
+    text = question
+    lowered = question.lower()
+    filters = {}
+
+    # ---- Project ----
+    # With ``known_projects`` (even empty) only real project keys are used;
+    # without it, any "in ABC"-style word is taken for a project key.
+    known = {p.upper() for p in known_projects} if known_projects is not None else None
+    candidates = re.findall(r"\b[A-Z][A-Z0-9_]{1,9}\b", question) if known else PROJECT_RE.findall(question)
+    projects = [c for c in dict.fromkeys(candidates) if known is None or c in known]
+    if projects:
+        filters["project_key"] = {"in": projects}
+
+    # ---- Issue type, status, priority ----
+    for pattern, condition in ISSUE_TYPES:
+        if re.search(pattern, lowered):
+            filters["issue_type"] = dict(condition)
+            break
+    for pattern, condition in STATUSES:
+        if re.search(pattern, lowered):
+            filters["status"] = dict(condition)
+            break
+    for pattern, value in PRIORITIES:
+        if re.search(pattern, lowered):
+            filters["priority"] = {"eq": value}
+            break
+
+    # ---- Sprint ----
+    sprint = SPRINT_RE.search(question)
+    if sprint:
+        filters["sprint_names"] = {"match": f"sprint {sprint.group(1)}"}
+        text = text.replace(sprint.group(0), " ")
+
+    # ---- Date ranges ----
+    last_n = LAST_N_RE.search(question)
+    if last_n:
+        verb, amount, unit = last_n.groups()
+        days = int(amount) * {"day": 1, "week": 7, "month": 30}[unit.lower()]
+        filters[_date_field(verb)] = {"gte": now - timedelta(days=days)}
+        text = text.replace(last_n.group(0), " ")
+    else:
+        for phrase, days in RELATIVE_DAYS.items():
+            if phrase in lowered:
+                start = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+                verb = "updated" if re.search(r"\b(?:updated|changed|modified)\b", lowered) else "created"
+                filters[verb] = {"gte": start}
+                break
+    for verb, direction, day in SINCE_RE.findall(question):
+        bound = datetime.fromisoformat(day).replace(tzinfo=timezone.utc)
+        op = "lte" if direction.lower() == "before" else "gte"
+        filters.setdefault(_date_field(verb), {})[op] = bound
+
+    return {"text": " ".join(text.split()) or question, "filters": filters}
+
+
+# === Applying filters ===
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _words(value):
+    return set(re.findall(r"[a-z0-9]+", str(value).lower()))
+
+
+def matches(props, filters):
+    """True if an issue's properties satisfy every filter (local backends).
+
+    A list property (e.g. ``sprint_names``) satisfies ``eq``/``in``/``match``
+    if any of its values does, and ``not_in`` if none of them is excluded.
+    """
+    for field, condition in (filters or {}).items():
+        value = props.get(field)
+        values = [str(v).lower() for v in value] if isinstance(value, list) else [str(value).lower()]
+        for op, expected in condition.items():
+            if op == "eq" and str(expected).lower() not in values:
+                return False
+            if op == "in" and not {str(e).lower() for e in expected} & set(values):
+                return False
+            if op == "not_in" and {str(e).lower() for e in expected} & set(values):
+                return False
+            if op == "match" and not any(_words(expected) <= _words(v) for v in values):
+                return False
+            if op in ("gte", "lte"):
+                when = _as_datetime(value) if value else None
+                if when is None or (when < expected if op == "gte" else when > expected):
+                    return False
+    return True
+
+
+def to_weaviate_filter(filters):
+    """Translate planner filters into a Weaviate v4 ``Filter`` (or None)."""
+    if not filters:
+        return None
+    from weaviate.classes.query import Filter
+
+    clauses = []
+    for field, condition in filters.items():
+        prop = Filter.by_property(field)
+        for op, expected in condition.items():
+            if op in ("eq", "match"):
+                clauses.append(prop.equal(expected))
+            elif op == "in":
+                clauses.append(Filter.any_of([prop.equal(e) for e in expected]) if len(expected) > 1 else prop.equal(expected[0]))
+            elif op == "not_in":
+                clauses.extend(prop.not_equal(e) for e in expected)
+            elif op == "gte":
+                clauses.append(prop.greater_or_equal(expected))
+            elif op == "lte":
+                clauses.append(prop.less_or_equal(expected))
+    return Filter.all_of(clauses) if len(clauses) > 1 else clauses[0]
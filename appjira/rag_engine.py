@@ -1,10 +1,16 @@
 import os
+import asyncio
 from dotenv import load_dotenv
 import weaviate
 from weaviate.auth import AuthApiKey
-import weaviate.classes.query as wq
 from langchain.chat_models import ChatOpenAI
 from langchain.schema import HumanMessage
+from context_packer import pack_context
+from llm_cache import cache_from_env, read_ingest_version
+from query_planner import plan_query
+from issue_analytics import IssueAnalytics
+from attachment_chunks import ATTACHMENT_COLLECTION_NAME
+from retrieval_backends import LocalHybridBackend, WeaviateBackend, embedder_from_env
 
 # === Load environment variables ===
 load_dotenv("/Users/hemasagarendluri1996/jira-rag-pipeline/.env")
@@ -15,44 +21,61 @@ print("OpenAI API Key loaded.", OPENAI_API_KEY)
 WEAVIATE_URL = os.getenv("WEAVIATE_URL")
 WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
 JIRA_COLLECTION_NAME = os.getenv("WEAVIATE_COLLECTION_NAME")
+RAG_MAX_CONCURRENCY = int(os.getenv("RAG_MAX_CONCURRENCY", "4"))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "10"))
+RETRIEVAL_BACKEND = (os.getenv("RETRIEVAL_BACKEND") or "weaviate").lower()
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR") or os.path.join("combined", "local_index")
 
 # === Setup LLM ===
-llm = ChatOpenAI(openai_api_key=OPENAI_API_KEY, model="gpt-3.5-turbo", temperature=0)
-
-# === Connect to Weaviate ===
-client = weaviate.connect_to_weaviate_cloud(
-    cluster_url=WEAVIATE_URL,
-    auth_credentials=AuthApiKey(api_key=WEAVIATE_API_KEY),
-)
-
-if not client.is_ready():
-    raise Exception("❌ Weaviate is not reachable")
-
-print("✅ Connected to Weaviate RAG database.")
-jira_collection = client.collections.get(JIRA_COLLECTION_NAME)
+LLM_MODEL = "gpt-3.5-turbo"
+llm = ChatOpenAI(openai_api_key=OPENAI_API_KEY, model=LLM_MODEL, temperature=0)
+llm_cache = cache_from_env()
+
+# === Retrieval backend ===
+def create_retrieval_backend():
+    """Local in-process index when RETRIEVAL_BACKEND=local, Weaviate otherwise"""
+    if RETRIEVAL_BACKEND == "local":
+        print(f"✅ Using local retrieval index at {LOCAL_INDEX_DIR}.")
+        return LocalHybridBackend(LOCAL_INDEX_DIR, embed_fn=embedder_from_env())
+
+    client = weaviate.connect_to_weaviate_cloud(
+        cluster_url=WEAVIATE_URL,
+        auth_credentials=AuthApiKey(api_key=WEAVIATE_API_KEY),
+        headers={"X-OpenAI-Api-Key": OPENAI_API_KEY},
+    )
+    if not client.is_ready():
+        raise Exception("❌ Weaviate is not reachable")
+
+    print("✅ Connected to Weaviate RAG database.")
+    chunk_collection = None
+    if client.collections.exists(ATTACHMENT_COLLECTION_NAME):
+        chunk_collection = client.collections.get(ATTACHMENT_COLLECTION_NAME)
+    return WeaviateBackend(client.collections.get(JIRA_COLLECTION_NAME), chunk_collection)
+
+retrieval_backend = create_retrieval_backend()
+issue_analytics = IssueAnalytics()
+
+# === Cached LLM calls ===
+async def aask_llm(kind: str, prompt: str, version=None) -> str:
+    """Call the LLM through the response cache (if enabled)"""
+    async def call():
+        return (await llm.ainvoke([HumanMessage(content=prompt)])).content
+    if llm_cache is None:
+        return await call()
+    return await llm_cache.aget_or_call(kind, LLM_MODEL, prompt, call, version=version)
+
+def llm_cache_stats() -> dict:
+    return llm_cache.stats() if llm_cache is not None else {}
 
 # === NLP Helpers with OpenAI ===
-def clean_query(query: str) -> str:
+async def aclean_query(query: str) -> str:
     """Rephrase query to make it more precise"""
     try:
         prompt = f"Rephrase the following Jira search query into a clearer form:\n\n{query}"
-        response = llm([HumanMessage(content=prompt)]).content
-        return response.strip()
+        return (await aask_llm("rewrite", prompt)).strip()
     except Exception:
         return query
 
-def summarize_docs(docs: list) -> list:
-    """Summarize each document using OpenAI"""
-    summarized = []
-    for d in docs:
-        try:
-            prompt = f"Summarize this Jira issue in one short sentence:\n{d}"
-            response = llm([HumanMessage(content=prompt)]).content
-            summarized.append(response.strip())
-        except Exception:
-            summarized.append(d)
-    return summarized
-
 def adapt_prompt(query: str, context: str) -> str:
     """Adapt instructions based on query intent"""
     if "bug" in query.lower():
@@ -75,61 +98,66 @@ Question:
 Provide a clear and concise answer based only on the above context.
 """
 
+# === Retrieval ===
+def retrieve_context(query: str, limit: int = RAG_TOP_K, filters: dict = None) -> str:
+    """Search the retrieval backend and pack the hits into a token-budgeted context.
+
+    Issue text is trimmed to the parts most relevant to the query and near-
+    duplicate issues are skipped, so prompt size stays within
+    CONTEXT_TOKEN_BUDGET whatever the retrieved issues look like.
+    """
+    hits = retrieval_backend.search(query, limit=limit, filters=filters)
+    if not hits and filters:
+        # The extracted predicates may be wrong for this instance; retry unfiltered.
+        hits = retrieval_backend.search(query, limit=limit)
+    if not hits:
+        return "No documents retrieved."
+
+    context_text, report = pack_context(hits, query)
+    print(
+        f"📦 Context: {report['tokens']}/{report['budget']} tokens, {len(report['included'])} issues, "
+        f"{len(report['duplicates'])} duplicates dropped, {len(report['over_budget'])} over budget"
+    )
+    return context_text
+
 # === RAG Query Pipeline ===
-def run_rag_query(query: str) -> dict:
+async def arun_rag_query(query: str) -> dict:
+    """Answer one question: LLM calls are awaited, retrieval runs in a thread"""
     responses = {}
 
     try:
-        # Step 1: Clean query
-        cleaned_query = clean_query(query)
+        # Fast path: counts and lists are answered exactly from precomputed stats
+        try:
+            aggregate = await asyncio.to_thread(issue_analytics.answer, query)
+        except Exception as e:
+            print(f"⚠️ Analytics lookup failed, falling back to search: {e}")
+            aggregate = None
+        if aggregate is not None:
+            responses[query] = aggregate
+            return {"responses": responses}
+
+        # Step 1: Extract filters from the question, then clean it
+        plan = plan_query(query, known_projects=await asyncio.to_thread(issue_analytics.project_keys))
+        cleaned_query = await aclean_query(query)
         print(f"🔍 Original query: {query}")
         print(f"✨ Cleaned query: {cleaned_query}")
+        print(f"🧭 Filters: {plan['filters']}")
 
-        # Step 2: Retrieve top docs
+        # Step 2 + 3: Retrieve top docs and pack them into the context budget
         try:
-            context_result = jira_collection.query.bm25(
-                query=cleaned_query,
-                limit=10,
-                return_metadata=wq.MetadataQuery(score=True)
-            )
+            context_text = await asyncio.to_thread(retrieve_context, cleaned_query, RAG_TOP_K, plan["filters"])
         except Exception as e:
-            error_msg = f"Error retrieving documents from Weaviate: {e}"
+            error_msg = f"Error retrieving documents: {e}"
             print(error_msg)
             responses[cleaned_query] = error_msg
             return {"responses": responses}
 
-        # Step 3: Format docs
-        docs = []
-        if not getattr(context_result, "objects", None):
-            docs.append("No documents retrieved from Weaviate.")
-        else:
-            for obj in context_result.objects:
-                props = getattr(obj, "properties", {}) or {}
-                project = props.get("project_name", "Unknown Project")
-                key = props.get("key", "")
-                summary = props.get("summary", "")
-                description = props.get("description", "")
-                status = props.get("status", "")
-                priority = props.get("priority", "")
-
-                docs.append(
-                    f"🔹 Project: {project}\n"
-                    f"Issue Key: {key}\n"
-                    f"Summary: {summary}\n"
-                    f"Description: {description}\n"
-                    f"Status: {status} | Priority: {priority}\n"
-                )
-
-        # Step 4: Summarize docs
-        docs = summarize_docs(docs)
-        context_text = "\n\n".join(docs)
-
-        # Step 5: Adaptive prompt
+        # Step 4: Adaptive prompt
         prompt_template = adapt_prompt(cleaned_query, context_text)
 
-        # Step 6: Ask OpenAI
+        # Step 5: Ask OpenAI (answers depend on the indexed data, so they are versioned by ingest)
         try:
-            answer = llm([HumanMessage(content=prompt_template)]).content
+            answer = await aask_llm("answer", prompt_template, version=read_ingest_version())
         except Exception as e:
             error_msg = f"Error generating answer from LLM: {e}"
             print(error_msg)
@@ -145,3 +173,24 @@ def run_rag_query(query: str) -> dict:
         responses[query] = error_msg
 
     return {"responses": responses}
+
+def run_rag_query(query: str) -> dict:
+    """Blocking wrapper around arun_rag_query, for scripts and other sync callers"""
+    return asyncio.run(arun_rag_query(query))
+
+async def run_rag_queries(questions: list, max_concurrency: int = None) -> dict:
+    """Answer several questions concurrently.
+
+    Duplicate questions are answered once. At most ``max_concurrency``
+    questions are in flight at a time. Returns ``{question: result}`` with
+    each result shaped like the output of run_rag_query.
+    """
+    unique_questions = list(dict.fromkeys(questions))
+    semaphore = asyncio.Semaphore(max_concurrency or RAG_MAX_CONCURRENCY)
+
+    async def answer(question):
+        async with semaphore:
+            return await arun_rag_query(question)
+
+    results = await asyncio.gather(*(answer(q) for q in unique_questions))
+    return dict(zip(unique_questions, results))
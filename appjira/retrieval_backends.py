@@ -0,0 +1,476 @@
+import os
+import re
+import json
+import math
+import fcntl
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+
+from embedding_cache import cached_embedder
+from fingerprint_store import fingerprint
+from issue_text import format_issue_doc, sprint_names
+from query_planner import matches, to_weaviate_filter
+
+# Issue properties kept by the local backend (attachment text is left out).
+INDEXED_FIELDS = (
+    "key", "project_key", "project_name", "summary", "description", "issue_type", "status",
+    "priority", "created", "updated", "reporter", "creator", "parent_key", "parent_summary",
+    "summary_llm", "board_id", "board_name", "sprint_id", "sprint_name",
+)
+TEXT_FIELDS = ("key", "project_name", "summary", "description", "issue_type", "status", "priority", "summary_llm")
+
+TOKEN_RE = re.compile(r"[a-z][a-z0-9]*-\d+|[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+# === Embedders ===
+def hashing_embedder(dim=256):
+    """Deterministic bag-of-words embedder; needs no network (tests, offline use)."""
+    def embed(texts):
+        matrix = np.zeros((len(texts), dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                digest = hashlib.md5(token.encode("utf-8")).digest()
+                index = int.from_bytes(digest[:4], "little") % dim
+                matrix[row, index] += 1.0 if digest[4] & 1 else -1.0
+        return matrix
+    embed.model = f"hashing-{dim}"
+    return embed
+
+
+def openai_embedder(model=None, batch_size=100):
+    """Embeds texts with the OpenAI embeddings API in batches."""
+    from openai import OpenAI
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    model = model or os.getenv("EMBEDDING_MODEL") or "text-embedding-3-small"
+
+    def embed(texts):
+        vectors = []
+        for i in range(0, len(texts), batch_size):
+            response = client.embeddings.create(model=model, input=[t[:8000] or " " for t in texts[i:i + batch_size]])
+            vectors.extend(item.embedding for item in response.data)
+        return np.asarray(vectors, dtype=np.float32)
+    embed.model = model
+    return embed
+
+
+def embedder_from_env():
+    """LOCAL_EMBEDDER=openai|hashing; defaults to OpenAI when an API key is set.
+
+    OpenAI embeddings go through the on-disk EmbeddingCache unless
+    EMBEDDING_CACHE=none.
+    """
+    name = (os.getenv("LOCAL_EMBEDDER") or ("openai" if os.getenv("OPENAI_API_KEY") else "hashing")).lower()
+    if name != "openai":
+        return hashing_embedder()
+    if (os.getenv("EMBEDDING_CACHE") or "sqlite").lower() == "none":
+        return openai_embedder()
+    return cached_embedder(openai_embedder())
+
+
+# === Backends ===
+class RetrievalBackend:
+    """Interface shared by the retrieval backends.
+
+    ``search`` returns up to ``limit`` issue property dicts, best first, each
+    with its relevance under ``_score``. ``filters`` uses the predicate format
+    produced by ``query_planner.plan_query`` and is applied before ranking.
+    """
+
+    def search(self, query, limit=10, filters=None):
+        raise NotImplementedError
+
+
+class WeaviateBackend(RetrievalBackend):
+    """BM25 search against the Weaviate collection.
+
+    With a ``chunk_collection``, attachment chunks are searched separately and
+    only chunks that score are attached to their issue (``attachment_chunks``).
+    Issues found only through their attachments are appended after the issue
+    hits, at most ``limit // 2`` of them.
+    """
+
+    CHUNKS_PER_ISSUE = 3
+
+    def __init__(self, collection, chunk_collection=None):
+        self.collection = collection
+        self.chunk_collection = chunk_collection
+
+    @staticmethod
+    def _hits(result):
+        hits = []
+        for obj in getattr(result, "objects", None) or []:
+            props = dict(getattr(obj, "properties", {}) or {})
+            props["_score"] = getattr(obj.metadata, "score", None)
+            hits.append(props)
+        return hits
+
+    def search(self, query, limit=10, filters=None):
+        import weaviate.classes.query as wq
+        hits = self._hits(self.collection.query.bm25(
+            query=query,
+            limit=limit,
+            filters=to_weaviate_filter(filters),
+            return_metadata=wq.MetadataQuery(score=True)
+        ))
+        if self.chunk_collection is None:
+            return hits
+
+        chunks = self._hits(self.chunk_collection.query.bm25(
+            query=query,
+            limit=limit * self.CHUNKS_PER_ISSUE,
+            return_metadata=wq.MetadataQuery(score=True)
+        ))
+        by_key = {}
+        for chunk in chunks:
+            by_key.setdefault(chunk.get("issue_key"), []).append(chunk)
+
+        found = {hit.get("key") for hit in hits}
+        missing = [key for key in by_key if key and key not in found][:max(limit // 2, 1)]
+        if missing:
+            # By UUID: "key" is word-tokenized, so filtering on it would also match e.g. PROJ-1 for PROJ-12.
+            from weaviate.util import generate_uuid5
+            key_filter = wq.Filter.by_id().contains_any([generate_uuid5(key) for key in missing])
+            issue_filter = to_weaviate_filter(filters)
+            extra = self.collection.query.fetch_objects(
+                filters=key_filter if issue_filter is None else wq.Filter.all_of([issue_filter, key_filter]),
+                limit=len(missing),
+            )
+            extra_hits = {props.get("key"): props for props in self._hits(extra)}
+            for key in missing:
+                if key in extra_hits:
+                    extra_hits[key]["_score"] = by_key[key][0]["_score"]
+                    hits.append(extra_hits[key])
+
+        for hit in hits:
+            hit["attachment_chunks"] = by_key.get(hit.get("key"), [])[:self.CHUNKS_PER_ISSUE]
+        return hits
+
+
+class LocalHybridBackend(RetrievalBackend):
+    """In-process hybrid retrieval: BM25 inverted index plus dense vectors.
+
+    Vectors are stored as float16 rows of a memory-mapped file that grows by
+    doubling; documents, postings and tombstones live in ``meta.json`` next to
+    it. ``add`` replaces issues by key and ``delete`` tombstones them, so the
+    index can be kept in step with ingest without rebuilding.
+
+    Other processes may have the vector file mapped, so it is never truncated
+    or rewritten in place: new rows are only appended past the rows any
+    saved meta.json refers to, and growing or compacting writes a new
+    ``vectors.<generation>.f16`` that meta.json switches to atomically.
+    Readers map it read-only. Scores of the
+    two retrievers are min-max normalized and blended with ``alpha``
+    (1.0 = dense only, 0.0 = BM25 only).
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, index_dir, embed_fn=None, alpha=0.5):
+        self.index_dir = index_dir
+        self.embed_fn = embed_fn or hashing_embedder()
+        self.alpha = alpha
+        self.meta_path = os.path.join(index_dir, "meta.json")
+        self.generation = 0
+        self.vectors_path = os.path.join(index_dir, "vectors.f16")
+
+        self.docs = []          # row -> issue properties, None when deleted
+        self.hashes = []        # row -> content hash, None when deleted
+        self.doc_lengths = []   # row -> token count
+        self.postings = {}      # term -> {row: term frequency}
+        self.key_to_row = {}
+        self.dim = None
+        self.capacity = 0
+        self.vectors = None
+        self._vectors_writable = False
+        self._loaded_stamp = None
+        self._lock = threading.RLock()
+
+        if os.path.exists(self.meta_path):
+            self._load()
+
+    # ------------------ Persistence ------------------
+    def _meta_stamp(self):
+        # meta.json is replaced, never rewritten, so a new inode means a new save.
+        stat = os.stat(self.meta_path)
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load(self):
+        while True:
+            stamp = self._meta_stamp()
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            vectors_path = os.path.join(self.index_dir, meta.get("vectors_file", "vectors.f16"))
+            try:
+                vectors = np.memmap(vectors_path, dtype=np.float16, mode="r",
+                                    shape=(meta["capacity"], meta["dim"])) if meta["capacity"] else None
+                break
+            except FileNotFoundError:
+                continue   # a writer switched generations between the two reads
+        self._loaded_stamp = stamp
+        self.generation = meta.get("generation", 0)
+        self.vectors_path = vectors_path
+        self.vectors = vectors
+        self._vectors_writable = False
+        self.docs = meta["docs"]
+        self.hashes = meta["hashes"]
+        self.doc_lengths = meta["doc_lengths"]
+        self.postings = {term: {int(row): tf for row, tf in rows.items()} for term, rows in meta["postings"].items()}
+        self.dim = meta["dim"]
+        self.capacity = meta["capacity"]
+        self.key_to_row = {doc["key"]: row for row, doc in enumerate(self.docs) if doc is not None}
+
+    def save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        if self.vectors is not None and self._vectors_writable:
+            self.vectors.flush()
+        meta = {
+            "docs": self.docs,
+            "hashes": self.hashes,
+            "doc_lengths": self.doc_lengths,
+            "postings": self.postings,
+            "dim": self.dim,
+            "capacity": self.capacity,
+            "generation": self.generation,
+            "vectors_file": os.path.basename(self.vectors_path),
+        }
+        tmp_fd, tmp_path = tempfile.mkstemp(prefix="tmp_", dir=self.index_dir, text=True)
+        try:
+            with os.fdopen(tmp_fd, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(tmp_path, self.meta_path)
+            self._loaded_stamp = self._meta_stamp()
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        # Older generations are unlinked; processes still mapping them keep reading their copy.
+        for name in os.listdir(self.index_dir):
+            if name.startswith("vectors.") and name.endswith(".f16") and name != os.path.basename(self.vectors_path):
+                os.remove(os.path.join(self.index_dir, name))
+
+    def reload_if_changed(self):
+        """Pick up an index saved by another instance (e.g. the ingest pipeline)."""
+        if os.path.exists(self.meta_path) and self._meta_stamp() != self._loaded_stamp:
+            self._load()
+
+    @contextmanager
+    def writing(self):
+        """Hold the index for a read-modify-write.
+
+        Every writer of ``index_dir`` (the ingest pipeline, the API's webhook
+        sink) takes an exclusive ``flock`` on ``.write.lock`` and reloads the
+        latest save before changing anything, so no one saves over rows
+        another process added in the meantime.
+        """
+        with self._lock:
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(os.path.join(self.index_dir, ".write.lock"), "w") as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    self.reload_if_changed()
+                    yield self
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _new_generation(self, capacity, rows):
+        """Write ``rows`` into a fresh vector file of ``capacity`` rows and switch to it."""
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.generation += 1
+        path = os.path.join(self.index_dir, f"vectors.{self.generation}.f16")
+        vectors = np.memmap(path, dtype=np.float16, mode="w+", shape=(capacity, self.dim))
+        if rows is not None and len(rows):
+            vectors[:len(rows)] = rows
+        self.vectors, self.vectors_path, self.capacity = vectors, path, capacity
+        self._vectors_writable = True
+
+    def _ensure_capacity(self, rows):
+        if rows <= self.capacity:
+            if not self._vectors_writable:
+                # Rows past len(docs) are not referenced by any saved meta.json, so appending in place is safe.
+                self.vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r+", shape=(self.capacity, self.dim))
+                self._vectors_writable = True
+            return
+        old_rows = np.array(self.vectors[:len(self.docs)]) if self.vectors is not None else None
+        self._new_generation(max(rows, self.capacity * 2, 1024), old_rows)
+
+    # ------------------ Updates ------------------
+    @staticmethod
+    def _props(issue):
+        props = {}
+        for field in INDEXED_FIELDS:
+            value = issue.get(field)
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            props[field] = value.item() if hasattr(value, "item") else value
+        names = sprint_names(issue)
+        if names:
+            props["sprint_names"] = names
+        return props
+
+    def add(self, issues):
+        """Index ``issues``, replacing any already indexed under the same key."""
+        issues = [self._props(issue) for issue in issues if issue.get("key")]
+        if not issues:
+            return 0
+        self.delete([issue["key"] for issue in issues if issue["key"] in self.key_to_row])
+
+        vectors = np.asarray(self.embed_fn([format_issue_doc(issue) for issue in issues]), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        self._ensure_capacity(len(self.docs) + len(issues))
+
+        for issue, vector in zip(issues, vectors):
+            row = len(self.docs)
+            tokens = Counter(token for field in TEXT_FIELDS for token in tokenize(issue.get(field, "")))
+            for term, tf in tokens.items():
+                self.postings.setdefault(term, {})[row] = tf
+            self.docs.append(issue)
+            self.hashes.append(fingerprint(issue))
+            self.doc_lengths.append(sum(tokens.values()))
+            self.vectors[row] = vector.astype(np.float16)
+            self.key_to_row[issue["key"]] = row
+        return len(issues)
+
+    def delete(self, keys):
+        """Tombstone the given issue keys."""
+        removed = 0
+        for key in keys:
+            row = self.key_to_row.pop(key, None)
+            if row is None:
+                continue
+            tokens = set(token for field in TEXT_FIELDS for token in tokenize(self.docs[row].get(field, "")))
+            for term in tokens:
+                rows = self.postings.get(term)
+                if rows is not None:
+                    rows.pop(row, None)
+                    if not rows:
+                        del self.postings[term]
+            self.docs[row] = None
+            self.hashes[row] = None
+            self.doc_lengths[row] = 0
+            removed += 1
+        return removed
+
+    def compact(self):
+        """Drop tombstoned rows, keeping the stored vectors (nothing is re-embedded)."""
+        rows = sorted(self.key_to_row.values())
+        docs = [self.docs[row] for row in rows]
+        vectors = np.array(self.vectors[rows]) if rows else None
+        self.docs, self.hashes, self.doc_lengths, self.postings, self.key_to_row = [], [], [], {}, {}
+        for row, doc in enumerate(docs):
+            tokens = Counter(token for field in TEXT_FIELDS for token in tokenize(doc.get(field, "")))
+            for term, tf in tokens.items():
+                self.postings.setdefault(term, {})[row] = tf
+            self.docs.append(doc)
+            self.hashes.append(fingerprint(doc))
+            self.doc_lengths.append(sum(tokens.values()))
+            self.key_to_row[doc["key"]] = row
+        if vectors is not None:
+            # Readers still use the old row numbers, so the compacted rows go to a new file.
+            self._new_generation(self.capacity, vectors)
+
+    def sync(self, issues, load_errors=None):
+        """Bring the index in line with ``issues``: add new/changed, delete vanished.
+
+        Nothing is deleted if ``load_errors`` (filled by combine_issues while
+        the stream is consumed) is non-empty, as the stream is then incomplete.
+        """
+        with self.writing():
+            return self._sync(issues, load_errors)
+
+    def _sync(self, issues, load_errors=None):
+        wanted = {}
+        for issue in issues:
+            if issue.get("key"):
+                wanted[issue["key"]] = self._props(issue)
+        changed = [
+            props for key, props in wanted.items()
+            if key not in self.key_to_row or self.hashes[self.key_to_row[key]] != fingerprint(props)
+        ]
+        deleted = [] if load_errors else [key for key in self.key_to_row if key not in wanted]
+        self.delete(deleted)
+        self.add(changed)
+        if len(self.docs) > 2 * len(self.key_to_row) + 1000:
+            self.compact()
+        self.save()
+        return {"indexed": len(changed), "deleted": len(deleted), "total": len(self.key_to_row)}
+
+    @classmethod
+    def build_from_jsonl(cls, jsonl_path, index_dir, embed_fn=None):
+        """Create or update an index from the all_issues.jsonl written by combine_issues."""
+        backend = cls(index_dir, embed_fn=embed_fn)
+        with open(jsonl_path, "r", encoding="utf-8") as f:
+            issues = [json.loads(line) for line in f if line.strip()]
+        print(f"🗂️ Local index: {backend.sync(issues)}")
+        return backend
+
+    # ------------------ Search ------------------
+    def _bm25(self, query, allowed=None):
+        live = len(self.key_to_row)
+        if not live:
+            return {}
+        avgdl = sum(self.doc_lengths) / live or 1.0
+        scores = {}
+        for term in set(tokenize(query)):
+            rows = self.postings.get(term)
+            if not rows:
+                continue
+            idf = math.log(1 + (live - len(rows) + 0.5) / (len(rows) + 0.5))
+            for row, tf in rows.items():
+                if allowed is not None and row not in allowed:
+                    continue
+                norm = tf + self.K1 * (1 - self.B + self.B * self.doc_lengths[row] / avgdl)
+                scores[row] = scores.get(row, 0.0) + idf * tf * (self.K1 + 1) / norm
+        return scores
+
+    def _dense(self, query, limit, allowed=None):
+        if self.vectors is None or not self.key_to_row:
+            return {}
+        q = np.asarray(self.embed_fn([query]), dtype=np.float32)[0]
+        norm = np.linalg.norm(q)
+        if norm == 0:
+            return {}
+        rows = np.fromiter(self.key_to_row.values() if allowed is None else allowed, dtype=np.int64)
+        if not len(rows):
+            return {}
+        sims = np.asarray(self.vectors[rows], dtype=np.float32) @ (q / norm)
+        top = np.argsort(-sims)[:limit]
+        return {int(rows[i]): float(sims[i]) for i in top}
+
+    @staticmethod
+    def _normalize(scores):
+        if not scores:
+            return {}
+        low, high = min(scores.values()), max(scores.values())
+        span = high - low
+        return {row: (score - low) / span if span else 1.0 for row, score in scores.items()}
+
+    def search(self, query, limit=10, filters=None):
+        with self._lock:
+            self.reload_if_changed()
+            allowed = None
+            if filters:
+                allowed = {row for row in self.key_to_row.values() if matches(self.docs[row], filters)}
+            candidates = max(limit * 5, 50)
+            bm25 = self._normalize(self._bm25(query, allowed))
+            dense = self._normalize(self._dense(query, candidates, allowed)) if self.alpha > 0 else {}
+            combined = {
+                row: self.alpha * dense.get(row, 0.0) + (1 - self.alpha) * bm25.get(row, 0.0)
+                for row in set(bm25) | set(dense)
+            }
+            if not combined and allowed:
+                # Nothing in the text matched; the filters alone still select issues.
+                combined = {row: 0.0 for row in sorted(allowed)[:limit]}
+            best = sorted(combined.items(), key=lambda item: -item[1])[:limit]
+            return [{**self.docs[row], "_score": score} for row, score in best]
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules in appjira import each other by bare name, as when run from this folder.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
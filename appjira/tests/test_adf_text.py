@@ -0,0 +1,72 @@
+from adf_text import _sample_doc, adf_to_text
+
+
+def text(value, marks=None):
+    node = {"type": "text", "text": value}
+    if marks:
+        node["marks"] = marks
+    return node
+
+
+def paragraph(*content):
+    return {"type": "paragraph", "content": list(content)}
+
+
+def doc(*content):
+    return {"type": "doc", "version": 1, "content": list(content)}
+
+
+def bullets(*items):
+    return {"type": "bulletList", "content": [{"type": "listItem", "content": list(item)} for item in items]}
+
+
+def test_plain_strings_and_empty_values_pass_through():
+    assert adf_to_text("already *wiki* text") == "already *wiki* text"
+    assert adf_to_text(None) == ""
+
+
+def test_paragraphs_mentions_and_breaks():
+    document = doc(
+        paragraph(text("Login fails for "), {"type": "mention", "attrs": {"text": "@Sam"}}, {"type": "hardBreak"}, text("since Monday")),
+        {"type": "mediaSingle", "content": [{"type": "media", "attrs": {"id": "x"}}]},
+        paragraph(text("Second paragraph")),
+    )
+    assert adf_to_text(document) == "Login fails for @Sam\nsince Monday\nSecond paragraph"
+
+
+def test_markdown_keeps_code_links_and_headings():
+    document = doc(
+        {"type": "heading", "attrs": {"level": 2}, "content": [text("Steps")]},
+        paragraph(text("Call "), text("client.get", [{"type": "code"}]), text(" on "), text("the API", [{"type": "link", "attrs": {"href": "https://x.test"}}])),
+        {"type": "codeBlock", "attrs": {"language": "python"}, "content": [text("retry()")]},
+    )
+    assert adf_to_text(document, markdown=True) == (
+        "## Steps\nCall `client.get` on [the API](https://x.test)\n```python\nretry()\n```"
+    )
+    assert adf_to_text(document) == "Steps\nCall client.get on the API\nretry()"
+
+
+def test_lists_are_numbered_and_indented():
+    document = doc(
+        {"type": "orderedList", "attrs": {"order": 3}, "content": [
+            {"type": "listItem", "content": [paragraph(text("first")), bullets([paragraph(text("nested"))])]},
+            {"type": "listItem", "content": [paragraph(text("second"))]},
+        ]},
+    )
+    assert adf_to_text(document) == "3. first\n  - nested\n4. second"
+
+
+def test_table_rows_become_lines():
+    cell = lambda value: {"type": "tableCell", "content": [paragraph(text(value))]}
+    document = doc({"type": "table", "content": [
+        {"type": "tableRow", "content": [cell("env"), cell("prod")]},
+        {"type": "tableRow", "content": [cell("region"), cell("eu")]},
+    ]})
+    assert adf_to_text(document) == "env | prod\nregion | eu"
+
+
+def test_deeply_nested_lists_do_not_hit_the_recursion_limit():
+    result = adf_to_text(_sample_doc(paragraphs=0, depth=5000))
+    lines = result.split("\n")
+    assert len(lines) == 5000
+    assert lines[-1].strip() == "- level 5000"
@@ -0,0 +1,30 @@
+from attachment_chunks import attachment_texts, build_attachment_chunks
+
+
+def test_same_filename_attachments_get_distinct_ids():
+    files = [
+        {"id": "10001", "filename": "log.txt", "extracted_text": "first upload"},
+        {"id": "10002", "filename": "log.txt", "extracted_text": "second upload"},
+    ]
+    chunks = build_attachment_chunks("PROJ-12", files)
+    assert [c["attachment_id"] for c in chunks] == ["10001", "10002"]
+    assert {c["issue_key"] for c in chunks} == {"PROJ-12"}
+
+
+def test_files_without_ids_fall_back_to_position():
+    files = [
+        {"filename": "log.txt", "extracted_text": "first upload"},
+        str({"filename": "log.txt", "extracted_text": "second upload"}),
+    ]
+    chunks = build_attachment_chunks("PROJ-12", files)
+    assert [c["attachment_id"] for c in chunks] == ["#0", "#1"]
+
+
+def test_failure_placeholders_are_not_chunked():
+    files = [
+        {"id": "1", "filename": "big.pdf", "extracted_text": "⚠️ Skipped: file too large (9000000 bytes > 5000000)."},
+        {"id": "2", "filename": "log.txt", "extracted_text": "❌ Error: timed out"},
+        {"id": "3", "filename": "notes.txt", "extracted_text": "real notes"},
+    ]
+    assert attachment_texts(files) == [("big.pdf", ""), ("log.txt", ""), ("notes.txt", "real notes")]
+    assert [c["filename"] for c in build_attachment_chunks("PROJ-12", files)] == ["notes.txt"]
@@ -0,0 +1,41 @@
+from context_packer import count_tokens, pack_context, render_doc, trim_by_relevance
+
+
+def hit(key, summary, description=""):
+    return {"key": key, "project_name": "Payments", "status": "To Do", "priority": "High",
+            "summary": summary, "description": description}
+
+
+def test_near_duplicates_are_dropped():
+    text = "Checkout fails with a timeout when the card issuer is slow to respond to the request"
+    hits = [hit("P-1", "Checkout timeout", text), hit("P-2", "Checkout timeout", text + " again"), hit("P-3", "CSV export", "Exports lose the header row")]
+    context, report = pack_context(hits, "checkout timeout")
+    assert report["included"] == ["P-1", "P-3"]
+    assert report["duplicates"] == ["P-2"]
+    assert "P-2" not in context
+
+
+def test_hits_beyond_the_budget_are_left_out():
+    hits = [hit(f"P-{i}", f"distinct issue {i}", f"word{i} " * 200) for i in range(10)]
+    context, report = pack_context(hits, "issue", budget=400, doc_limit=150)
+    assert report["tokens"] <= 400
+    assert report["over_budget"]
+    assert report["included"] == [f"P-{i}" for i in range(len(report["included"]))]
+    assert count_tokens(context) <= 400 + 2 * len(report["included"])
+
+
+def test_trimming_keeps_the_relevant_sentences_in_order():
+    text = " ".join(["Unrelated filler sentence about the weather."] * 40 + ["The refund job crashes on empty batches."])
+    excerpt = trim_by_relevance(text, {"refund", "crashes"}, 30)
+    assert "refund job crashes" in excerpt
+    assert count_tokens(excerpt) <= 40
+
+
+def test_attachment_placeholders_are_not_quoted():
+    props = {**hit("P-1", "Refund crash"), "files": [
+        {"filename": "trace.log", "extracted_text": "❌ Error: refund download timed out"},
+        {"filename": "notes.txt", "extracted_text": "The refund job crashes on empty batches."},
+    ]}
+    block = render_doc(props, {"refund"})
+    assert "Attachment notes.txt" in block
+    assert "trace.log" not in block
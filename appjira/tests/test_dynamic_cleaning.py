@@ -0,0 +1,46 @@
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("openai")   # download_attachments, imported by the cleaner
+
+from dynamic_cleaning_agentic import process_all_files
+from issue_store import IssueStore, ISSUE_STORE_NAME
+
+
+class NoAttachments:
+    download_stats = {}
+    image_describer = SimpleNamespace(stats={})
+
+    def download_attachments(self, jobs):
+        return []
+
+
+def issue(key, i):
+    return {"key": key, "fields": {
+        "summary": f"summary {i} ü", "project": {"key": key.split("-")[0], "name": "Payments"},
+        "status": {"name": "To Do"}, "priority": None, "created": "2024-01-15T10:30:00.000+0000",
+        "description": {"type": "doc", "content": [{"type": "paragraph", "content": [{"type": "text", "text": f"text {i}"}]}]},
+    }}
+
+
+def test_process_pool_output_matches_a_sequential_run(tmp_path):
+    data = tmp_path / "data"
+    store = IssueStore(str(data / ISSUE_STORE_NAME))
+    sprint = {"id": 1, "name": "Sprint 1", "state": "active", "board_id": 7, "board_name": "Board"}
+    for project, count in (("AA", 1200), ("BB", 3)):
+        keys = [f"{project}-{i}" for i in range(count)]
+        store.replace_project(project, [sprint], [issue(key, i) for i, key in enumerate(keys)], {(key, 1) for key in keys})
+
+    # 1200 issues make three batches, spread across the spawned workers.
+    process_all_files(str(data), str(tmp_path / "seq"), NoAttachments(), workers=1)
+    process_all_files(str(data), str(tmp_path / "par"), NoAttachments(), workers=2)
+
+    names = sorted(name for name in os.listdir(tmp_path / "seq") if name.endswith("_cleaned.json"))
+    assert names == ["project_AA_cleaned.json", "project_BB_cleaned.json"]
+    for name in names:
+        assert (tmp_path / "seq" / name).read_bytes() == (tmp_path / "par" / name).read_bytes()
+    cleaned = json.loads((tmp_path / "par" / "project_AA_cleaned.json").read_text(encoding="utf-8"))
+    assert [i["key"] for i in cleaned["issues"]] == sorted(f"AA-{i}" for i in range(1200))
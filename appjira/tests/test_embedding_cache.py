@@ -0,0 +1,49 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache, cached_embedder
+from retrieval_backends import hashing_embedder
+
+
+def counting(embed_fn):
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return embed_fn(texts)
+    embed.model = embed_fn.model
+    embed.calls = calls
+    return embed
+
+
+def test_hashing_embedder_is_deterministic():
+    texts = ["Login times out after PROJ-12 deploy", "Export to CSV"]
+    first, second = hashing_embedder()(texts), hashing_embedder()(texts)
+    assert first.shape == (2, 256)
+    assert np.array_equal(first, second)
+    assert not np.array_equal(first[0], first[1])
+
+
+def test_cached_texts_are_not_embedded_again(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    embed = counting(hashing_embedder())
+
+    vectors = cache.embed(["a b", "c d", "a b"], embed)
+    again = cache.embed(["c d", "e f"], embed)
+
+    assert embed.calls == [["a b", "c d"], ["e f"]]
+    assert np.array_equal(vectors[1], again[0])
+    assert np.array_equal(vectors, hashing_embedder()(["a b", "c d", "a b"]))
+    assert cache.stats()["hits"] == 1
+
+
+def test_cache_survives_reopen_and_is_keyed_by_model(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    EmbeddingCache(path).embed(["a b"], hashing_embedder())
+
+    same_model = counting(hashing_embedder())
+    cached_embedder(same_model, EmbeddingCache(path))(["a b"])
+    assert same_model.calls == []
+
+    other_model = counting(hashing_embedder(dim=64))
+    cached_embedder(other_model, EmbeddingCache(path))(["a b"])
+    assert other_model.calls == [["a b"]]
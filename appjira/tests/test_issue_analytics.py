@@ -0,0 +1,42 @@
+import pytest
+
+from issue_analytics import IssueAnalytics
+
+ISSUES = [
+    {"key": "PROJ-1", "summary": "Login timeout", "project_key": "PROJ", "status": "Done",
+     "priority": "High", "issue_type": "Bug", "sprint_name": "Sprint 5", "sprint_state": "active"},
+    {"key": "PROJ-2", "summary": "Add export", "project_key": "PROJ", "status": "To Do",
+     "priority": "Low", "issue_type": "Bug", "sprint_name": "Sprint 5", "sprint_state": "active"},
+    {"key": "API-3", "summary": "Rate limits", "project_key": "API", "status": "In Progress",
+     "priority": "Medium", "issue_type": "Sub-task"},
+]
+
+
+@pytest.fixture
+def analytics(tmp_path):
+    analytics = IssueAnalytics(str(tmp_path / "analytics.json"))
+    analytics.sync(ISSUES)
+    return analytics
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("how many open bugs in PROJ?", "1 issues matching"),
+    ("how many tickets are there?", "3 issues matching"),
+    ("how many sub-tasks in API?", "1 issues matching"),
+    ("how many issues in sprint 5?", "2 issues matching"),
+    ("what's left in the current sprint?", "1 issues in the current sprint"),
+    ("number of issues per project", "3 issues matching, by project key"),
+])
+def test_aggregate_questions_are_answered(analytics, question, expected):
+    assert analytics.answer(question).startswith(expected)
+
+
+@pytest.mark.parametrize("question", [
+    "how many issues mention the login timeout?",
+    "how many tickets did Alice close last week?",
+    "how many issues were created by Alice?",
+    "how many retries does the client do?",
+    "what is the login timeout?",
+])
+def test_questions_with_other_predicates_go_to_search(analytics, question):
+    assert analytics.answer(question) is None
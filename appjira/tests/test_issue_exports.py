@@ -0,0 +1,19 @@
+import csv
+import zipfile
+
+from issue_exports import IssueExporter
+
+
+def test_xlsx_and_csv_are_streamed(tmp_path):
+    exporter = IssueExporter(str(tmp_path), ["csv", "xlsx"])
+    for i in range(3):
+        exporter.write({"key": f"PROJ-{i}", "summary": "=HYPERLINK(\"x\")", "board_id": "7", "files": [{"filename": "a.txt"}]})
+    exporter.close()
+
+    with open(tmp_path / "all_issues.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["key"] for row in rows] == ["PROJ-0", "PROJ-1", "PROJ-2"]
+
+    sheet = zipfile.ZipFile(tmp_path / "all_issues.xlsx").read("xl/worksheets/sheet1.xml").decode()
+    assert "PROJ-2" in sheet
+    assert "<f>" not in sheet   # text that looks like a formula stays text
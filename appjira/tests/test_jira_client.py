@@ -0,0 +1,96 @@
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+from jira_client import JiraClient
+
+TOTAL_ISSUES = 120
+
+
+class FakeJira(BaseHTTPRequestHandler):
+    """Paged ``board/{id}/issue`` endpoint that records concurrency and can throttle."""
+
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+    throttle_next = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            if cls.throttle_next:
+                cls.throttle_next -= 1
+                self.send_response(429)
+                self.send_header("Retry-After", "0.01")
+                self.end_headers()
+                return
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        time.sleep(0.02)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        size = int(query["maxResults"][0])
+        if url.path == "/rest/api/3/search/jql":
+            # Token paging: no startAt or total, just the token of the next page.
+            start = int(query.get("nextPageToken", ["0"])[0])
+            end = min(start + size, TOTAL_ISSUES)
+            page = {"issues": [{"key": f"P-{i}"} for i in range(start, end)], "isLast": end >= TOTAL_ISSUES}
+            if end < TOTAL_ISSUES:
+                page["nextPageToken"] = str(end)
+        else:
+            start = int(query["startAt"][0])
+            issues = [{"key": f"P-{i}"} for i in range(start, min(start + size, TOTAL_ISSUES))]
+            page = {"startAt": start, "maxResults": size, "total": TOTAL_ISSUES, "issues": issues}
+        body = json.dumps(page).encode()
+        with cls.lock:
+            cls.active -= 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def jira():
+    FakeJira.active = FakeJira.peak = FakeJira.throttle_next = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeJira)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_paginate_returns_every_issue_in_order(jira):
+    client = JiraClient(jira, max_workers=4, page_size=10)
+    issues = client.paginate("/rest/agile/1.0/board/1/issue", items_key="issues")
+    assert [i["key"] for i in issues] == [f"P-{i}" for i in range(TOTAL_ISSUES)]
+
+
+def test_paginate_follows_next_page_tokens(jira):
+    client = JiraClient(jira, max_workers=4, page_size=25)
+    issues = client.paginate("/rest/api/3/search/jql", {"jql": "project = P"}, items_key="issues")
+    assert [i["key"] for i in issues] == [f"P-{i}" for i in range(TOTAL_ISSUES)]
+    assert client.stats["requests"] == 5
+
+
+def test_nested_map_stays_within_max_workers(jira):
+    client = JiraClient(jira, max_workers=3, page_size=10)
+    boards = client.map(lambda board: client.paginate(f"/rest/agile/1.0/board/{board}/issue", items_key="issues"), range(4))
+    assert all(len(issues) == TOTAL_ISSUES for issues in boards)
+    assert FakeJira.peak <= 3
+
+
+def test_throttled_requests_are_retried(jira):
+    FakeJira.throttle_next = 2
+    client = JiraClient(jira, max_workers=1, page_size=50, backoff=0.01)
+    issues = client.paginate("/rest/agile/1.0/board/1/issue", items_key="issues")
+    assert len(issues) == TOTAL_ISSUES
+    assert client.stats["throttled"] == 2
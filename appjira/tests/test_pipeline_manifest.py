@@ -0,0 +1,37 @@
+import time
+
+from pipeline_manifest import PipelineManifest
+
+
+def failed_run(path, age=0):
+    manifest = PipelineManifest(path)
+    manifest.begin({"incremental": False})
+    manifest.finish_stage("fetch")
+    manifest.data["run"]["started_at"] = time.time() - age
+    manifest.end("failed", error="boom")
+
+
+def test_recent_failed_run_is_resumed(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    failed_run(path, age=60)
+    manifest = PipelineManifest(path)
+    assert manifest.begin({"incremental": False}, max_age=3600)
+    assert manifest.stage_done("fetch")
+
+
+def test_stale_failed_run_starts_fresh(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    failed_run(path, age=7200)
+    manifest = PipelineManifest(path)
+    assert not manifest.begin({"incremental": False}, max_age=3600)
+    assert not manifest.stage_done("fetch")
+
+
+def test_reset_stage_forgets_progress(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    failed_run(path)
+    manifest = PipelineManifest(path)
+    manifest.begin({"incremental": False})
+    manifest.reset_stage("fetch")
+    assert not manifest.stage_done("fetch")
+    assert not PipelineManifest(path).stage_done("fetch")
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from query_planner import matches, plan_query, to_weaviate_filter
+
+NOW = datetime(2024, 6, 15, 12, 0, tzinfo=timezone.utc)
+OPEN = {"not_in": ["Done", "Closed", "Resolved"]}
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("how many open bugs in PROJ?", {"project_key": {"in": ["PROJ"]}, "issue_type": {"eq": "Bug"}, "status": OPEN}),
+    ("status open", {"status": OPEN}),
+    ("tickets that are done", {"status": {"in": ["Done", "Closed", "Resolved"]}}),
+    ("stories in progress", {"issue_type": {"eq": "Story"}, "status": {"in": ["In Progress"]}}),
+    ("low priority issues", {"priority": {"eq": "Low"}}),
+    ("priority: high", {"priority": {"eq": "High"}}),
+    ("critical open issues", {"status": OPEN, "priority": {"eq": "Highest"}}),
+    ("issues in sprint 5", {"sprint_names": {"match": "sprint 5"}}),
+    ("bugs created in the last 2 weeks", {"issue_type": {"eq": "Bug"}, "created": {"gte": datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc)}}),
+])
+def test_explicit_predicates_become_filters(question, expected):
+    assert plan_query(question, now=NOW)["filters"] == expected
+
+
+@pytest.mark.parametrize("question", [
+    "how do I open the settings page?",
+    "login fails on low memory devices",
+    "what do I need to do to deploy?",
+    "is the export done yet?",
+    "what tasks are blocking the release?",
+])
+def test_everyday_words_are_left_to_the_ranker(question):
+    assert plan_query(question, now=NOW)["filters"] == {}
+
+
+def test_sprint_phrase_is_taken_out_of_the_text():
+    assert plan_query("login bugs in sprint 12", now=NOW)["text"] == "login bugs in"
+
+
+def test_list_properties_match_any_value():
+    props = {"status": "To Do", "sprint_names": ["Sprint 4", "Sprint 5"]}
+    assert matches(props, {"sprint_names": {"match": "sprint 5"}})
+    assert not matches(props, {"sprint_names": {"match": "sprint 6"}})
+    assert matches(props, {"sprint_names": {"in": ["sprint 4"]}})
+    assert not matches(props, {"sprint_names": {"not_in": ["Sprint 4"]}})
+    assert matches(props, {"status": OPEN})
+
+
+def test_no_filters_means_no_weaviate_filter():
+    assert to_weaviate_filter({}) is None
+
+
+def test_weaviate_filter_ands_every_clause():
+    pytest.importorskip("weaviate")
+    from weaviate.collections.classes.filters import _FilterAnd
+
+    combined = to_weaviate_filter({"status": OPEN, "priority": {"eq": "Low"}})
+    assert isinstance(combined, _FilterAnd)
+    assert len(combined.filters) == 4
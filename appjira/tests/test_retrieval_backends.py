@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from retrieval_backends import LocalHybridBackend, hashing_embedder, tokenize
+
+
+def issue(key, summary, **fields):
+    return {"key": key, "summary": summary, "project_key": key.split("-")[0], "status": "To Do", **fields}
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    return str(tmp_path / "index")
+
+
+def keys(hits):
+    return [hit["key"] for hit in hits]
+
+
+def test_tokenize_keeps_issue_keys_whole():
+    assert tokenize("See PROJ-12, not proj 12") == ["see", "proj-12", "not", "proj", "12"]
+
+
+def test_sync_adds_changes_and_deletes(index_dir):
+    backend = LocalHybridBackend(index_dir)
+    assert backend.sync([issue("P-1", "login timeout"), issue("P-2", "csv export")]) == {"indexed": 2, "deleted": 0, "total": 2}
+    assert backend.sync([issue("P-1", "login timeout"), issue("P-2", "xlsx export")]) == {"indexed": 1, "deleted": 0, "total": 2}
+    assert backend.sync([issue("P-2", "xlsx export")]) == {"indexed": 0, "deleted": 1, "total": 1}
+    assert keys(backend.search("export")) == ["P-2"]
+    assert "P-1" not in keys(backend.search("login"))
+
+
+def test_sync_keeps_issues_when_the_stream_is_incomplete(index_dir):
+    backend = LocalHybridBackend(index_dir)
+    backend.sync([issue("P-1", "a"), issue("P-2", "b")])
+    assert backend.sync([issue("P-1", "a")], load_errors=["broken_cleaned.json"])["deleted"] == 0
+    assert sorted(backend.key_to_row) == ["P-1", "P-2"]
+
+
+def test_search_applies_filters(index_dir):
+    backend = LocalHybridBackend(index_dir)
+    backend.sync([issue("P-1", "login bug", status="Done"), issue("P-2", "login page", status="To Do")])
+    assert keys(backend.search("login", filters={"status": {"eq": "Done"}})) == ["P-1"]
+
+
+def test_sprint_filter_covers_every_sprint_of_an_issue(index_dir):
+    backend = LocalHybridBackend(index_dir)
+    backend.sync([
+        issue("P-1", "login bug", sprint_name="Sprint 5", sprints=[{"name": "Sprint 4"}, {"name": "Sprint 5"}]),
+        issue("P-2", "login page", sprint_name="Sprint 5", sprints=[{"name": "Sprint 5"}]),
+    ])
+    assert keys(backend.search("login", filters={"sprint_names": {"match": "sprint 4"}})) == ["P-1"]
+
+
+def test_compact_keeps_vectors_and_results(index_dir):
+    backend = LocalHybridBackend(index_dir)
+    backend.sync([issue(f"P-{i}", f"issue number {i} about topic{i % 3}") for i in range(20)])
+    before = {key: np.array(backend.vectors[row]) for key, row in backend.key_to_row.items()}
+    backend.delete([f"P-{i}" for i in range(0, 20, 2)])
+    backend.compact()
+    backend.save()
+
+    reloaded = LocalHybridBackend(index_dir)
+    assert len(reloaded.docs) == 10
+    for key, row in reloaded.key_to_row.items():
+        assert np.array_equal(reloaded.vectors[row], before[key])
+    assert keys(reloaded.search("topic1", limit=3))[0] in {"P-1", "P-7", "P-13", "P-19"}
+
+
+def test_reader_picks_up_saves_of_another_instance(index_dir):
+    writer = LocalHybridBackend(index_dir)
+    writer.sync([issue("P-1", "login timeout")])
+    reader = LocalHybridBackend(index_dir)
+    writer.sync([issue("P-1", "login timeout"), issue("P-2", "login page")])
+    assert sorted(keys(reader.search("login"))) == ["P-1", "P-2"]
+
+
+def test_growing_or_compacting_does_not_touch_a_mapped_reader(index_dir):
+    writer = LocalHybridBackend(index_dir, embed_fn=hashing_embedder(dim=16))
+    writer.sync([issue(f"P-{i}", f"summary {i}") for i in range(10)])
+    reader = LocalHybridBackend(index_dir, embed_fn=hashing_embedder(dim=16))
+    mapped = np.array(reader.vectors[:10])
+
+    # Past the initial capacity, so the vector file is regrown.
+    writer.sync([issue(f"P-{i}", f"summary {i}") for i in range(1500)])
+    assert np.array_equal(reader.vectors[:10], mapped)
+    writer.delete([f"P-{i}" for i in range(5)])
+    writer.compact()
+    writer.save()
+    assert np.array_equal(reader.vectors[:10], mapped)
+
+    reader.reload_if_changed()
+    assert len(reader.key_to_row) == 1495
+    row = reader.key_to_row["P-7"]
+    assert np.array_equal(reader.vectors[row], writer.vectors[writer.key_to_row["P-7"]])
+
+
+def test_writers_start_from_the_latest_save(index_dir):
+    api = LocalHybridBackend(index_dir)
+    api.sync([issue("P-1", "login timeout")])
+    LocalHybridBackend(index_dir).sync([issue(f"P-{i}", f"summary {i}") for i in range(1, 4)])
+
+    # What the webhook sink does for an update to P-1.
+    with api.writing():
+        current = api.docs[api.key_to_row["P-1"]]
+        api.add([{**current, "status": "Done"}])
+        api.save()
+
+    reloaded = LocalHybridBackend(index_dir)
+    assert sorted(reloaded.key_to_row) == ["P-1", "P-2", "P-3"]
+    assert reloaded.docs[reloaded.key_to_row["P-1"]]["status"] == "Done"
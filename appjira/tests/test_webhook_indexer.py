@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("weaviate")   # webhook_indexer builds objects with weaviate_create_collections
+
+from retrieval_backends import LocalHybridBackend
+from webhook_indexer import LocalSink, WebhookIndexer
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_dir(tmp_path, monkeypatch):
+    # A flush bumps the ingest version under combined/ in the working directory.
+    monkeypatch.chdir(tmp_path)
+
+
+class RecordingSink:
+    def __init__(self):
+        self.batches = []
+
+    def apply(self, upserts, deletes):
+        self.batches.append((upserts, sorted(deletes)))
+        return []
+
+
+def event(kind, key, timestamp, **fields):
+    return {"webhookEvent": f"jira:issue_{kind}", "timestamp": timestamp, "issue": {"key": key, "fields": fields}}
+
+
+def test_events_for_one_issue_collapse_into_one_write():
+    sink = RecordingSink()
+    indexer = WebhookIndexer(sink, window=60)
+    indexer.submit(event("updated", "P-1", 1, summary="first"))
+    indexer.submit(event("updated", "P-1", 3, status={"name": "Done"}))
+    indexer.submit(event("updated", "P-1", 2, summary="older"))   # arrives late: fills gaps only
+    indexer.submit(event("updated", "P-2", 1, summary="gone soon"))
+    indexer.submit(event("deleted", "P-2", 2))
+    assert indexer.submit({"webhookEvent": "sprint_started"}) is None
+    indexer.flush()
+
+    [(upserts, deletes)] = sink.batches
+    assert upserts == {"P-1": {"key": "P-1", "summary": "first", "status": "Done"}}
+    assert deletes == ["P-2"]
+    assert indexer.stats["coalesced"] == 3
+    assert indexer.stats["ignored"] == 1
+
+
+def test_local_sink_merges_partial_updates(tmp_path):
+    backend = LocalHybridBackend(str(tmp_path / "index"))
+    backend.sync([{"key": "P-1", "summary": "login timeout", "status": "To Do", "project_key": "P"}])
+    indexer = WebhookIndexer(LocalSink(backend), window=60)
+    indexer.submit(event("updated", "P-1", 1, status={"name": "Done"}))
+    indexer.submit(event("updated", "P-9", 1, summary="never indexed"))
+    indexer.flush()
+
+    reloaded = LocalHybridBackend(str(tmp_path / "index"))
+    assert sorted(reloaded.key_to_row) == ["P-1"]
+    assert reloaded.docs[reloaded.key_to_row["P-1"]]["summary"] == "login timeout"
+    assert reloaded.docs[reloaded.key_to_row["P-1"]]["status"] == "Done"
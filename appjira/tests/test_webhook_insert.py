@@ -0,0 +1,51 @@
+import csv
+
+from webhook_insert import WebhookIssueStore, save_webhook_to_dict
+
+
+def read_keys(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row["key"] for row in csv.DictReader(f)]
+
+
+def test_export_reads_a_committed_snapshot(tmp_path):
+    store = WebhookIssueStore(str(tmp_path / "issues.sqlite"))
+    store.upsert_many([{"key": "P-1", "summary": "a"}, {"key": "P-2", "summary": "b"}])
+
+    # Another delivery is mid-transaction on the shared connection.
+    with store._lock:
+        store._conn.execute("BEGIN IMMEDIATE")
+        try:
+            store._upsert({"key": "P-3", "summary": "c", "extra": "new column"})
+            path = store.export_csv(str(tmp_path / "out" / "issues.csv"))
+        finally:
+            store._conn.execute("ROLLBACK")
+
+    assert read_keys(path) == ["P-1", "P-2"]
+
+
+def test_upsert_keeps_existing_columns(tmp_path):
+    store = WebhookIssueStore(str(tmp_path / "issues.sqlite"))
+    store.upsert({"key": "P-1", "summary": "a", "priority": "High"})
+    assert store.upsert({"key": "P-1", "summary": "b", "priority": None}) == "updated"
+    assert store.get("P-1") == {"key": "P-1", "summary": "b", "priority": "High"}
+
+
+def test_rows_come_from_the_event_properties(tmp_path):
+    store = WebhookIssueStore(str(tmp_path / "issues.sqlite"))
+    store.upsert(save_webhook_to_dict({"key": "P-1", "summary": "a", "status": "To Do", "priority": "High",
+                                       "project_name": "Payments", "project_key": "P"}))
+    # A status-only update leaves the other columns alone.
+    store.upsert(save_webhook_to_dict({"key": "P-1", "status": "Done"}))
+    row = store.get("P-1")
+    assert {k: row[k] for k in ("summary", "status", "priority", "project", "project_key")} == {
+        "summary": "a", "status": "Done", "priority": "High", "project": "Payments", "project_key": "P",
+    }
+
+
+def test_delete_removes_the_row(tmp_path):
+    store = WebhookIssueStore(str(tmp_path / "issues.sqlite"))
+    store.upsert({"key": "P-1", "summary": "a"})
+    assert store.delete("P-1") is True
+    assert store.delete("P-1") is False
+    assert store.get("P-1") is None
@@ -1,5 +1,7 @@
 import os
 import json
+import tempfile
+import itertools
 import pandas as pd
 from glob import glob
 from uuid import uuid5, NAMESPACE_DNS
@@ -9,10 +11,29 @@ from dotenv import load_dotenv
 from weaviate.auth import AuthApiKey
 import weaviate
 import weaviate.classes.config as wc
+from weaviate.classes.query import Filter
+
+from fingerprint_store import FingerprintStore, fingerprint
+from issue_summaries import summarize_issues
+from llm_cache import bump_ingest_version
+from issue_analytics import IssueAnalytics, ANALYTICS_PATH, RECORD_FIELDS
+from issue_exports import IssueExporter, exports_from_env
+from issue_text import format_issue_doc, iter_windows, sprint_names
+from bulk_uploader import BulkUploader
+from embedding_cache import EmbeddingCache
+from retrieval_backends import openai_embedder
+from attachment_chunks import ATTACHMENT_COLLECTION_NAME, attachment_filenames, build_attachment_chunks
 
 # === Load Environment Variables ===
 load_dotenv("/Users/hemasagarendluri1996/jira-rag-pipeline/.env")
 JIRA_COLLECTION_NAME = os.getenv("wEAVIATE_COLLECTION_NAME") or "JiraIssue"
+UPLOAD_WINDOW = int(os.getenv("UPLOAD_WINDOW", "500"))
+# Fingerprints are committed every UPLOAD_CHECKPOINT_WINDOWS windows, so a rerun resumes from there.
+UPLOAD_CHECKPOINT_WINDOWS = int(os.getenv("UPLOAD_CHECKPOINT_WINDOWS", "10"))
+# "server": Weaviate's text2vec_openai embeds objects; "client": vectors are computed and cached here.
+EMBEDDING_MODE = (os.getenv("EMBEDDING_MODE") or "server").lower()
+# Fields kept per issue for the analytics index (the full issues are streamed on).
+ANALYTICS_FIELDS = RECORD_FIELDS + ("sprint_id", "sprint_name", "sprint_state", "sprints")
 # === Part 1: Combine all JSON files into one dataset ===
 def get_cleaned_files(folder):
     return glob(os.path.join(folder, "*_cleaned.json"))
@@ -21,14 +42,12 @@ def load_json(filepath):
     with open(filepath, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def combine_issues(folder, output_path="combined"):
-    os.makedirs(output_path, exist_ok=True)
-    all_issues = []
-    project_summary = []
-
-    files = get_cleaned_files(folder)
+def iter_cleaned_issues(folder, project_summary=None, failed=None):
+    """Yield issues from every cleaned file, holding one file in memory at a time.
 
-    for path in files:
+    Files that cannot be loaded are skipped and appended to ``failed``.
+    """
+    for path in get_cleaned_files(folder):
         try:
             data = load_json(path)
 
@@ -38,65 +57,196 @@ def combine_issues(folder, output_path="combined"):
                 issues = data
             else:
                 raise ValueError("Unrecognized JSON structure in file: " + path)
+        except Exception as e:
+            print(f"❌ Failed to load {path}: {e}")
+            if failed is not None:
+                failed.append(path)
+            continue
 
-            project_name = data.get("project_name", "UnknownProject")
-            total = 0
-
-            for issue in issues:
-                if not isinstance(issue, dict):
-                    continue
-                if "project_name" not in issue:
-                    issue["project_name"] = project_name
-                all_issues.append(issue)
-                total += 1
+        project_name = data.get("project_name", "UnknownProject") if isinstance(data, dict) else "UnknownProject"
+        total = 0
+        for issue in issues:
+            if not isinstance(issue, dict):
+                continue
+            if "project_name" not in issue:
+                issue["project_name"] = project_name
+            total += 1
+            yield issue
 
+        if project_summary is not None:
             project_summary.append({
                 "project_name": project_name,
                 "file": os.path.basename(path),
                 "total_issues": total
             })
 
-        except Exception as e:
-            print(f"❌ Failed to load {path}: {e}")
+def combine_issues(folder, output_path="combined", exports=None, failed=None):
+    """Stream the issues of all cleaned files, writing exports along the way.
 
-    with open(os.path.join(output_path, "all_issues.json"), "w", encoding="utf-8") as f:
-        json.dump(all_issues, f, indent=2, ensure_ascii=False)
+    A generator: issues flow straight on to the summarizer/uploader, so memory
+    stays flat however many issues there are. ``exports`` lists the formats
+    written to ``output_path`` (see issue_exports; COMBINE_EXPORTS, jsonl by
+    default). The project summary and issue analytics are written once the
+    stream has been consumed.
 
-    with open(os.path.join(output_path, "all_issues.jsonl"), "w", encoding="utf-8") as f:
-        for issue in all_issues:
-            f.write(json.dumps(issue, ensure_ascii=False) + "\n")
+    Paths of cleaned files that failed to load are appended to ``failed``;
+    consumers must not treat issues missing from such a stream as deleted.
+    """
+    exports = exports_from_env() if exports is None else exports
+    exporter = IssueExporter(output_path, exports)
+    project_summary = []
+    failed = [] if failed is None else failed
 
-    with open(os.path.join(output_path, "project_summary.json"), "w", encoding="utf-8") as f:
-        json.dump(project_summary, f, indent=2, ensure_ascii=False)
+    # Analytics fields are spooled to a temp file rather than kept in a list.
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as analytics_rows:
+        try:
+            for issue in iter_cleaned_issues(folder, project_summary, failed):
+                exporter.write(issue)
+                analytics_rows.write(json.dumps({field: issue.get(field) for field in ANALYTICS_FIELDS}, ensure_ascii=False) + "\n")
+                yield issue
+        finally:
+            exporter.close()
 
-    df = pd.DataFrame(all_issues)
-    df.to_excel(os.path.join(output_path, "all_issues.xlsx"), index=False)
-    df.to_csv(os.path.join(output_path, "all_issues.csv"), index=False)
+        with open(os.path.join(output_path, "project_summary.json"), "w", encoding="utf-8") as f:
+            json.dump(project_summary, f, indent=2, ensure_ascii=False)
 
-    print(f"✅ Combined {len(files)} files into {len(all_issues)} issues.")
-    print(f"📊 DataFrame shape: {df.shape}")
-    print(f"📁 Output saved to: {output_path}")
+        analytics_rows.seek(0)
+        analytics = IssueAnalytics(os.path.join(output_path, os.path.basename(ANALYTICS_PATH)))
+        rows = (json.loads(line) for line in analytics_rows)
+        print(f"📈 Issue analytics: {analytics.sync(rows, delete_missing=not failed)}")
 
-    return df, all_issues
+    print(f"✅ Combined {len(project_summary)} files into {exporter.count} issues.")
+    print(f"📁 Exports ({', '.join(exports) or 'none'}) saved to: {output_path}")
 
 
 # === Part 2: Upload to Weaviate (v4 API) ===
-def upload_to_weaviate(df):
-    client = weaviate.connect_to_weaviate_cloud(
-        cluster_url=os.getenv("WEAVIATE_URL"),
-        auth_credentials=AuthApiKey(api_key=os.getenv("WEAVIATE_API_KEY")),
-        headers={"X-OpenAI-Api-Key": os.getenv("OPENAI_API_KEY")}
+# Board/sprint placement produced by process_all_files, used by query filters.
+FILTER_PROPERTIES = [
+    wc.Property(name="board_id", data_type=wc.DataType.INT, index_filterable=True),
+    wc.Property(name="board_name", data_type=wc.DataType.TEXT, index_filterable=True),
+    wc.Property(name="sprint_id", data_type=wc.DataType.INT, index_filterable=True),
+    wc.Property(name="sprint_name", data_type=wc.DataType.TEXT, index_filterable=True),
+    # Every sprint the issue is in; sprint_name is only the primary one.
+    wc.Property(name="sprint_names", data_type=wc.DataType.TEXT_ARRAY, index_filterable=True),
+]
+
+def generate_uuid5(value: str) -> str:
+    return str(uuid5(NAMESPACE_DNS, str(value)))
+
+# Scalar text properties of an issue object, in schema order.
+TEXT_PROPERTIES = (
+    "key", "project_key", "project_name", "summary", "description", "issue_type", "status",
+    "priority", "created", "updated", "reporter", "creator", "parent_summary", "parent_key",
+    "parent_priority", "parent_description", "parent_issuetype", "parent_issuetype_icon",
+    "summary_llm", "board_name", "sprint_name",
+)
+INT_PROPERTIES = ("board_id", "sprint_id")
+
+def build_issue_objects(rows):
+    """Normalize combined issue rows into Weaviate objects, keyed by UUID.
+
+    Properties are built a column at a time; missing/NaN values become "" (or
+    are left out for integer properties). Rows sharing a key collapse into
+    one object, the last row winning.
+    """
+    rows = list(rows)
+    frame = pd.DataFrame.from_records(rows)
+    n = len(frame)
+    if not n:
+        return {}
+
+    def column(name):
+        return frame[name] if name in frame else pd.Series([None] * n, dtype=object)
+
+    text_columns = [column(name).fillna("").astype(str).tolist() for name in TEXT_PROPERTIES]
+    objects = [dict(zip(TEXT_PROPERTIES, values)) for values in zip(*text_columns)]
+
+    subtasks = column("subtasks").tolist()
+    files = column("files").tolist()
+    int_columns = {name: pd.to_numeric(column(name), errors="coerce").tolist() for name in INT_PROPERTIES}
+    for i, obj in enumerate(objects):
+        obj["subtasks"] = [str(x) for x in subtasks[i]] if isinstance(subtasks[i], list) else []
+        obj["files"] = attachment_filenames(files[i]) if isinstance(files[i], list) else []
+        obj["sprint_names"] = sprint_names(rows[i])
+        for name, values in int_columns.items():
+            if values[i] == values[i]:  # not NaN
+                obj[name] = int(values[i])
+
+    return {generate_uuid5(obj["key"]): obj for obj in objects}
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+def build_issue_object(row):
+    """Normalize one combined issue row into the properties stored in Weaviate.
+
+    Same output as build_issue_objects, built with plain dict lookups: the
+    webhook path calls this once per event, where a DataFrame costs more
+    than the row itself.
+    """
+    obj = {name: "" if _is_missing(row.get(name)) else str(row.get(name)) for name in TEXT_PROPERTIES}
+    subtasks, files = row.get("subtasks"), row.get("files")
+    obj["subtasks"] = [str(x) for x in subtasks] if isinstance(subtasks, list) else []
+    obj["files"] = attachment_filenames(files) if isinstance(files, list) else []
+    obj["sprint_names"] = sprint_names(row)
+    for name in INT_PROPERTIES:
+        try:
+            value = float(row.get(name))
+        except (TypeError, ValueError):
+            continue
+        if value == value:  # not NaN
+            obj[name] = int(value)
+    return obj
+
+def ensure_properties(collection, properties):
+    """Add properties introduced after the collection was first created."""
+    existing = {p.name for p in collection.config.get().properties}
+    for prop in properties:
+        if prop.name not in existing:
+            collection.config.add_property(prop)
+            print(f"➕ Added property '{prop.name}' to '{collection.name}'.")
+
+def chunk_uuid(chunk):
+    return generate_uuid5(f"{chunk['issue_key']}:{chunk['attachment_id']}:{chunk['filename']}:{chunk['chunk_index']}")
+
+def delete_chunks_for(collection, issue_keys):
+    # issue_key is field-tokenized, so "PROJ-12" matches only that key (not "proj"/"12").
+    for i in range(0, len(issue_keys), 100):
+        collection.data.delete_many(where=Filter.by_property("issue_key").contains_any(issue_keys[i:i + 100]))
+
+def vectorizer_config(client_vectors=None):
+    """Server-side OpenAI vectorizer, or none when vectors are computed client-side."""
+    if client_vectors if client_vectors is not None else EMBEDDING_MODE == "client":
+        return wc.Configure.Vectorizer.none()
+    return wc.Configure.Vectorizer.text2vec_openai()
+
+def check_embedding_mode(collection, client_vectors):
+    """Refuse to mix client- and server-computed vectors in one collection.
+
+    The vectorizer is fixed when a collection is created, so switching
+    EMBEDDING_MODE for an existing collection would put vectors from two
+    models side by side (or leave new objects without any).
+    """
+    config = collection.config.get()
+    vectorizer = str(getattr(config.vectorizer, "value", config.vectorizer) or "none").lower()
+    if client_vectors == (vectorizer == "none"):
+        return
+    total = collection.aggregate.over_all(total_count=True).total_count
+    raise RuntimeError(
+        f"Collection '{collection.name}' uses vectorizer '{vectorizer}' and holds {total} objects, "
+        f"but EMBEDDING_MODE={'client' if client_vectors else 'server'}. Use the mode it was built with, "
+        f"or delete the collection to rebuild it in the new mode."
     )
 
+def ensure_issue_collection(client, client_vectors=None):
+    """Create the issue collection if missing; returns (collection, created)."""
     collection_name = JIRA_COLLECTION_NAME
-
-    # Check existing collections
-    collections = client.collections.list_all()
-    if collection_name not in collections:
+    created = collection_name not in client.collections.list_all()
+    if created:
         client.collections.create(
             name=collection_name,
             description="Stores Jira issues for RAG queries",
-            vectorizer_config=wc.Configure.Vectorizer.text2vec_openai(),  # embed text fields
+            vectorizer_config=vectorizer_config(client_vectors),  # embed text fields
             properties=[
                 wc.Property(name="key", data_type=wc.DataType.TEXT),
                 wc.Property(name="project_key", data_type=wc.DataType.TEXT),
@@ -118,6 +268,8 @@ def upload_to_weaviate(df):
                 wc.Property(name="parent_description", data_type=wc.DataType.TEXT),
                 wc.Property(name="parent_issuetype", data_type=wc.DataType.TEXT),
                 wc.Property(name="parent_issuetype_icon", data_type=wc.DataType.TEXT),
+                wc.Property(name="summary_llm", data_type=wc.DataType.TEXT),
+                *FILTER_PROPERTIES,
             ]
         )
         print(f"✅ Collection '{collection_name}' created!")
@@ -125,52 +277,238 @@ def upload_to_weaviate(df):
         print(f"ℹ️ Collection '{collection_name}' already exists, skipping creation.")
 
     collection = client.collections.get(collection_name)
+    ensure_properties(collection, [wc.Property(name="summary_llm", data_type=wc.DataType.TEXT), *FILTER_PROPERTIES])
+    return collection, created
+
+def ensure_chunk_collection(client, client_vectors=None):
+    """Create the attachment chunk collection if missing; returns (collection, created).
 
-    def generate_uuid5(value: str) -> str:
-        return str(uuid5(NAMESPACE_DNS, str(value)))
-
-    with collection.batch.fixed_size(50) as batch:
-        for _, row in tqdm(df.iterrows(), total=len(df)):
-            jira_issue_obj = {
-                "key": str(row.get("key", "")),
-                "project_key": str(row.get("project_key", "")),
-                "project_name": str(row.get("project_name", "")),
-                "summary": str(row.get("summary", "")),
-                "description": str(row.get("description", "")),
-                "issue_type": str(row.get("issue_type", "")),
-                "status": str(row.get("status", "")),
-                "priority": str(row.get("priority", "")),
-                "created": str(row.get("created", "")),
-                "updated": str(row.get("updated", "")),
-                "reporter": str(row.get("reporter", "")),
-                "creator": str(row.get("creator", "")),
-                "subtasks": [str(x) for x in row.get("subtasks", [])] if isinstance(row.get("subtasks"), list) else [],
-                "files": [str(x) for x in row.get("files", [])] if isinstance(row.get("files"), list) else [],
-                "parent_summary": str(row.get("parent_summary", "")),
-                "parent_key": str(row.get("parent_key", "")),
-                "parent_priority": str(row.get("parent_priority", "")),
-                "parent_description": str(row.get("parent_description", "")),
-                "parent_issuetype": str(row.get("parent_issuetype", "")),
-                "parent_issuetype_icon": str(row.get("parent_issuetype_icon", "")),
-            }
-
-            batch.add_object(
-                properties=jira_issue_obj,
-                uuid=generate_uuid5(row["key"])
-            )
-
-    if len(collection.batch.failed_objects) > 0:
-        print(f"❌ Failed to import {len(collection.batch.failed_objects)} objects:")
-        for failed in collection.batch.failed_objects:
-            print(f"→ Error: {failed.message}")
+    A collection from before issue_key was field-tokenized is dropped and
+    recreated: filters on its word-tokenized keys match other issues' chunks.
+    Its chunks are uploaded again because ``created`` clears their fingerprints.
+    """
+    collection_name = ATTACHMENT_COLLECTION_NAME
+    created = collection_name not in client.collections.list_all()
+    if not created:
+        properties = {p.name: p for p in client.collections.get(collection_name).config.get().properties}
+        if "issue_key" in properties and properties["issue_key"].tokenization != wc.Tokenization.FIELD:
+            print(f"♻️ Recreating '{collection_name}' with field-tokenized issue_key.")
+            client.collections.delete(collection_name)
+            created = True
+    if created:
+        client.collections.create(
+            name=collection_name,
+            description="Chunks of Jira attachment text, linked to issues by issue_key",
+            vectorizer_config=vectorizer_config(client_vectors),
+            properties=[
+                wc.Property(name="issue_key", data_type=wc.DataType.TEXT, index_filterable=True, skip_vectorization=True,
+                            tokenization=wc.Tokenization.FIELD),
+                wc.Property(name="attachment_id", data_type=wc.DataType.TEXT, skip_vectorization=True,
+                            tokenization=wc.Tokenization.FIELD),
+                wc.Property(name="filename", data_type=wc.DataType.TEXT),
+                wc.Property(name="chunk_index", data_type=wc.DataType.INT, skip_vectorization=True),
+                wc.Property(name="text", data_type=wc.DataType.TEXT),
+            ]
+        )
+        print(f"✅ Collection '{collection_name}' created!")
+    return client.collections.get(collection_name), created
+
+def connect():
+    return weaviate.connect_to_weaviate_cloud(
+        cluster_url=os.getenv("WEAVIATE_URL"),
+        auth_credentials=AuthApiKey(api_key=os.getenv("WEAVIATE_API_KEY")),
+        headers={"X-OpenAI-Api-Key": os.getenv("OPENAI_API_KEY")}
+    )
+
+def weaviate_index_exists(fingerprint_path=os.path.join("combined", "issue_fingerprints.json")):
+    """Whether the issue collection and the fingerprints of its last upload are both there."""
+    if not FingerprintStore(fingerprint_path).hashes:
+        return False
+    client = connect()
+    try:
+        return client.collections.exists(JIRA_COLLECTION_NAME)
+    finally:
+        client.close()
+
+def delta_kind(old_hash, new_hash):
+    if old_hash is None:
+        return "added"
+    return "changed" if old_hash != new_hash else "unchanged"
+
+def upload_to_weaviate(issues, fingerprint_path=os.path.join("combined", "issue_fingerprints.json"), embed_fn=None, embedding_cache=None,
+                       load_errors=None):
+    """Stream issues into Weaviate, sending only added/changed ones.
+
+    ``issues`` is any iterable of combined issue dicts (e.g. the combine_issues
+    generator); it is consumed in windows of UPLOAD_WINDOW. Issue objects and
+    their attachment chunks are fingerprinted separately. An issue whose
+    attachments change has its chunks replaced. Issues and chunks missing from
+    the stream are deleted once it ends, unless ``load_errors`` (the list
+    filled by combine_issues) is non-empty: then the stream is incomplete and
+    nothing is deleted.
+
+    Every UPLOAD_CHECKPOINT_WINDOWS windows the batch is closed (failures
+    retried) and the fingerprints of confirmed objects are saved. If the
+    run dies part way, the next one skips everything up to that checkpoint.
+
+    With EMBEDDING_MODE=client (or an ``embed_fn``), vectors are computed
+    here in batches and sent with each object. They are cached by content
+    hash, so unchanged text is never embedded twice, even after the
+    collection is rebuilt. Collections are created without a vectorizer in
+    that mode, and a collection built in the other mode is refused (see
+    check_embedding_mode).
+
+    Returns counts of added, changed, unchanged, deleted and failed issues.
+    """
+    if isinstance(issues, pd.DataFrame):
+        issues = issues.to_dict("records")
+    if embed_fn is None and EMBEDDING_MODE == "client":
+        embed_fn = openai_embedder()
+    if embed_fn is not None:
+        embedding_cache = embedding_cache or EmbeddingCache()
+
+    client = connect()
+    collection, created = ensure_issue_collection(client, client_vectors=embed_fn is not None)
+    chunk_collection, chunks_created = ensure_chunk_collection(client, client_vectors=embed_fn is not None)
+    try:
+        for target in (collection, chunk_collection):
+            check_embedding_mode(target, client_vectors=embed_fn is not None)
+    except RuntimeError:
+        client.close()
+        raise
+
+    # ---- Delta detection: only added/changed issues are (re-)embedded ----
+    store = FingerprintStore(fingerprint_path)
+    chunk_store = FingerprintStore(os.path.join(os.path.dirname(fingerprint_path), "attachment_fingerprints.json"))
+    if created:
+        store.clear()
+    if chunks_created:
+        chunk_store.clear()
+
+    seen, seen_chunks = {}, {}   # key -> hash sent (or confirmed unchanged) in this run
+    counts = {"added": 0, "changed": 0, "unchanged": 0, "deleted": 0, "failed": 0}
+    chunk_counts = {"added": 0, "changed": 0, "unchanged": 0, "deleted": 0, "chunks": 0, "failed": 0}
+    sent = 0
+    progress = tqdm(unit=" issues")
+    upload_stats = {"sent": 0, "duplicates": 0, "retried": 0, "failed": 0, "seconds": 0.0}
+    failed_keys, failed_chunk_keys = set(), set()
+    pending, pending_chunks = {}, {}   # key -> hash sent since the last checkpoint
+
+    windows = iter_windows(issues, UPLOAD_WINDOW)
+    while True:
+        segment = itertools.islice(windows, UPLOAD_CHECKPOINT_WINDOWS)
+        segment_windows = 0
+        with BulkUploader(client) as uploader:
+            for window in segment:
+                segment_windows += 1
+                outgoing = []   # (collection, properties, uuid, text to embed)
+                # An issue listed under several sprints appears more than once; the last row wins.
+                for uuid, obj in build_issue_objects(window).items():
+                    key = obj["key"]
+                    issue_hash = fingerprint(obj)
+                    previous = seen.get(key, store.get(key))
+                    if key not in seen:
+                        counts[delta_kind(store.get(key), issue_hash)] += 1
+                    seen[key] = issue_hash
+                    if previous != issue_hash:
+                        outgoing.append((JIRA_COLLECTION_NAME, obj, uuid, format_issue_doc(obj)))
+                        pending[key] = issue_hash
+                        sent += 1
+
+                replaced = {}
+                for issue in window:
+                    key = str(issue.get("key", ""))
+                    files = issue.get("files") if isinstance(issue.get("files"), list) else []
+                    chunks = build_attachment_chunks(key, files)
+                    chunk_hash = fingerprint(chunks)
+                    previous = seen_chunks.get(key, chunk_store.get(key))
+                    if key not in seen_chunks:
+                        chunk_counts[delta_kind(chunk_store.get(key), chunk_hash)] += 1
+                    seen_chunks[key] = chunk_hash
+                    if previous != chunk_hash:
+                        replaced[key] = chunks
+                        pending_chunks[key] = chunk_hash
+
+                # Replaced attachments may have fewer chunks than before, so clear the old set first.
+                delete_chunks_for(chunk_collection, [key for key in replaced if chunk_store.get(key) is not None])
+                for chunks in replaced.values():
+                    for chunk in chunks:
+                        outgoing.append((ATTACHMENT_COLLECTION_NAME, chunk, chunk_uuid(chunk), f"{chunk['filename']}: {chunk['text']}"))
+                        chunk_counts["chunks"] += 1
+
+                vectors = [None] * len(outgoing)
+                if embed_fn is not None and outgoing:
+                    vectors = [v.tolist() for v in embedding_cache.embed([item[3] for item in outgoing], embed_fn)]
+                for (collection_name, properties, uuid, _), vector in zip(outgoing, vectors):
+                    uploader.add(collection_name, properties, uuid, vector=vector)
+                uploader.flush()
+                progress.update(len(window))
+                progress.set_postfix(sent=upload_stats["sent"] + uploader.stats["sent"])
+
+        for name in ("sent", "duplicates", "retried", "failed", "seconds"):
+            upload_stats[name] += uploader.stats[name]
+        for collection_name, uuid, props, message in uploader.failed:
+            if collection_name == ATTACHMENT_COLLECTION_NAME:
+                failed_chunk_keys.add((props or {}).get("issue_key"))
+            else:
+                failed_keys.add((props or {}).get("key"))
+            print(f"→ Error: {message}")
+
+        # ---- Checkpoint: failed objects keep their old fingerprint so they are retried next run ----
+        if pending or pending_chunks:
+            store.update({key: h for key, h in pending.items() if key not in failed_keys})
+            store.save()
+            chunk_store.update({key: h for key, h in pending_chunks.items() if key not in failed_chunk_keys})
+            chunk_store.save()
+            pending, pending_chunks = {}, {}
+        if segment_windows < UPLOAD_CHECKPOINT_WINDOWS:
+            break
+    progress.close()
+    if upload_stats["seconds"]:
+        upload_stats["objects_per_sec"] = round(upload_stats["sent"] / upload_stats["seconds"], 1)
+    print(f"🚀 Upload throughput: {upload_stats}")
+    if embedding_cache is not None:
+        print(f"🧮 Embedding cache: {embedding_cache.stats()}")
+
+    if failed_keys or failed_chunk_keys:
+        print(f"❌ Failed to import {len(failed_keys)} issues and chunks of {len(failed_chunk_keys)} issues.")
     else:
-        print("✅ All data inserted successfully into 'JiraIssue'.")
+        print(f"✅ All data inserted successfully into '{JIRA_COLLECTION_NAME}'.")
+
+    if load_errors:
+        print(f"⚠️ {len(load_errors)} cleaned files failed to load; skipping deletion of issues missing from the stream.")
+        deleted, deleted_chunks = [], []
+    else:
+        deleted = [key for key in store.hashes if key not in seen]
+        deleted_chunks = [key for key in chunk_store.hashes if key not in seen_chunks]
+    if deleted:
+        deleted_uuids = [generate_uuid5(key) for key in deleted]
+        for i in range(0, len(deleted_uuids), 100):
+            collection.data.delete_many(where=Filter.by_id().contains_any(deleted_uuids[i:i + 100]))
+        print(f"🗑️ Deleted {len(deleted_uuids)} issues no longer present in Jira.")
+    delete_chunks_for(chunk_collection, deleted_chunks)
+
+    store.update({}, deleted=deleted)
+    store.save()
+    chunk_store.update({}, deleted=deleted_chunks)
+    chunk_store.save()
+
+    counts["deleted"] = len(deleted)
+    counts["failed"] = len(failed_keys)
+    chunk_counts["deleted"] = len(deleted_chunks)
+    chunk_counts["failed"] = len(failed_chunk_keys)
+    counts["attachment_chunks"] = chunk_counts
+    print(f"📊 Upload delta: {counts}")
+    chunks_changed = chunk_counts["added"] + chunk_counts["changed"] + len(deleted_chunks) > len(failed_chunk_keys)
+    if sent > len(failed_keys) or deleted or chunks_changed:
+        print(f"🔖 Ingest version is now {bump_ingest_version()}; cached answers are invalidated.")
 
     client.close()
+    return counts
 
 
 # === Run Full Pipeline ===
 if __name__ == "__main__":
     input_folder = "board_project_data_cleaned"
-    combined_df, json_combined_issues = combine_issues(input_folder)
-    upload_to_weaviate(combined_df)
+    load_errors = []
+    upload_to_weaviate(summarize_issues(combine_issues(input_folder, failed=load_errors)), load_errors=load_errors)
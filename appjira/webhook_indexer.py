@@ -0,0 +1,255 @@
+import os
+import time
+import threading
+
+from dynamic_cleaning_agentic import extract_issue_data
+from weaviate_create_collections import build_issue_object, generate_uuid5, delete_chunks_for, EMBEDDING_MODE
+from retrieval_backends import openai_embedder
+from embedding_cache import cached_embedder
+from issue_text import format_issue_doc
+from llm_cache import bump_ingest_version
+
+WEBHOOK_WINDOW = float(os.getenv("WEBHOOK_FLUSH_WINDOW", "2.0"))
+WEBHOOK_MAX_BATCH = int(os.getenv("WEBHOOK_MAX_BATCH", "100"))
+DELETE_EVENTS = ("jira:issue_deleted",)
+CREATE_EVENTS = ("jira:issue_created",)
+UPSERT_EVENTS = ("jira:issue_created", "jira:issue_updated", "comment_created", "comment_updated")
+
+# Issue properties and the Jira field each one is read from. A webhook only
+# overwrites properties whose source field is in its payload.
+SOURCE_FIELDS = {
+    "project_key": "project", "project_name": "project", "summary": "summary",
+    "description": "description", "issue_type": "issuetype", "status": "status",
+    "priority": "priority", "created": "created", "updated": "updated",
+    "reporter": "reporter", "creator": "creator", "subtasks": "subtasks",
+    "parent_summary": "parent", "parent_key": "parent", "parent_priority": "parent",
+    "parent_description": "parent", "parent_issuetype": "parent", "parent_issuetype_icon": "parent",
+}
+
+
+# === Event parsing ===
+def parse_webhook_event(payload):
+    """``(action, key, partial properties, timestamp)`` for an issue event, else None.
+
+    Issues are normalized with extract_issue_data, as in the batch pipeline,
+    but only properties present in the payload are kept, so a partial event
+    (e.g. a comment) does not blank out the rest of the issue. A created
+    issue keeps every property. Attachments are left to the next full sync.
+    """
+    event = payload.get("webhookEvent", "")
+    issue = payload.get("issue") or {}
+    key = issue.get("key")
+    if not key or (event not in DELETE_EVENTS and event not in UPSERT_EVENTS):
+        return None
+    timestamp = payload.get("timestamp") or int(time.time() * 1000)
+    if event in DELETE_EVENTS:
+        return "delete", key, None, timestamp
+
+    fields = issue.get("fields") or {}
+    obj = build_issue_object(extract_issue_data(issue, None, None, attachment_texts={}))
+    if event in CREATE_EVENTS:
+        return "upsert", key, {prop: obj[prop] for prop in ("key", *SOURCE_FIELDS)}, timestamp
+    props = {"key": key}
+    for prop, source in SOURCE_FIELDS.items():
+        if source in fields:
+            props[prop] = obj[prop]
+    return "upsert", key, props, timestamp
+
+
+def is_complete(props):
+    """True if ``props`` can stand alone as an issue object (every webhook-sourced property set)."""
+    return all(prop in props for prop in SOURCE_FIELDS)
+
+
+# === Sinks ===
+class WeaviateSink:
+    """Applies coalesced events to the Weaviate issue collection.
+
+    Upserts are partial: the current objects of the batch are fetched by
+    UUID in one query and merged with the new properties, then written back
+    with a single batch insert (which replaces objects by UUID). A partial
+    update for an issue that is not indexed yet is skipped rather than
+    written as an incomplete object; the next full sync adds it.
+
+    A batch insert replaces the vector too. With ``embed_fn`` (collections
+    built with EMBEDDING_MODE=client, which have no vectorizer) each merged
+    object is embedded here, through the same cache as the upload, so it
+    keeps a vector; otherwise Weaviate re-vectorizes it.
+    """
+
+    def __init__(self, collection, chunk_collection=None, embed_fn=None):
+        self.collection = collection
+        self.chunk_collection = chunk_collection
+        self.embed_fn = embed_fn
+
+    def apply(self, upserts, deletes):
+        from weaviate.classes.data import DataObject
+        from weaviate.classes.query import Filter
+
+        errors = []
+        if upserts:
+            uuids = {key: generate_uuid5(key) for key in upserts}
+            result = self.collection.query.fetch_objects(
+                filters=Filter.by_id().contains_any(list(uuids.values())), limit=len(uuids)
+            )
+            existing = {str(obj.uuid): dict(obj.properties) for obj in result.objects}
+            keys, merged = [], []
+            for key, props in upserts.items():
+                current = existing.get(uuids[key])
+                if current is None and not is_complete(props):
+                    print(f"⏭️ {key} is not indexed yet; leaving the partial update to the next full sync.")
+                    continue
+                keys.append(key)
+                merged.append({**(current or {}), **props})
+            vectors = [None] * len(merged)
+            if self.embed_fn is not None and merged:
+                vectors = [v.tolist() for v in self.embed_fn([format_issue_doc(props) for props in merged])]
+            objects = [
+                DataObject(properties=props, uuid=uuids[key], vector=vector)
+                for key, props, vector in zip(keys, merged, vectors)
+            ]
+            if objects:
+                response = self.collection.data.insert_many(objects)
+                errors = [keys[i] for i in response.errors]
+                for i, error in response.errors.items():
+                    print(f"→ Error indexing {keys[i]}: {error.message}")
+        if deletes:
+            self.collection.data.delete_many(where=Filter.by_id().contains_any([generate_uuid5(k) for k in deletes]))
+            if self.chunk_collection is not None:
+                delete_chunks_for(self.chunk_collection, list(deletes))
+        return errors
+
+
+class LocalSink:
+    """Applies coalesced events to a LocalHybridBackend and saves it."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def apply(self, upserts, deletes):
+        with self.backend.writing():
+            merged = []
+            for key, props in upserts.items():
+                row = self.backend.key_to_row.get(key)
+                if row is None and not is_complete(props):
+                    print(f"⏭️ {key} is not indexed yet; leaving the partial update to the next full sync.")
+                    continue
+                current = self.backend.docs[row] if row is not None else {}
+                merged.append({**current, **props})
+            self.backend.delete(deletes)
+            self.backend.add(merged)
+            self.backend.save()
+        return []
+
+
+def sink_for_backend(backend):
+    """The sink matching a rag_engine retrieval backend."""
+    if hasattr(backend, "key_to_row"):
+        return LocalSink(backend)
+    embed_fn = cached_embedder(openai_embedder()) if EMBEDDING_MODE == "client" else None
+    return WeaviateSink(backend.collection, getattr(backend, "chunk_collection", None), embed_fn=embed_fn)
+
+
+# === Queue ===
+class WebhookIndexer:
+    """In-process queue that coalesces webhook events per issue key.
+
+    ``submit`` only records the event. A background thread flushes pending
+    events ``window`` seconds after the first one arrives (or as soon as
+    ``max_batch`` issues are pending). Events for the same key in between
+    collapse into one write: updates merge, and the newest event decides
+    between upsert and delete.
+    """
+
+    def __init__(self, sink, window=WEBHOOK_WINDOW, max_batch=WEBHOOK_MAX_BATCH):
+        self.sink = sink
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = {"received": 0, "ignored": 0, "coalesced": 0, "batches": 0, "upserts": 0, "deletes": 0, "errors": 0}
+        self._pending = {}          # key -> [action, props, timestamp]
+        self._first_pending = None
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="webhook-indexer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def submit(self, payload):
+        """Queue one webhook payload; returns the parsed action or None."""
+        return self.enqueue(parse_webhook_event(payload))
+
+    def enqueue(self, parsed):
+        """Queue an event already parsed by parse_webhook_event (None counts as ignored)."""
+        with self._cond:
+            self.stats["received"] += 1
+            if parsed is None:
+                self.stats["ignored"] += 1
+                return None
+            action, key, props, timestamp = parsed
+            current = self._pending.get(key)
+            if current is None:
+                self._pending[key] = [action, props, timestamp]
+            else:
+                self.stats["coalesced"] += 1
+                if timestamp >= current[2]:
+                    if action == "upsert" and current[0] == "upsert":
+                        props = {**current[1], **props}
+                    self._pending[key] = [action, props, timestamp]
+                elif action == "upsert" and current[0] == "upsert":
+                    current[1] = {**props, **current[1]}   # older event: fill gaps only
+            if self._first_pending is None:
+                self._first_pending = time.monotonic()
+            self._cond.notify()
+        return action
+
+    def _take(self):
+        with self._cond:
+            pending, self._pending, self._first_pending = self._pending, {}, None
+        upserts = {key: props for key, (action, props, _) in pending.items() if action == "upsert"}
+        deletes = [key for key, (action, _, _) in pending.items() if action == "delete"]
+        return upserts, deletes
+
+    def flush(self):
+        upserts, deletes = self._take()
+        if not upserts and not deletes:
+            return
+        try:
+            errors = self.sink.apply(upserts, deletes)
+        except Exception as e:
+            print(f"❌ Webhook flush failed: {e}")
+            errors = list(upserts) + deletes
+        self.stats["batches"] += 1
+        self.stats["upserts"] += len(upserts)
+        self.stats["deletes"] += len(deletes)
+        self.stats["errors"] += len(errors)
+        if len(errors) < len(upserts) + len(deletes):
+            bump_ingest_version()
+        print(f"⚡ Webhook batch: {len(upserts)} upserts, {len(deletes)} deletes, {len(errors)} errors")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._first_pending is not None:
+                        remaining = self._first_pending + self.window - time.monotonic()
+                        if remaining <= 0 or len(self._pending) >= self.max_batch:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                if self._stopped:
+                    return
+            self.flush()
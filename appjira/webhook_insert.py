@@ -1,74 +1,184 @@
 import csv
 import os
 import json
+import sqlite3
 import tempfile
+import threading
 from datetime import datetime
 
-CSV_FILE = "/Users/hemasagarendluri1996/jira-rag-pipeline/all_issues.csv"
+# Relative to the working directory, like the other stores under combined/. Point
+# WEBHOOK_CSV_FILE at an old all_issues.csv to seed an empty store from it.
+CSV_FILE = os.getenv("WEBHOOK_CSV_FILE") or os.path.join("combined", "webhook_issues.csv")
+STORE_PATH = os.getenv("WEBHOOK_STORE_PATH") or os.path.join("combined", "webhook_issues.sqlite")
 
-def save_webhook_to_dict(payload: dict) -> dict:
-    """Flatten webhook JSON into a dict matching CSV fields."""
-    issue = payload.get("issue", {})
-    fields = issue.get("fields", {})
-    project = fields.get("project", {})
+def save_webhook_to_dict(props: dict) -> dict:
+    """Flatten an event's issue properties (from webhook_indexer.parse_webhook_event) into a CSV row.
 
+    Properties the event did not carry come out as None, so the upsert
+    keeps the stored values.
+    """
     return {
-        "key": issue.get("key"),
-        "summary": fields.get("summary"),
-        "status": "In Progress",
-        "priority": fields.get("priority", {}).get("name"),
-        "project": project.get("name"),
-        "project_key": project.get("key"),
+        "key": props.get("key"),
+        "summary": props.get("summary"),
+        "status": props.get("status"),
+        "priority": props.get("priority"),
+        "project": props.get("project_name"),
+        "project_key": props.get("project_key"),
         "timestamp": datetime.utcnow().isoformat(),  # always update timestamp
     }
 
-def upsert_issue(payload: dict):
-    """Upsert webhook payload into CSV without losing existing columns."""
-    new_row = save_webhook_to_dict(payload)
-    rows = {}
-    headers = list(new_row.keys())  # default headers from dict
-    action = "inserted"
-
-    # Step 1: Read existing CSV
-    if os.path.exists(CSV_FILE) and os.path.getsize(CSV_FILE) > 0:
-        with open(CSV_FILE, mode="r", newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            headers = reader.fieldnames or headers
-            for row in reader:
-                rows[row["key"]] = row
-
-    # Step 2: Update existing row if found
-    if new_row["key"] in rows:
-        existing = rows[new_row["key"]]
-        for k, v in new_row.items():
-            if k in existing and v is not None:
-                existing[k] = v
-        rows[new_row["key"]] = existing
-        action = "updated"
-    else:
-        rows[new_row["key"]] = new_row
-        for k in new_row.keys():
-            if k not in headers:
-                headers.append(k)  # dynamically add new columns if needed
-
-    # Step 3: Safe write back
-    tmp_fd, tmp_path = tempfile.mkstemp(prefix="tmp_", dir=os.path.dirname(CSV_FILE) or ".", text=True)
-    os.close(tmp_fd)
-    try:
-        with open(tmp_path, mode="w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-            for row in rows.values():
-                writer.writerow(row)
-        os.replace(tmp_path, CSV_FILE)
-        print(f"✅ {action.title()} issue {new_row['key']} into {CSV_FILE}")
-        print("📌 Final row data:", rows[new_row["key"]])   # show the row that was updated/inserted
-    finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+
+class WebhookIssueStore:
+    """Webhook issue rows in SQLite (WAL), one row per issue key.
+
+    Each upsert touches a single indexed row, so its cost does not grow with
+    the number of issues. Read-merge-write runs inside ``BEGIN IMMEDIATE``,
+    which serializes concurrent deliveries (threads or processes) instead of
+    letting the last writer drop the other's changes. Existing columns are
+    kept; only non-None values overwrite them, as with the old CSV upsert.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS issues (key TEXT PRIMARY KEY, data TEXT NOT NULL)")
+
+    def _upsert(self, row):
+        current = self._conn.execute("SELECT data FROM issues WHERE key = ?", (row["key"],)).fetchone()
+        if current is None:
+            merged, action = row, "inserted"
+        else:
+            merged, action = json.loads(current[0]), "updated"
+            merged.update({k: v for k, v in row.items() if v is not None})
+        self._conn.execute("INSERT OR REPLACE INTO issues (key, data) VALUES (?, ?)", (row["key"], json.dumps(merged)))
+        return action
+
+    def upsert_many(self, rows):
+        """Upsert ``rows`` in one transaction; returns the action per key."""
+        actions = {}
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for row in rows:
+                    if row.get("key"):
+                        actions[row["key"]] = self._upsert(row)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return actions
+
+    def upsert(self, row):
+        return self.upsert_many([row]).get(row.get("key"))
+
+    def delete(self, key):
+        """Remove the row of ``key``; returns True if there was one."""
+        with self._lock:
+            return self._conn.execute("DELETE FROM issues WHERE key = ?", (key,)).rowcount > 0
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM issues WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM issues").fetchone()[0]
+
+    def _read_connection(self):
+        """A connection of its own for long reads, inside one read transaction.
+
+        The shared connection may be mid BEGIN IMMEDIATE on another thread; a
+        separate WAL reader neither waits for nor sees those writes, and every
+        query on it reads the same snapshot.
+        """
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("BEGIN")
+        return conn
+
+    @staticmethod
+    def _iter_rows(conn):
+        for (data,) in conn.execute("SELECT data FROM issues ORDER BY key"):
+            yield json.loads(data)
+
+    def import_csv(self, path=CSV_FILE, batch_size=1000):
+        """Load rows from a CSV written by the old upsert (or by export_csv)."""
+        with open(path, mode="r", newline="", encoding="utf-8") as f:
+            batch = []
+            for row in csv.DictReader(f):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self.upsert_many(batch)
+                    batch = []
+            self.upsert_many(batch)
+        print(f"📥 Imported {self.count()} issues from {path} into {self.path}")
+
+    def export_csv(self, path=CSV_FILE):
+        """Write every row to ``path`` (atomically); columns in first-seen order."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._read_connection()
+        tmp_fd, tmp_path = tempfile.mkstemp(prefix="tmp_", dir=os.path.dirname(path) or ".", text=True)
+        os.close(tmp_fd)
+        try:
+            headers = {}
+            for row in self._iter_rows(conn):
+                headers.update(dict.fromkeys(row))
+            with open(tmp_path, mode="w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=list(headers))
+                writer.writeheader()
+                for row in self._iter_rows(conn):
+                    writer.writerow(row)
+            os.replace(tmp_path, path)
+        finally:
+            conn.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        print(f"📤 Exported issues from {self.path} to {path}")
+        return path
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store() -> WebhookIssueStore:
+    """Shared store; seeded once from the legacy CSV if it exists."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = WebhookIssueStore()
+            if not _store.count() and os.path.exists(CSV_FILE) and os.path.getsize(CSV_FILE) > 0:
+                _store.import_csv(CSV_FILE)
+    return _store
+
+def upsert_issue(props: dict):
+    """Upsert the properties of one webhook event into the issue store."""
+    new_row = save_webhook_to_dict(props)
+    action = get_store().upsert(new_row)
+    print(f"✅ {action.title()} issue {new_row['key']} into {get_store().path}")
+    return action
+
+def upsert_issues(props_list):
+    """Upsert the properties of several webhook events in one transaction."""
+    return get_store().upsert_many([save_webhook_to_dict(p) for p in props_list])
+
+def delete_issue(key: str):
+    """Drop a deleted issue from the issue store."""
+    if get_store().delete(key):
+        print(f"🗑️ Deleted issue {key} from {get_store().path}")
+
+def export_csv(path=CSV_FILE):
+    """Write the current issue store out as CSV."""
+    return get_store().export_csv(path)
 
 # Example test
 if __name__ == "__main__":
+    from webhook_indexer import parse_webhook_event
+
     with open("/Users/hemasagarendluri1996/jira-rag-pipeline/data.json", "r", encoding="utf-8") as f:
         payload = json.load(f)
-        upsert_issue(payload)
+        upsert_issue(parse_webhook_event(payload)[2])
+    print("📌 Final row data:", get_store().get(payload["issue"]["key"]))